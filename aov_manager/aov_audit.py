@@ -0,0 +1,512 @@
+import re
+
+import maya.cmds as cmds
+
+import scene_snapshot
+import utils
+
+
+# Problem categories, in the order they are fixed
+STALE_ADJUSTMENTS = "stale adjustments"
+UNUSED_AOVS = "unused aovs"
+ORPHAN_NETWORKS = "orphan networks"
+DUPLICATE_NETWORKS = "duplicate networks"
+
+CATEGORIES = [STALE_ADJUSTMENTS,
+              UNUSED_AOVS,
+              ORPHAN_NETWORKS,
+              DUPLICATE_NETWORKS]
+
+# Nodes of the shader networks brought by the tool, renamed copies included
+NETWORK_PATTERNS = ["AOV_*_MAT*", "AOV_*_SG*", "userData_*"]
+
+NETWORK_NAMES = [re.compile(r"^AOV_(?P<name>.+)_(MAT|SG)\d*$"),
+                 re.compile(r"^userData_(?P<name>.+)$")]
+
+
+class DependencyIndex(object):
+    """
+    Class indexing the aovs, the tool shader networks and the nodes upstream
+    of them with their connections.
+    Nodes are listed with one query and their connections with two queries
+    per network level, the audit is answered from the index
+    """
+    def __init__(self):
+        """
+        Initialise an empty index
+        """
+
+        # node -> node type
+        self.node_types = dict()
+
+        # (source plug, destination plug) of every indexed node connection
+        self.edges = set()
+
+        # node -> set of the nodes connected to its inputs and outputs
+        self.sources = dict()
+        self.destinations = dict()
+
+        # Shading groups assigned to geometry
+        self.assigned = set()
+
+    @classmethod
+    def read(cls, aovs):
+        """
+        Index the aovs and the tool shader networks of the scene
+
+        :param aovs: a list of the aiAOV node names
+        :return: a DependencyIndex object
+        """
+
+        index = cls()
+
+        index.node_types.update((x, "aiAOV") for x in aovs)
+
+        nodes = cmds.ls(NETWORK_PATTERNS, showType=True) or []
+        index.node_types.update(zip(nodes[::2], nodes[1::2]))
+
+        pending = list(index.node_types)
+
+        # Walk up the shader networks a level at a time
+        while pending:
+            index._read_connections(pending)
+
+            pending = sorted(set(y for x in pending
+                                 for y in index.sources.get(x, []))
+                             - set(index.node_types))
+
+            if pending:
+                nodes = cmds.ls(pending, showType=True) or []
+                index.node_types.update(zip(nodes[::2], nodes[1::2]))
+
+        return index
+
+    def _read_connections(self, nodes):
+        """
+        Read the input and output connections of many nodes
+
+        :param nodes: a list of node names
+        :return:
+        """
+
+        for source in [True, False]:
+            connections = cmds.listConnections(nodes,
+                                               source=source,
+                                               destination=not source,
+                                               connections=True,
+                                               plugs=True) or []
+
+            for own_plug, other_plug in zip(connections[::2],
+                                            connections[1::2]):
+                if source:
+                    self.add_edge(other_plug, own_plug)
+                else:
+                    self.add_edge(own_plug, other_plug)
+
+        return
+
+    def add_edge(self, source_plug, destination_plug):
+        """
+        Record a connection
+
+        :param source_plug: the source plug name as a string
+        :param destination_plug: the destination plug name as a string
+        :return:
+        """
+
+        self.edges.add((source_plug, destination_plug))
+
+        # Message connections tie the aovs to the shared drivers and
+        # filters, they aren't part of a shader network
+        if source_plug.endswith(".message"):
+            return
+
+        # Shading groups with members are in use, the geometry is kept out
+        # of the networks
+        if ".dagSetMembers" in destination_plug:
+            self.assigned.add(destination_plug.split(".")[0])
+            return
+
+        source = source_plug.split(".")[0]
+        destination = destination_plug.split(".")[0]
+
+        self.destinations.setdefault(source, set()).add(destination)
+        self.sources.setdefault(destination, set()).add(source)
+
+        return
+
+    def upstream(self, nodes):
+        """
+        Get the nodes feeding some nodes, and the shading groups of the
+        shaders among them
+
+        :param nodes: a list of node names
+        :return: a set of node names, the given nodes included
+        """
+
+        upstream = set(nodes)
+        pending = list(nodes)
+
+        while pending:
+            node = pending.pop()
+
+            for source in self.sources.get(node, []):
+                if source not in upstream:
+                    upstream.add(source)
+                    pending.append(source)
+
+        shading_groups = set(y for x in upstream
+                             for y in self.destinations.get(x, [])
+                             if self.node_types.get(y) == "shadingEngine")
+
+        return upstream | shading_groups
+
+    def contained(self, nodes, allowed_nodes=()):
+        """
+        Get the nodes whose outputs only reach each other or some allowed
+        nodes. Named like the tool networks isn't enough, a node feeding a
+        node of the user, like a user material, is in use
+
+        :param nodes: a set of node names
+        :param allowed_nodes: node names the outputs may also reach
+        :return: a set of node names
+        """
+
+        contained = set(nodes)
+        allowed_nodes = set(allowed_nodes)
+        changed = True
+
+        while changed:
+            changed = False
+
+            for node in list(contained):
+                if not self.destinations.get(node, set()) <= \
+                        contained | allowed_nodes:
+                    contained.discard(node)
+                    changed = True
+
+        return contained
+
+    def exclusive_upstream(self, nodes, kept_nodes):
+        """
+        Get the nodes only feeding some nodes, the nodes which can be deleted
+        with them
+
+        :param nodes: a set of node names
+        :param kept_nodes: a set of node names which can't be deleted
+        :return: a set of node names, the given nodes included
+        """
+
+        exclusive = set(nodes)
+        changed = True
+
+        while changed:
+            changed = False
+
+            for node in list(exclusive):
+                for source in self.sources.get(node, []):
+                    if source in exclusive or source in kept_nodes or \
+                            source not in self.node_types:
+                        continue
+
+                    if self.destinations.get(source, set()) <= exclusive:
+                        exclusive.add(source)
+                        changed = True
+
+        return exclusive
+
+    def connection_count(self, nodes):
+        """
+        Get the number of connections removed with some nodes
+
+        :param nodes: a set of node names
+        :return: the number of connections as an int
+        """
+
+        return len([x for x in self.edges
+                    if x[0].split(".")[0] in nodes or
+                    x[1].split(".")[0] in nodes])
+
+
+class AuditReport(object):
+    """
+    Class holding the problems found by a scene audit and the nodes,
+    connections and layer adjustments their fix removes
+    """
+    def __init__(self):
+        """
+        Initialise an empty report
+        """
+
+        # aiAOV node -> network nodes deleted with the aov
+        self.unused_aovs = dict()
+
+        # aov name -> network nodes
+        self.orphan_networks = dict()
+        self.duplicate_networks = dict()
+
+        # adjustments[i] plugs without a node attribute or a layer override
+        self.stale_adjustments = []
+
+        # category -> {"problems": int, "nodes": int, "connections": int}
+        self.savings = dict((x, {"problems": 0,
+                                 "nodes": 0,
+                                 "connections": 0}) for x in CATEGORIES)
+
+    def __nonzero__(self):
+        return any(x["problems"] for x in self.savings.values())
+
+    def nodes(self, categories=None):
+        """
+        Get the nodes deleted to fix some problem categories
+
+        :param categories: a list of categories, every category if None
+        :return: a sorted list of node names
+        """
+
+        categories = CATEGORIES if categories is None else categories
+
+        nodes = set()
+
+        if UNUSED_AOVS in categories:
+            for aov, network in self.unused_aovs.items():
+                nodes.add(aov)
+                nodes.update(network)
+
+        for category, networks in [(ORPHAN_NETWORKS, self.orphan_networks),
+                                   (DUPLICATE_NETWORKS,
+                                    self.duplicate_networks)]:
+            if category in categories:
+                for network in networks.values():
+                    nodes.update(network)
+
+        return sorted(nodes)
+
+    def report(self):
+        """
+        Get the report of the problems found and the estimated savings
+
+        :return: the report as a string
+        """
+
+        lines = ["AOV MANAGER AUDIT"]
+
+        for category in CATEGORIES:
+            savings = self.savings[category]
+
+            lines.append("    %-20s %5d problems  %6d nodes  %6d connections"
+                         % (category,
+                            savings["problems"],
+                            savings["nodes"],
+                            savings["connections"]))
+
+        return "\n".join(lines)
+
+    def to_dict(self):
+        """
+        Get the report data, used for the batch results
+
+        :return: a dictionary with the problems and the savings
+        """
+
+        return {"unused_aovs": dict((x, sorted(y))
+                                    for x, y in self.unused_aovs.items()),
+                "orphan_networks": dict((x, sorted(y)) for x, y in
+                                        self.orphan_networks.items()),
+                "duplicate_networks": dict((x, sorted(y)) for x, y in
+                                           self.duplicate_networks.items()),
+                "stale_adjustments": list(self.stale_adjustments),
+                "savings": self.savings}
+
+
+def audit_scene(snapshot=None):
+    """
+    Find the aovs enabled on no layer, the tool shader networks left without
+    an aov or imported twice and the layer adjustments left behind
+
+    :param snapshot: an optional up to date SceneSnapshot, the scene is read
+    if None
+    :return: an AuditReport object
+    """
+
+    if snapshot is None:
+        snapshot = utils.get_scene_snapshot()
+
+    report = AuditReport()
+
+    index = DependencyIndex.read(snapshot.aovs)
+
+    render_layers = [scene_snapshot.DEFAULT_LAYER] + snapshot.render_layers
+
+    unused_aovs = [x for x in snapshot.aovs
+                   if not any(snapshot.layer_value("%s.enabled" % x, y)
+                              for y in render_layers)]
+
+    live_aovs = [x for x in snapshot.aovs if x not in unused_aovs]
+
+    # Networks feeding a live aov or assigned to geometry are kept
+    kept_nodes = index.upstream(live_aovs) | index.upstream(index.assigned)
+
+    # Aovs are deleted with the network nodes only feeding them
+    for aov in unused_aovs:
+        shading_groups = set(x for x in index.upstream([aov])
+                             if index.node_types.get(x) == "shadingEngine")
+
+        shading_groups = index.contained(shading_groups - kept_nodes,
+                                         allowed_nodes=[aov])
+
+        network = index.exclusive_upstream(set([aov]) | shading_groups,
+                                           kept_nodes)
+        network.discard(aov)
+
+        report.unused_aovs[aov] = network
+
+    unused_nodes = set(report.nodes([UNUSED_AOVS]))
+
+    _add_savings(report, UNUSED_AOVS, len(unused_aovs), unused_nodes, index)
+
+    # Networks feeding no aov at all
+    kept_nodes |= unused_nodes | set(snapshot.aovs)
+
+    detached_nodes = index.exclusive_upstream(
+        index.contained(set(x for x in index.node_types
+                            if network_aov_name(x) is not None and
+                            x not in kept_nodes)),
+        kept_nodes)
+
+    scene_aovs = set(snapshot.scene_aovs())
+
+    for network_root in _network_roots(detached_nodes, index):
+        aov_name = network_aov_name(network_root)
+        network = index.upstream([network_root]) & detached_nodes
+
+        existing_aov = _existing_aov(aov_name, scene_aovs)
+
+        if existing_aov is None:
+            report.orphan_networks.setdefault(aov_name, set()).update(network)
+        else:
+            report.duplicate_networks.setdefault(existing_aov,
+                                                 set()).update(network)
+
+    for category, networks in [(ORPHAN_NETWORKS, report.orphan_networks),
+                               (DUPLICATE_NETWORKS,
+                                report.duplicate_networks)]:
+        _add_savings(report, category, len(networks),
+                     set(report.nodes([category])), index)
+
+    report.stale_adjustments = find_stale_adjustments(snapshot)
+
+    report.savings[STALE_ADJUSTMENTS]["problems"] = \
+        len(report.stale_adjustments)
+    report.savings[STALE_ADJUSTMENTS]["connections"] = len(
+        set(report.stale_adjustments) & _connected_elements(snapshot))
+
+    return report
+
+
+def fix_scene(report, categories=None):
+    """
+    Fix the problems of an audit in one undoable transaction.
+    The stale adjustments are removed first, then every node is deleted
+    with a single command
+
+    :param report: an AuditReport object
+    :param categories: a list of categories to fix, every category if None
+    :return: a list of the deleted node names
+    """
+
+    categories = CATEGORIES if categories is None else categories
+
+    nodes = report.nodes(categories)
+
+    with utils.transaction("aov audit cleanup"):
+        if STALE_ADJUSTMENTS in categories:
+            for adjustment in report.stale_adjustments:
+                cmds.removeMultiInstance(adjustment, b=True)
+
+        if nodes:
+            cmds.delete(*nodes)
+
+    return nodes
+
+
+def find_stale_adjustments(snapshot):
+    """
+    Get the render layer adjustments left behind: adjustment elements whose
+    node attribute is gone and master values kept on the default render
+    layer without an override on any other layer
+
+    :param snapshot: an up to date SceneSnapshot
+    :return: a list of adjustments[i] plugs
+    """
+
+    stale_adjustments = []
+
+    connected_elements = _connected_elements(snapshot)
+
+    # Only the element indices are read, the adjustments are in the snapshot
+    for render_layer in [scene_snapshot.DEFAULT_LAYER] + \
+            snapshot.render_layers:
+        indices = cmds.getAttr("%s.adjustments" % render_layer,
+                               multiIndices=True) or []
+
+        stale_adjustments.extend(x for x in ["%s.adjustments[%s]"
+                                             % (render_layer, y)
+                                             for y in indices]
+                                 if x not in connected_elements)
+
+    for node_attribute, layer_plugs in sorted(
+            snapshot.adjustment_plugs.items()):
+        adjustment_plug = layer_plugs.get(scene_snapshot.DEFAULT_LAYER, None)
+
+        if adjustment_plug is not None and len(layer_plugs) == 1:
+            stale_adjustments.append(adjustment_plug.rsplit(".", 1)[0])
+
+    return stale_adjustments
+
+
+def network_aov_name(node):
+    """
+    Get the aov name of a tool shader network node
+
+    :param node: the node name as a string
+    :return: the aov name as a string, None if the node isn't named like a
+    tool network node
+    """
+
+    for pattern in NETWORK_NAMES:
+        match = pattern.match(node)
+
+        if match is not None:
+            return match.group("name")
+
+    return None
+
+
+def _existing_aov(aov_name, scene_aovs):
+    # Renamed copies of a network end with a number
+    for name in [aov_name, aov_name.rstrip("0123456789")]:
+        if name in scene_aovs:
+            return name
+
+    return None
+
+
+def _network_roots(nodes, index):
+    # The named network nodes whose outputs leave the given nodes
+    return sorted(x for x in nodes
+                  if network_aov_name(x) is not None and
+                  not index.destinations.get(x, set()) & nodes)
+
+
+def _connected_elements(snapshot):
+    # The adjustments[i] elements connected to a node attribute
+    return set(y.rsplit(".", 1)[0]
+               for x in snapshot.adjustment_plugs.values()
+               for y in x.values() if y is not None)
+
+
+def _add_savings(report, category, problems, nodes, index):
+    report.savings[category] = {"problems": problems,
+                                "nodes": len(nodes),
+                                "connections": index.connection_count(nodes)}
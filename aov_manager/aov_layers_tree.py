@@ -1,61 +1,513 @@
+import contextlib
+import functools
 import json
 
-import maya.cmds as cmds
-
 from PySide import QtGui, QtCore
 
 import utils
-import pyside_util
+import instrumentation
+import job_scheduler
+import render_cost
+import scene_snapshot
+import tree_data
+
+
+# Parent pointer of the layer rows, aov rows point to their LayerEntry
+ROOT = object()
 
 
-class AovTreeItem(QtGui.QTreeWidgetItem):
+class AovLayersModel(QtCore.QAbstractItemModel):
     """
-    Class to create an TreeWidgetItem for the aovs added to the render layers
-    tree items
+    Item model for the render layer aovs tree.
+    Rows are served straight from a LayerAovTable so no item objects are
+    created, children are only queried by the view when a layer is expanded.
+    Layer rows show the estimated frame cost of their aovs, kept up to date
+    as aov rows are added and removed
     """
-    def __init__(self, aov, parent, tree):
-        QtGui.QTreeWidgetItem.__init__(self, parent)
-        self.tree = tree
+    _layer_font = None
+    _aov_font = None
+    _layer_icon = None
+
+    def __init__(self, parent=None):
+        """
+        Initialise the model with an empty table
+
+        :param parent: parent object
+        """
+        super(AovLayersModel, self).__init__(parent)
+
+        self.table = tree_data.LayerAovTable()
+
+        self.costs = render_cost.RenderCostModel()
+
+        # Fonts and icons are shared by every row
+        if AovLayersModel._layer_font is None:
+            AovLayersModel._layer_font = QtGui.QFont()
+            AovLayersModel._layer_font.setPointSize(11)
+
+            AovLayersModel._aov_font = QtGui.QFont()
+            AovLayersModel._aov_font.setPointSize(10)
+
+            AovLayersModel._layer_icon = QtGui.QIcon(":/layerEditor.png")
+
+    def index(self, row, column, parent=QtCore.QModelIndex()):
+        if not self.hasIndex(row, column, parent):
+            return QtCore.QModelIndex()
+
+        if not parent.isValid():
+            return self.createIndex(row, column, ROOT)
+
+        return self.createIndex(row, column, self.table.layers[parent.row()])
+
+    def parent(self, index):
+        if not index.isValid():
+            return QtCore.QModelIndex()
+
+        entry = index.internalPointer()
+
+        if entry is ROOT:
+            return QtCore.QModelIndex()
+
+        return self.createIndex(self.table.layer_row(entry.name), 0, ROOT)
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if not parent.isValid():
+            return self.table.layer_count()
+
+        if parent.internalPointer() is ROOT:
+            return len(self.table.layers[parent.row()].aovs)
+
+        return 0
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return 1
+
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        if role == QtCore.Qt.DisplayRole and \
+                orientation == QtCore.Qt.Horizontal:
+            return "RENDER LAYERS"
+
+        return None
+
+    def flags(self, index):
+        if not index.isValid():
+            return QtCore.Qt.NoItemFlags
+
+        if self.is_layer(index):
+            return QtCore.Qt.ItemIsEnabled | QtCore.Qt.ItemIsDragEnabled
+
+        return (QtCore.Qt.ItemIsEnabled |
+                QtCore.Qt.ItemIsSelectable |
+                QtCore.Qt.ItemIsDragEnabled)
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+
+        is_layer = self.is_layer(index)
+
+        if role == QtCore.Qt.DisplayRole:
+            if is_layer:
+                render_layer = self.layer_name(index)
+
+                return "%s    %s" % (render_layer,
+                                     self.costs.layer_cost(render_layer)
+                                     .label())
+
+            return self.aov_name(index)
+
+        if role == QtCore.Qt.ToolTipRole and is_layer:
+            return self.costs.layer_cost(self.layer_name(index)).description()
 
-        font = QtGui.QFont()
-        font.setPointSize(10)
+        if role == QtCore.Qt.ForegroundRole and is_layer:
+            if self.costs.layer_cost(self.layer_name(index)).over_budget():
+                return QtGui.QBrush(QtGui.QColor(220, 60, 60))
+
+        if role == QtCore.Qt.FontRole:
+            return self._layer_font if is_layer else self._aov_font
+
+        if role == QtCore.Qt.DecorationRole and is_layer:
+            return self._layer_icon
+
+        if role == QtCore.Qt.UserRole:
+            return "layer" if is_layer else "aov"
+
+        return None
+
+    def mimeTypes(self):
+        return ["application/selfdrop"]
+
+    def mimeData(self, indexes):
+        aov_list = []
+
+        for index in indexes:
+            if self.is_layer(index):
+                continue
+
+            aov = self.aov_name(index)
+
+            aov_list.append({"ui_Name": aov,
+                             "aov_Name": "aiAOV_%s" % aov,
+                             "type": None,
+                             "data": None})
+
+        mime_data = QtCore.QMimeData()
+        mime_data.setData("application/selfdrop",
+                          QtCore.QByteArray(json.dumps(aov_list)))
+
+        return mime_data
+
+    def is_layer(self, index):
+        """
+        Check if an index is a layer row
+
+        :param index: a QModelIndex
+        :return: a bool
+        """
+
+        return index.internalPointer() is ROOT
+
+    def layer_name(self, index):
+        """
+        Get the render layer name of a layer or aov row
+
+        :param index: a QModelIndex
+        :return: the name of the render layer as a string
+        """
+
+        if self.is_layer(index):
+            return self.table.layers[index.row()].name
+
+        return index.internalPointer().name
+
+    def aov_name(self, index):
+        """
+        Get the aov name of an aov row
+
+        :param index: a QModelIndex
+        :return: the aov name as a string
+        """
+
+        entry = index.internalPointer()
+
+        return self.table.aov_names.name(entry.aovs[index.row()])
+
+    def layer_index(self, render_layer):
+        """
+        Get the index of a layer row
+
+        :param render_layer: the name of the render layer as a string
+        :return: a QModelIndex, invalid if the layer is not in the model
+        """
 
-        self.setText(0, aov)
-        self.setFont(0, font)
+        row = self.table.layer_row(render_layer)
 
-        self.setData(0, QtCore.Qt.UserRole, "aov")
-        self.setData(1, QtCore.Qt.UserRole, "aiAOV_%s" % aov)
-        self.setData(2, QtCore.Qt.UserRole, aov)
+        if row is None:
+            return QtCore.QModelIndex()
 
+        return self.createIndex(row, 0, ROOT)
+
+    def set_cost_snapshot(self, snapshot):
+        """
+        Read the render settings and aov data types of the layer costs from
+        a scene snapshot
+
+        :param snapshot: a SceneSnapshot object
+        :return:
+        """
+
+        self.costs.set_snapshot(snapshot)
+
+        for entry in self.table.layers:
+            self.layer_changed(entry.name)
+
+        return
+
+    def update_aov_costs(self, aov_list):
+        """
+        Update the layer costs after the data type of aovs changed
+
+        :param aov_list: a list of aov names
+        :return:
+        """
+
+        for render_layer in self.costs.update_aovs(aov_list):
+            self.layer_changed(render_layer)
+
+        return
+
+    def layer_changed(self, render_layer):
+        """
+        Notify the views the cost of a layer row changed
+
+        :param render_layer: the name of the render layer as a string
+        :return:
+        """
+
+        index = self.layer_index(render_layer)
+
+        if index.isValid():
+            self.dataChanged.emit(index, index)
+
+        return
+
+    def set_layers_state(self, layers_state):
+        """
+        Update the rows to match a new layer aovs state.
+        Only the layer and aov rows which changed are inserted or removed
+
+        :param layers_state: dictionary where keys are render layers and
+        values the render layer aovs
+        :return: a list of the added render layers
+        """
+
+        added_layers, steps = self.layers_state_steps(layers_state)
+
+        for step in steps:
+            step()
+
+        return added_layers
+
+    def layers_state_steps(self, layers_state, first_layers=()):
+        """
+        Get the row changes matching a new layer aovs state as steps which
+        can be run apart, like set_layers_state does at once.
+        The layer rows come first, then the aov rows of the first layers and
+        of the other layers in row order
+
+        :param layers_state: dictionary where keys are render layers and
+        values the render layer aovs
+        :param first_layers: the render layers whose aov rows are changed
+        first, like the expanded layers
+        :return: a tuple with the list of the added render layers and a list
+        of functions changing the rows
+        """
+
+        layers_state = dict((layer, [x for x in aov_list if x != "beauty"])
+                            for layer, aov_list in layers_state.items())
+
+        previous_state = dict((x.name, self.table.aovs(x.name))
+                              for x in self.table.layers)
+
+        (added_layers,
+         removed_layers,
+         added_aovs,
+         removed_aovs) = scene_snapshot.diff_layer_aovs(previous_state,
+                                                        layers_state)
+
+        steps = []
+
+        for render_layer in removed_layers:
+            steps.append(functools.partial(self.remove_layer, render_layer))
+
+        added_layers = sorted(added_layers, key=tree_data.layer_sort_key)
+
+        for render_layer in added_layers:
+            steps.append(functools.partial(self.add_layer, render_layer))
+
+        first_layers = [x for x in first_layers if x in layers_state]
+
+        layer_order = first_layers + sorted(
+            [x for x in layers_state if x not in first_layers],
+            key=tree_data.layer_sort_key)
+
+        for render_layer in layer_order:
+            for aov in removed_aovs.get(render_layer, []):
+                steps.append(functools.partial(self.remove_aov,
+                                               render_layer,
+                                               aov))
+
+            aov_list = added_aovs.get(render_layer, [])
+
+            # New layers get their aovs in order with a single insertion
+            if render_layer in added_layers:
+                if aov_list:
+                    steps.append(functools.partial(self.add_aovs,
+                                                   render_layer,
+                                                   aov_list))
+                continue
+
+            for aov in aov_list:
+                row = layers_state[render_layer].index(aov)
+                steps.append(functools.partial(self.add_aov,
+                                               render_layer,
+                                               aov,
+                                               row=row))
+
+        return added_layers, steps
+
+    def add_layer(self, render_layer):
+        """
+        Add a layer row at its sorted row if not already present
+
+        :param render_layer: the name of the render layer as a string
+        :return:
+        """
+
+        if self.table.layer_row(render_layer) is not None:
+            return
+
+        row = self.table.insert_row(render_layer)
+
+        self.beginInsertRows(QtCore.QModelIndex(), row, row)
+        self.table.insert_layer(render_layer)
+        self.costs.set_layer_aovs(render_layer, [])
+        self.endInsertRows()
+
+        return
+
+    def remove_layer(self, render_layer):
+        """
+        Remove a layer row and its aov rows
+
+        :param render_layer: the name of the render layer as a string
+        :return:
+        """
 
-class AovLayersTreeView(QtGui.QTreeWidget):
+        row = self.table.layer_row(render_layer)
+
+        if row is None:
+            return
+
+        self.beginRemoveRows(QtCore.QModelIndex(), row, row)
+        self.table.remove_layer(render_layer)
+        self.costs.remove_layer(render_layer)
+        self.endRemoveRows()
+
+        return
+
+    def add_aov(self, render_layer, aov, row=None):
+        """
+        Add an aov row under a layer if not already present
+
+        :param render_layer: the name of the render layer as a string
+        :param aov: the aov name as a string
+        :param row: the aov row, appended if None
+        :return: True if the row was added
+        """
+
+        entry = self.table.layer_entry(render_layer)
+
+        if entry is None or self.table.aov_row(render_layer, aov) is not None:
+            return False
+
+        aov_count = len(entry.aovs)
+        row = aov_count if row is None else min(row, aov_count)
+
+        self.beginInsertRows(self.layer_index(render_layer), row, row)
+        self.table.insert_aov(render_layer, row, aov)
+        self.endInsertRows()
+
+        self.costs.add_aov(render_layer, aov)
+        self.layer_changed(render_layer)
+
+        return True
+
+    def add_aovs(self, render_layer, aov_list):
+        """
+        Append many aov rows under a layer with a single row insertion,
+        aovs already under the layer are skipped
+
+        :param render_layer: the name of the render layer as a string
+        :param aov_list: a list of aov names
+        :return:
+        """
+
+        entry = self.table.layer_entry(render_layer)
+
+        if entry is None:
+            return
+
+        existing_aovs = set(self.table.aovs(render_layer))
+        new_aovs = []
+
+        for aov in aov_list:
+            if aov not in existing_aovs:
+                new_aovs.append(aov)
+                existing_aovs.add(aov)
+
+        if not new_aovs:
+            return
+
+        row = len(entry.aovs)
+
+        self.beginInsertRows(self.layer_index(render_layer),
+                             row,
+                             row + len(new_aovs) - 1)
+
+        for offset, aov in enumerate(new_aovs):
+            self.table.insert_aov(render_layer, row + offset, aov)
+
+        self.endInsertRows()
+
+        for aov in new_aovs:
+            self.costs.add_aov(render_layer, aov)
+
+        self.layer_changed(render_layer)
+
+        return
+
+    def remove_aov(self, render_layer, aov):
+        """
+        Remove an aov row from a layer
+
+        :param render_layer: the name of the render layer as a string
+        :param aov: the aov name as a string
+        :return:
+        """
+
+        row = self.table.aov_row(render_layer, aov)
+
+        if row is None:
+            return
+
+        self.beginRemoveRows(self.layer_index(render_layer), row, row)
+        self.table.remove_aov(render_layer, row)
+        self.endRemoveRows()
+
+        self.costs.remove_aov(render_layer, aov)
+        self.layer_changed(render_layer)
+
+        return
+
+
+class AovLayersTreeView(QtGui.QTreeView):
     """
-    Class to create an TreeWidget for the render layer aovs tree
+    Class to create a TreeView for the render layer aovs tree
     """
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, populate=True):
         """
-        Initialise the Tree Widget
+        Initialise the Tree View
         Ui settings and content
 
         :param parent: parent widget
+        :param populate: bool used to read the scene content straight away,
+        tree_content has to be called later if False
         """
         super(AovLayersTreeView, self).__init__(parent)
         self.ui = parent
 
+        self.setModel(AovLayersModel(self))
+
+        # Scene snapshot the tree content was last built from
+        self.snapshot = None
+
+        # Job filling the tree in slices, None when filled at once
+        self.populate_job = None
+
         self._ui_settings()
 
-        self.tree_content()
+        if populate:
+            self.tree_content()
 
     def _ui_settings(self):
         """
-        UI settings for the tree widget.
-        Setup the header text
+        UI settings for the tree view.
         Drag an drop mode
         Selection mode
 
         :return:
         """
-        self.headerItem().setText(0, "RENDER LAYERS")
 
         self.setDragDropMode(QtGui.QAbstractItemView.DragDrop)
         self.setDefaultDropAction(QtCore.Qt.IgnoreAction)
@@ -64,67 +516,218 @@ class AovLayersTreeView(QtGui.QTreeWidget):
 
         return
 
-    def tree_content(self):
+    def tree_content(self, snapshot=None):
         """
-        Set the tree content
+        Set the tree content.
+        Only the layer and aov rows which changed since the last refresh are
+        inserted or removed so expansion and selection are kept
 
+        :param snapshot: an optional up to date SceneSnapshot, the scene is
+        read again if None
         :return:
         """
 
-        self.clear()
+        self.cancel_populate()
 
-        layer_aovs = utils.get_layers_aovs()
+        for _ in self.populate_steps(snapshot=snapshot):
+            pass
 
-        for render_layer in sorted(layer_aovs):
-            aov_list = layer_aovs[render_layer]
-            self._add_layer_aov_child_items(render_layer, aov_list)
+        return None
 
-        scene_aovs = utils.get_scene_aovs()
+    def populate(self, scheduler=None, snapshot=None, name="layers tree",
+                 on_progress=None, on_finished=None):
+        """
+        Set the tree content in slices run by a job scheduler, a tree
+        content job already running is cancelled
+
+        :param scheduler: the JobScheduler running the job, the shared
+        scheduler if None
+        :param snapshot: an optional up to date SceneSnapshot, the scene is
+        read again if None
+        :param name: the job name as a string
+        :param on_progress: optional function called with the job after every
+        slice
+        :param on_finished: optional function called with the job once done
+        :return: the Job object
+        """
 
-        master_layer_aovs = self._add_layer_aov_child_items("masterLayer",
-                                                            scene_aovs)
+        self.cancel_populate()
 
-        master_layer_aovs.setFlags(QtCore.Qt.ItemIsEnabled |
-                                   QtCore.Qt.ItemIsDragEnabled)
+        if scheduler is None:
+            scheduler = job_scheduler.get_scheduler()
 
-        master_layer_aovs.setExpanded(True)
+        self.populate_job = job_scheduler.Job(
+            name,
+            lambda job: self.populate_steps(snapshot=snapshot, job=job),
+            on_progress=on_progress,
+            on_finished=on_finished)
 
-        return None
+        return scheduler.submit(self.populate_job)
+
+    def cancel_populate(self):
+        """
+        Cancel the tree content job if running
+
+        :return:
+        """
+
+        if self.populate_job is not None:
+            self.populate_job.cancel()
+            self.populate_job = None
+
+        return
+
+    def populate_steps(self, snapshot=None, job=None):
+        """
+        Get the steps setting the tree content.
+        The scene is read by the first step, the master layer is expanded
+        as soon as it is added and the aov rows of the expanded layers are
+        set first
+
+        :param snapshot: an optional up to date SceneSnapshot, the scene is
+        read again if None
+        :param job: an optional Job whose total is set once the steps are
+        known
+        :return: a generator of steps
+        """
+
+        if snapshot is None:
+            snapshot = utils.get_scene_snapshot()
+
+        self.snapshot = snapshot
+
+        layers_state = utils.get_layers_aovs(snapshot=snapshot)
+        layers_state["masterLayer"] = utils.get_scene_aovs(snapshot=snapshot)
+
+        model = self.model()
+        model.set_cost_snapshot(snapshot)
+
+        expanded_layers = [x.name for x in model.table.layers
+                           if self.isExpanded(model.layer_index(x.name))]
+
+        added_layers, steps = model.layers_state_steps(
+            layers_state,
+            first_layers=["masterLayer"] + expanded_layers)
+
+        if job is not None:
+            job.total = len(steps) + 1
 
-    def _add_layer_aov_child_items(self, render_layer, aov_list):
+        yield
+
+        expand_master = "masterLayer" in added_layers
+
+        for step in steps:
+            step()
+
+            if expand_master and model.table.layer_row("masterLayer") \
+                    is not None:
+                self.setExpanded(model.layer_index("masterLayer"), True)
+                expand_master = False
+
+            yield
+
+    @contextlib.contextmanager
+    def scene_action(self, name):
         """
-        Add a layer tree item and it's child aov tree items
+        Context manager running an action on the scene as a single undoable
+        transaction. The scene is rolled back if the action fails and the
+        tree content is read again.
+        A tree content job still running is cancelled first so it doesn't
+        change the rows the action works on
+
+        :param name: the action name as a string
+        :return:
+        """
+
+        self.cancel_populate()
+
+        try:
+            with instrumentation.operation(name), \
+                    utils.transaction("aov manager %s" % name):
+                yield
+        except Exception:
+            self.tree_content()
+            raise
+
+    def layer_aovs(self, render_layer):
+        """
+        Get the aovs displayed under a layer
+
+        :param render_layer: the name of the render layer as a string
+        :return: a list of aovs
+        """
+
+        return self.model().table.aovs(render_layer)
+
+    def add_aov_item(self, render_layer, aov):
+        """
+        Add an aov row to a render layer if not already present
 
         :param render_layer: the name of the render layer as a string
-        :param aov_list: a list of aovs
+        :param aov: the aov name as a string
+        :return: True if the row was added
+        """
+
+        return self.model().add_aov(render_layer, aov)
+
+    def add_aov_items(self, render_layer, aov_list):
+        """
+        Add many aov rows to a render layer at once
+
+        :param render_layer: the name of the render layer as a string
+        :param aov_list: a list of aov names
         :return:
         """
 
-        layer_tree_item = QtGui.QTreeWidgetItem(self)
+        self.model().add_aovs(render_layer, aov_list)
+
+        return
+
+    def remove_aov_item(self, render_layer, aov):
+        """
+        Remove an aov row from a render layer
+
+        :param render_layer: the name of the render layer as a string
+        :param aov: the aov name as a string
+        :return:
+        """
 
-        font = QtGui.QFont()
-        font.setPointSize(11)
+        self.model().remove_aov(render_layer, aov)
 
-        layer_tree_item.setText(0, render_layer)
-        layer_tree_item.setFont(0, font)
+        return
 
-        layer_tree_item.setData(0, QtCore.Qt.UserRole, "layer")
-        layer_tree_item.setData(1, QtCore.Qt.UserRole, render_layer)
+    def remove_aov_items_from_layers(self, aov_list):
+        """
+        Remove aov rows from every render layer, the master layer rows are
+        kept
 
-        layer_tree_item.setFlags(QtCore.Qt.ItemIsEnabled |
-                                 QtCore.Qt.ItemIsDragEnabled)
+        :param aov_list: a list of aov names
+        :return:
+        """
 
-        layer_tree_item.setIcon(0, QtGui.QIcon(":/layerEditor.png"))
+        model = self.model()
 
-        for aov in aov_list:
-            if aov == "beauty":
+        for entry in list(model.table.layers):
+            if entry.name == "masterLayer":
                 continue
 
-            AovTreeItem(aov, layer_tree_item, self)
+            for aov in aov_list:
+                model.remove_aov(entry.name, aov)
 
-        layer_tree_item.setData(2, QtCore.Qt.UserRole, aov_list)
+        return
 
-        return layer_tree_item
+    def selected_aovs(self):
+        """
+        Get the selected aov rows
+
+        :return: a list of (render_layer, aov) tuples
+        """
+
+        model = self.model()
+
+        return [(model.layer_name(x), model.aov_name(x))
+                for x in self.selectedIndexes()
+                if not model.is_layer(x)]
 
     def dragEnterEvent(self, event):
         """
@@ -136,27 +739,32 @@ class AovLayersTreeView(QtGui.QTreeWidget):
 
         return None
 
+    def dragMoveEvent(self, event):
+        """
+        PySide drag move event
+        :param event:
+        :return:
+        """
+        event.accept()
+
+        return None
+
     def dropEvent(self, event):
         """
         PySide drop event
         :param event:
         :return:
         """
-        drop_parent = self.itemAt(event.pos())
-        drop_parent = self.invisibleRootItem() if drop_parent is None else drop_parent
+        drop_parent = self.indexAt(event.pos())
+        model = self.model()
 
-        if drop_parent is None:
+        if not drop_parent.isValid() or not model.is_layer(drop_parent):
             event.ignore()
             return
 
-        if drop_parent.data(0, QtCore.Qt.UserRole) != "layer":
-            event.ignore()
-            return
+        selected_aovs = self.selected_aovs() or None
 
-        selected_items = [x for x in self.selectedItems()
-                          if x.data(0, QtCore.Qt.UserRole) != "layer"] or None
-
-        if selected_items is None:
+        if selected_aovs is None:
             mimedata = event.mimeData()
 
             if mimedata.hasFormat('application/leftdrag'):
@@ -172,80 +780,46 @@ class AovLayersTreeView(QtGui.QTreeWidget):
         else:
             drop_list = []
 
-            for item in selected_items:
-                if item.data(0, QtCore.Qt.UserRole) == "layer":
-                    continue
-
+            for _, aov in selected_aovs:
                 aov_dict = dict()
 
-                aov_dict["ui_Name"] = item.text(0)
-                aov_dict["aov_Name"] = item.data(1, QtCore.Qt.UserRole)
-                aov_dict["type"] = item.data(2, QtCore.Qt.UserRole)
-                aov_dict["data"] = item.data(3, QtCore.Qt.UserRole)
+                aov_dict["ui_Name"] = aov
+                aov_dict["aov_Name"] = "aiAOV_%s" % aov
+                aov_dict["type"] = None
+                aov_dict["data"] = None
 
                 drop_list.append(aov_dict)
 
-        render_layer = drop_parent.data(1, QtCore.Qt.UserRole)
-        layer_aovs = drop_parent.data(2, QtCore.Qt.UserRole)
-
-        # FIXME: switch to the master render layer to manage AOVS
-        # Need to avoid this
-        # Doing this because maya cmds does not return the overrides made
-        # on a layer until a layer switch has been made
-        user_render_layer = cmds.editRenderLayerGlobals(query=True, crl=True)
-
-        if user_render_layer != "defaultRenderLayer":
+        render_layer = model.layer_name(drop_parent)
+        layer_aovs = self.layer_aovs(render_layer)
 
-            # Warning to the user that we are switching to the master Layer
-            msg = ("AOV MANAGER needs to switch to the MASTER LAYER "
-                   "to setup your AOVS")
-
-            pyside_util.display_message_box("ARNOLD AOV MANAGER",
-                                            msg,
-                                            buttons=QtGui.QMessageBox.Ok,
-                                            parent=self)
-
-        # Switch to the master layer
-        cmds.editRenderLayerGlobals(currentRenderLayer="defaultRenderLayer")
+        # Keep the aovs not already on the layer
+        new_aovs = []
 
         for aovDict in drop_list:
             ui_name = aovDict.get("ui_Name", None)
-            node_name = aovDict.get("aov_Name", None)
-            aov_type = aovDict.get("type", None)
-            data_type = aovDict.get("data", None)
 
             if ui_name not in layer_aovs and ui_name is not None:
-                AovTreeItem(ui_name, drop_parent, self)
-                utils.add_aov_to_render_layer(ui_name,
-                                              node_name,
-                                              render_layer,
-                                              aov_type,
-                                              data_type=data_type)
-
+                new_aovs.append(aovDict)
                 layer_aovs.append(ui_name)
 
-                if render_layer != "masterLayer":
-                    master_layer_item = self.findItems("masterLayer",
-                                                       QtCore.Qt.MatchExactly |
-                                                       QtCore.Qt.MatchRecursive,
-                                                       0)[0]
+        if not new_aovs:
+            event.accept()
+            return None
+
+        with self.scene_action("drop"):
+            # Setup all the aovs with a single batched operation
+            utils.add_aovs_to_render_layer(new_aovs, render_layer)
 
-                    master_layer_aovs = master_layer_item.data(2,
-                                                               QtCore.
-                                                               Qt.UserRole)
+            new_aov_names = [x["ui_Name"] for x in new_aovs]
 
-                    if ui_name not in master_layer_aovs:
-                        AovTreeItem(ui_name, master_layer_item, self)
-                        master_layer_aovs.append(ui_name)
-                        master_layer_item.setData(2,
-                                                  QtCore.Qt.UserRole,
-                                                  master_layer_aovs)
+            self.add_aov_items(render_layer, new_aov_names)
 
-            # Set the drop parent as expanded
-            drop_parent.setExpanded(True)
+            if render_layer != "masterLayer":
+                self.add_aov_items("masterLayer", new_aov_names)
 
-            # Set the drop parent data
-            drop_parent.setData(2, QtCore.Qt.UserRole, layer_aovs)
+        # Set the drop parent as expanded
+        self.setExpanded(drop_parent, True)
 
         event.accept()
 
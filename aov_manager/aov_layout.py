@@ -0,0 +1,274 @@
+import json
+
+import maya.cmds as cmds
+
+import scene_snapshot
+import shader_library
+import utils
+
+
+LAYOUT_VERSION = 1
+
+MASTER_LAYER = "masterLayer"
+
+
+class LayoutDiff(object):
+    """
+    Class holding the scene edits needed to match an aov layout
+    """
+    def __init__(self):
+        # aov data dictionaries of the aovs to create
+        self.created_aovs = []
+
+        # aiAOV nodes to delete
+        self.deleted_aovs = []
+
+        # node attribute -> master layer value
+        self.master_values = dict()
+
+        # node attribute -> {render layer: value}
+        self.layer_values = dict()
+
+        # Layout render layers which are not in the scene
+        self.missing_layers = []
+
+    def __nonzero__(self):
+        return bool(self.created_aovs or
+                    self.deleted_aovs or
+                    self.master_values or
+                    self.layer_values)
+
+
+def export_layout(snapshot=None):
+    """
+    Get the aov layout of the scene: every aov with its data type, preset
+    type and shader and the aovs enabled on every render layer
+
+    :param snapshot: an optional SceneSnapshot to read the layers from
+    :return: the layout dictionary
+    """
+
+    if snapshot is None:
+        snapshot = utils.get_scene_snapshot()
+
+    library = shader_library.get_library()
+
+    # Aovs created with an attribute id shader carry the attr_id attribute
+    attribute_id_aovs = set(x.split(".")[0] for x in
+                            cmds.ls(["%s.attr_id" % x for x in snapshot.aovs])
+                            or [])
+
+    layout_aovs = dict()
+
+    for aov in snapshot.aovs:
+        aov_name = scene_snapshot.aov_short_name(aov)
+
+        shaders = cmds.listConnections("%s.defaultValue" % aov,
+                                       source=True,
+                                       destination=False) or [None]
+
+        if aov in attribute_id_aovs:
+            aov_type = "<attrId>"
+        elif shaders[0] == shader_library.shader_name(aov_name) and \
+                library.preset(aov_name) is not None:
+            aov_type = "<presets>"
+        else:
+            aov_type = "<builtin>"
+
+        layout_aovs[aov_name] = {"type": aov_type,
+                                 "data": cmds.getAttr("%s.type" % aov,
+                                                      asString=True),
+                                 "shader": shaders[0]}
+
+    layout_layers = dict()
+
+    layout_layers[MASTER_LAYER] = [
+        scene_snapshot.aov_short_name(x) for x in snapshot.aovs
+        if snapshot.master_value("%s.enabled" % x)]
+
+    for render_layer, layer_aovs in snapshot.layer_aovs().items():
+        layout_layers[render_layer] = [x for x in layer_aovs
+                                       if x != "beauty"]
+
+    return {"version": LAYOUT_VERSION,
+            "aovs": layout_aovs,
+            "layers": layout_layers}
+
+
+def write_layout(layout_file, snapshot=None):
+    """
+    Export the scene aov layout to a file
+
+    :param layout_file: the json file path as a string
+    :param snapshot: an optional SceneSnapshot to read the layers from
+    :return: the layout dictionary
+    """
+
+    layout = export_layout(snapshot=snapshot)
+
+    with open(layout_file, "w") as f:
+        json.dump(layout, f, indent=4, sort_keys=True)
+
+    return layout
+
+
+def read_layout(layout_file):
+    """
+    Read an aov layout file
+
+    :param layout_file: the json file path as a string
+    :return: the layout dictionary
+    """
+
+    with open(layout_file) as f:
+        layout = json.load(f)
+
+    if layout.get("version", None) != LAYOUT_VERSION:
+        raise ValueError("%s is not a version %s aov layout" %
+                         (layout_file, LAYOUT_VERSION))
+
+    return layout
+
+
+def diff_layout(layout, snapshot, delete_aovs=False):
+    """
+    Compute the minimal scene edits needed to match an aov layout.
+    Render layers missing in the layout are left untouched and the master
+    layer values are only changed when the layout has a master layer
+
+    :param layout: the layout dictionary
+    :param snapshot: the SceneSnapshot to diff against
+    :param delete_aovs: bool used to delete the scene aovs missing in the
+    layout, they are kept by default
+    :return: a LayoutDiff object
+    """
+
+    diff = LayoutDiff()
+
+    layout_aovs = layout["aovs"]
+    layout_layers = layout["layers"]
+
+    scene_aovs = set(snapshot.aovs)
+
+    for aov_name in sorted(layout_aovs):
+        if "aiAOV_%s" % aov_name in scene_aovs:
+            continue
+
+        aov_data = layout_aovs[aov_name]
+
+        diff.created_aovs.append({"ui_Name": aov_name,
+                                  "aov_Name": "aiAOV_%s" % aov_name,
+                                  "type": aov_data.get("type", "<builtin>"),
+                                  "data": aov_data.get("data", None),
+                                  "shader": aov_data.get("shader", None)})
+
+    if delete_aovs:
+        diff.deleted_aovs = [x for x in snapshot.aovs
+                             if scene_snapshot.aov_short_name(x)
+                             not in layout_aovs]
+
+    render_layers = [x for x in sorted(layout_layers) if x != MASTER_LAYER]
+
+    diff.missing_layers = [x for x in render_layers
+                           if x not in snapshot.render_layers]
+
+    render_layers = [x for x in render_layers
+                     if x not in diff.missing_layers]
+
+    layer_aovs = dict((x, set(layout_layers[x])) for x in layout_layers)
+
+    for aov_name in sorted(layout_aovs):
+        node_attribute = "aiAOV_%s.enabled" % aov_name
+
+        # New aovs are created disabled and without overrides
+        if "aiAOV_%s" % aov_name in scene_aovs:
+            master_value = bool(snapshot.master_value(node_attribute))
+            layer_overrides = snapshot.overrides.get(node_attribute, {})
+        else:
+            master_value = False
+            layer_overrides = {}
+
+        if MASTER_LAYER in layer_aovs:
+            enabled = aov_name in layer_aovs[MASTER_LAYER]
+
+            if enabled != master_value:
+                diff.master_values[node_attribute] = enabled
+                master_value = enabled
+
+        # Layers without override follow the new master value
+        for render_layer in render_layers:
+            enabled = aov_name in layer_aovs[render_layer]
+            value = bool(layer_overrides.get(render_layer, master_value))
+
+            if enabled != value:
+                diff.layer_values.setdefault(node_attribute,
+                                             dict())[render_layer] = enabled
+
+    return diff
+
+
+def apply_layout(layout, snapshot=None, delete_aovs=False, procedural=None):
+    """
+    Make the scene match an aov layout.
+    The layout is diffed against a single scene read and only the needed
+    creates, deletes and override changes are run, in one undo chunk
+
+    :param layout: the layout dictionary
+    :param snapshot: an optional SceneSnapshot to diff against, it is kept up
+    to date with the applied changes
+    :param delete_aovs: bool used to delete the scene aovs missing in the
+    layout, they are kept by default
+    :param procedural: bool used to build the preset shaders from their
+    network description, shader_library.PROCEDURAL_SHADERS if None
+    :return: the applied LayoutDiff object
+    """
+
+    if snapshot is None:
+        snapshot = utils.get_scene_snapshot()
+
+    diff = diff_layout(layout, snapshot, delete_aovs=delete_aovs)
+
+    if not diff:
+        return diff
+
+    with utils.undo_chunk("apply_layout"):
+        if diff.deleted_aovs:
+            cmds.delete(*diff.deleted_aovs)
+
+            snapshot.aovs = [x for x in snapshot.aovs
+                             if x not in diff.deleted_aovs]
+
+        if diff.created_aovs:
+            created_aovs = utils.create_aovs(diff.created_aovs,
+                                             scene_aovs=set(snapshot.aovs),
+                                             procedural=procedural)
+
+            for aov in created_aovs:
+                snapshot.aovs.append(aov)
+                snapshot.values["%s.enabled" % aov] = False
+
+            _connect_layout_shaders(diff.created_aovs)
+
+        utils.set_master_layer_values(diff.master_values, snapshot)
+
+        utils.set_layers_overrides(diff.layer_values, snapshot=snapshot)
+
+    return diff
+
+
+def _connect_layout_shaders(aov_list):
+    # Shaders of the builtin aovs are linked when they are in the scene,
+    # preset and attribute id shaders are brought by the aov creation
+    shader_links = [(x["shader"], x["aov_Name"]) for x in aov_list
+                    if x["shader"] and x["type"] == "<builtin>"]
+
+    if not shader_links:
+        return
+
+    existing_shaders = set(cmds.ls([x[0] for x in shader_links]) or [])
+
+    for shader, aov in shader_links:
+        if shader in existing_shaders:
+            cmds.connectAttr("%s.outColor" % shader,
+                             "%s.defaultValue" % aov,
+                             force=True)
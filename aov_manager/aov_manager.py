@@ -1,4 +1,5 @@
 import json
+import logging
 import os
 
 import maya.cmds as cmds
@@ -6,35 +7,93 @@ import maya.cmds as cmds
 from PySide import QtGui, QtCore
 
 import utils
+import aov_registry
+import layer_members
+import visibility
 import pyside_util
 import main_ui
 import aov_presets_tree
 import aov_layers_tree
-
-reload(utils)
-reload(pyside_util)
-reload(aov_presets_tree)
-reload(aov_layers_tree)
+import scene_events
+import scene_snapshot
+import startup_profiler
+import instrumentation
+import debug_panel
+import job_scheduler
+
+
+logger = logging.getLogger(__name__)
+
+# Reload the tool modules on import while developing the tool
+DEV_MODE = os.environ.get("AOV_MANAGER_DEV_MODE", "0") == "1"
+
+# Every package module, each after the modules it imports so the reloaded
+# modules bind the reloaded dependencies
+DEV_MODULES = ["instrumentation",
+               "scene_events",
+               "scene_backend",
+               "shader_library",
+               "tree_data",
+               "startup_profiler",
+               "pyside_util",
+               "main_ui",
+               "aov_presets_tree",
+               "job_scheduler",
+               "debug_panel",
+               "scene_snapshot",
+               "aov_registry",
+               "layer_members",
+               "visibility",
+               "render_cost",
+               "utils",
+               "aov_audit",
+               "aov_layout",
+               "id_assignment",
+               "aov_layers_tree",
+               "batch"]
+
+if DEV_MODE:
+    for module_name in DEV_MODULES:
+        reload(__import__(module_name, globals()))
 
 
 class AovManagerDialog(QtGui.QDialog, main_ui.Ui_Form):
     """
     Class for the Aov Manager Dialog
     """
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, profiler=None):
         """
         Initialise AovManagerDialog
         Set window flags
-        Create content
+        Create content, the trees are filled by load_content
         :param parent: parent widget
+        :param profiler: the StartupProfiler timing the startup phases
         """
         super(AovManagerDialog, self).__init__(parent)
-        self.setupUi(self)
 
-        # Set Window Flags
-        pyside_util.set_linux_window_flags(self)
+        self.profiler = profiler or startup_profiler.StartupProfiler()
+
+        with self.profiler.phase("setup ui"):
+            self.setupUi(self)
+
+            # Set Window Flags
+            pyside_util.set_linux_window_flags(self)
+
+            self._ui_content()
+
+        self.aov_presets = None
+        self.aov_groups = None
+
+        self.scene_listener = None
 
-        self._ui_content()
+        # Phase durations of the last load, None until it finished
+        self.startup_report = None
+
+        self.instrumentation_panel = None
+
+        # Jobs filling the trees in slices between the maya events
+        self.scheduler = job_scheduler.get_scheduler()
+        self.load_job = None
 
     def _ui_content(self):
         """
@@ -43,16 +102,11 @@ class AovManagerDialog(QtGui.QDialog, main_ui.Ui_Form):
         :return:
         """
 
-        self.aov_presets = self._get_aov_presets_data()
-        self.aov_groups = utils.get_grouped_aovs()
-
-        self.prTreeList = aov_presets_tree.AovPresetsTreeView(self.aov_presets,
-                                                              self.aov_groups,
-                                                              parent=self)
-
+        self.prTreeList = aov_presets_tree.AovPresetsTreeView(parent=self)
         self.ly_presets.addWidget(self.prTreeList)
 
-        self.layers_tree = aov_layers_tree.AovLayersTreeView(parent=self)
+        self.layers_tree = aov_layers_tree.AovLayersTreeView(parent=self,
+                                                             populate=False)
         self.ly_scene_layers.addWidget(self.layers_tree)
 
         # Signals
@@ -64,12 +118,162 @@ class AovManagerDialog(QtGui.QDialog, main_ui.Ui_Form):
 
         self.btn_remove.clicked.connect(self._remove_aov_callback)
 
+        # Progress of the jobs filling the trees
+        self.progress_bar = QtGui.QProgressBar(self.fr_btns_bottom)
+        self.progress_bar.hide()
+        self.ly_btns_bottom.addWidget(self.progress_bar)
+
+        self.btn_cancel = QtGui.QPushButton("Cancel", self.fr_btns_bottom)
+        self.btn_cancel.clicked.connect(self._cancel_jobs)
+        self.btn_cancel.hide()
+        self.ly_btns_bottom.addWidget(self.btn_cancel)
+
+        # Debug panel for the recorded maya commands
+        if DEV_MODE or instrumentation.ENABLED_AT_STARTUP:
+            self.btn_debug = QtGui.QPushButton("Debug", self.fr_btns_bottom)
+            self.btn_debug.clicked.connect(self._show_debug_panel)
+            self.ly_btns_bottom.addWidget(self.btn_debug)
+
+        # Icons
+        self._set_icons()
+
+        return
+
+    def load_content(self):
+        """
+        Fill the dialog content with a scheduled job so the dialog is shown
+        and stays responsive while the presets and the scene are read
+
+        :return:
+        """
+
+        self.load_job = self.scheduler.submit(
+            job_scheduler.Job("load",
+                              self._load_content_steps,
+                              on_progress=self.show_job_progress,
+                              on_finished=self._load_finished))
+
+        return
+
+    def _load_content_steps(self, job):
+        """
+        Get the load steps, every phase is timed across the slices it runs in
+
+        :param job: the load Job
+        :return: a generator of steps
+        """
+
+        load_steps = [("arnold options", utils.create_arnold_options),
+                      ("presets tree", self._load_presets_tree),
+                      ("layers tree", self._load_layers_tree),
+                      ("scene listener", self._start_scene_listener)]
+
+        # Returned by next once the steps of a phase are done
+        phase_done = object()
+
+        for step_name, step_function in load_steps:
+            steps = job_scheduler.iter_steps(step_function)
+
+            while True:
+                with self.profiler.phase(step_name), \
+                        instrumentation.operation("load %s" % step_name):
+                    step = next(steps, phase_done)
+
+                if step is phase_done:
+                    break
+
+                yield
+
+    def _load_finished(self, job):
+        """
+        Log the startup report once every load step has run, it is also
+        printed in dev mode.
+        The scene listener is started even when the load was cancelled or
+        failed so the tree keeps in sync with the scene
+
+        :param job: the load Job
+        :return:
+        """
+
+        self._job_finished(job)
+
+        if self.scene_listener is None:
+            self._start_scene_listener()
+
+        if job.state == job_scheduler.FINISHED:
+            self.startup_report = self.profiler.report()
+            logger.info(self.startup_report)
+
+            if DEV_MODE:
+                print self.startup_report
+
+        return
+
+    def _load_presets_tree(self):
+        """
+        Read the aov presets and fill the presets tree a group at a time
+
+        :return: a generator of steps
+        """
+
+        self.aov_presets = self._get_aov_presets_data()
+
+        # Rebuild the cached mtoa aovs when plugins change
+        aov_registry.get_registry().watch()
+        self.aov_groups = utils.get_grouped_aovs()
+
+        steps = self.prTreeList.presets_steps(self.aov_presets,
+                                              self.aov_groups)
+
         self.prTreeList.connect(self.prTreeList.selectionModel(),
                                 QtCore.SIGNAL('selectionChanged(QItemSelection, QItemSelection)'),
                                 self._select_preset_callback)
 
-        # Icons
-        self._set_icons()
+        for step in steps:
+            step()
+            yield
+
+    def _load_layers_tree(self):
+        """
+        Read the scene and fill the layers tree
+
+        :return: a generator of steps
+        """
+
+        return self.layers_tree.populate_steps()
+
+    def _start_scene_listener(self):
+        """
+        Keep the layers tree in sync with the scene
+
+        :return:
+        """
+
+        snapshot = self.layers_tree.snapshot
+
+        # The load was cancelled before the layers tree read the scene
+        if snapshot is None:
+            snapshot = utils.get_scene_snapshot()
+
+        self.scene_listener = scene_events.SceneEventListener(
+            self._scene_changed_callback)
+
+        render_layers = ["defaultRenderLayer"] + snapshot.render_layers
+
+        scene_nodes = {"aiAOV": snapshot.aovs,
+                       "renderLayer": render_layers}
+
+        # The arnold driver only exists once the render settings are set
+        for node_type, node in scene_events.RENDER_SETTINGS_NODES.items():
+            scene_nodes[node_type] = cmds.ls(node)
+
+        self.scene_listener.start(scene_nodes)
+
+        # Keep the resolved render layer members until they change
+        layer_members.get_resolver().watch(render_layers=render_layers)
+
+        # Keep the override sets read until they change
+        visibility.get_evaluator().watch()
 
         return
 
@@ -89,12 +293,125 @@ class AovManagerDialog(QtGui.QDialog, main_ui.Ui_Form):
 
         return
 
+    def _show_debug_panel(self):
+        """
+        Show the panel listing the recorded maya commands
+
+        :return:
+        """
+
+        if self.instrumentation_panel is None:
+            self.instrumentation_panel = debug_panel.InstrumentationPanel(
+                parent=self)
+
+        self.instrumentation_panel.refresh()
+        self.instrumentation_panel.show()
+
+        return
+
+    def show_job_progress(self, job):
+        """
+        Show the progress of a job filling the trees
+
+        :param job: a Job object
+        :return:
+        """
+
+        progress = job.progress()
+
+        # A busy indicator until the job knows its size
+        if progress is None:
+            self.progress_bar.setRange(0, 0)
+        else:
+            self.progress_bar.setRange(0, 100)
+            self.progress_bar.setValue(int(progress * 100))
+
+        self.progress_bar.setFormat("%s %%p%%" % job.name)
+
+        self.progress_bar.show()
+        self.btn_cancel.show()
+
+        return
+
+    def _job_finished(self, job):
+        """
+        Hide the progress once no job is left
+
+        :param job: the finished Job
+        :return:
+        """
+
+        if not self.scheduler.is_busy():
+            self.progress_bar.hide()
+            self.btn_cancel.hide()
+
+        return
+
+    def _cancel_jobs(self):
+        """
+        Callback for the cancel button, stop the jobs filling the trees
+
+        :return:
+        """
+
+        self.scheduler.cancel()
+
+        self._job_finished(None)
+
+        return
+
     def _refresh_layers_content(self):
         """
         Refresh the render layers aov items
         :return:
         """
-        self.layers_tree.tree_content()
+        self.layers_tree.populate(scheduler=self.scheduler,
+                                  name="refresh",
+                                  on_progress=self.show_job_progress,
+                                  on_finished=self._job_finished)
+
+        return
+
+    def _scene_changed_callback(self, changes):
+        """
+        Callback for the debounced scene changes.
+        Only the added aovs, the changed adjustments and attributes are read
+        into the snapshot, render layer changes read the whole scene and aov
+        data type changes only update the cost of the aovs
+
+        :param changes: a SceneChanges object
+        :return:
+        """
+
+        snapshot = self.layers_tree.snapshot
+
+        # New layers are read by a job filling the tree in slices
+        if snapshot is None or changes.structure_changed():
+            self.layers_tree.populate(scheduler=self.scheduler,
+                                      name="scene change",
+                                      on_progress=self.show_job_progress,
+                                      on_finished=self._job_finished)
+            return
+
+        added_aovs = changes.added("aiAOV")
+        retyped_aovs = changes.changed("type")
+
+        with instrumentation.operation("scene change"):
+            snapshot.remove_aovs(changes.removed("aiAOV"))
+            snapshot.add_aovs(added_aovs)
+
+            snapshot.refresh_adjustments(changes.adjustment_plugs())
+            snapshot.refresh_attributes(
+                changes.attribute_values() +
+                ["%s.%s" % (x, y) for x in added_aovs
+                 for y in ["enabled", "type"]])
+
+            if len(retyped_aovs) == len(changes.attributes_changed) and \
+                    not changes.nodes_added and not changes.nodes_removed:
+                self.layers_tree.model().update_aov_costs(
+                    [scene_snapshot.aov_short_name(x) for x in retyped_aovs])
+            else:
+                self.layers_tree.tree_content(snapshot=snapshot)
 
         return
 
@@ -114,50 +431,36 @@ class AovManagerDialog(QtGui.QDialog, main_ui.Ui_Form):
         :return:
         """
 
-        selected_items = self.layers_tree.selectedItems()
-
-        if selected_items is None:
-            return
-
-        selected_aovs = [x for x in selected_items
-                         if x.data(0, QtCore.Qt.UserRole) == "aov"] or None
+        selected_aovs = self.layers_tree.selected_aovs() or None
 
         if selected_aovs is None:
             return
 
         invalid_aovs = []
 
-        for aov_item in selected_aovs:
-            layer_item = aov_item.parent()
-            render_layer = layer_item.data(1, QtCore.Qt.UserRole)
-
-            if render_layer == "masterLayer":
-                continue
-
-            aov_name = aov_item.data(1, QtCore.Qt.UserRole)
+        with self.layers_tree.scene_action("disable"):
+            # Resolve the master layer value of every selected aov at once
+            aov_names = list(set(["aiAOV_%s" % x[1] for x in selected_aovs]))
+            master_values = utils.get_master_layer_values(aov_names)
 
-            # Check the master layer override
-            master_value = utils.get_master_layer_value(aov_name)
+            for render_layer, item_name in selected_aovs:
+                if render_layer == "masterLayer":
+                    continue
 
-            # If the aov is Enabled on the master layer we don't disable it
-            if master_value:
-                invalid_aovs.append(aov_name)
-                continue
+                aov_name = "aiAOV_%s" % item_name
 
-            # Remove the layer override for the AOV
-            cmds.editRenderLayerAdjustment("%s.enabled" % aov_name,
-                                           layer=render_layer,
-                                           remove=True)
+                # If the aov is Enabled on the master layer we don't disable it
+                if master_values[aov_name]:
+                    invalid_aovs.append(aov_name)
+                    continue
 
-            item_name = aov_item.data(2, QtCore.Qt.UserRole)
-
-            # Remove item from tree
-            aov_item.parent().removeChild(aov_item)
-            aov_item = None
+                # Remove the layer override for the AOV
+                cmds.editRenderLayerAdjustment("%s.enabled" % aov_name,
+                                               layer=render_layer,
+                                               remove=True)
 
-            layer_data = layer_item.data(2, QtCore.Qt.UserRole)
-            layer_data.remove(item_name)
-            layer_item.setData(2, QtCore.Qt.UserRole, layer_data)
+                # Remove item from tree
+                self.layers_tree.remove_aov_item(render_layer, item_name)
 
         if not invalid_aovs:
             return
@@ -182,33 +485,28 @@ class AovManagerDialog(QtGui.QDialog, main_ui.Ui_Form):
         :return:
         """
 
-        selected_items = self.layers_tree.selectedItems()
-
-        if selected_items is None:
-            return
-
-        selected_aovs = [x for x in selected_items
-                         if x.data(0, QtCore.Qt.UserRole) == "aov"] or None
+        selected_aovs = self.layers_tree.selected_aovs() or None
 
         if selected_aovs is None:
             return
 
-        render_layers = [x for x in cmds.ls(type="renderLayer")
-                         if "defaultRenderLayer" not in x]
+        aov_names = list(set([x[1] for x in selected_aovs]))
 
-        for aov_item in selected_aovs:
-            aov_name = aov_item.data(1, QtCore.Qt.UserRole)
+        aov_nodes = ["aiAOV_%s" % x for x in aov_names]
 
-            # Remove aov layer override for all layers
-            for rLayer in render_layers:
-                cmds.editRenderLayerAdjustment("%s.enabled" % aov_name,
-                                               layer=rLayer,
-                                               remove=True)
+        with self.layers_tree.scene_action("disable all"):
+            snapshot = self.layers_tree.snapshot
+
+            # Aovs dropped and layers switched since the last refresh aren't
+            # in the snapshot yet
+            if snapshot is not None:
+                snapshot.refresh_attributes(["%s.enabled" % x
+                                             for x in aov_nodes])
 
-            # Set the Aov as disabled
-            cmds.setAttr("%s.enabled" % aov_name, 0)
+            # Remove the existing aov layer overrides and disable the aovs
+            utils.disable_aovs_for_all_layers(aov_nodes, snapshot=snapshot)
 
-        self._refresh_layers_content()
+            self.layers_tree.remove_aov_items_from_layers(aov_names)
 
         return
 
@@ -218,9 +516,9 @@ class AovManagerDialog(QtGui.QDialog, main_ui.Ui_Form):
         :return:
         """
 
-        selected_items = self.layers_tree.selectedItems()
+        selected_aovs = self.layers_tree.selected_aovs() or None
 
-        if selected_items is None:
+        if selected_aovs is None:
             return
 
         # Warn the user before going ahead and removing the AOVS from the scene
@@ -235,19 +533,12 @@ class AovManagerDialog(QtGui.QDialog, main_ui.Ui_Form):
         if user_input == QtGui.QMessageBox.Cancel:
             return
 
-        selected_aovs = [x for x in selected_items
-                         if x.data(0, QtCore.Qt.UserRole) == "aov"] or None
+        with self.layers_tree.scene_action("remove"):
+            for aov_name in set(["aiAOV_%s" % x[1] for x in selected_aovs]):
+                if cmds.objExists(aov_name):
+                    cmds.delete(aov_name)
 
-        if selected_aovs is None:
-            return
-
-        for aovItem in selected_aovs:
-            aov_name = aovItem.data(1, QtCore.Qt.UserRole)
-
-            if cmds.objExists(aov_name):
-                cmds.delete(aov_name)
-
-        self._refresh_layers_content()
+            self._refresh_layers_content()
 
         return
 
@@ -266,6 +557,28 @@ class AovManagerDialog(QtGui.QDialog, main_ui.Ui_Form):
 
         return aov_dict
 
+    def closeEvent(self, event):
+        """
+        PySide close event
+        Stop loading and remove the scene callbacks before closing
+
+        :param event:
+        :return:
+        """
+
+        self.scheduler.cancel()
+
+        if self.scene_listener is not None:
+            self.scene_listener.stop()
+
+        aov_registry.get_registry().unwatch()
+        layer_members.get_resolver().unwatch()
+        visibility.get_evaluator().unwatch()
+
+        super(AovManagerDialog, self).closeEvent(event)
+
+        return
+
     def keyPressEvent(self, event):
         """
         PySide key press event
@@ -285,15 +598,26 @@ def main():
     """
     Main entry point for the aov manager tool
 
-    :return:
+    :return: the AovManagerDialog, its startup report is kept once loaded
     """
 
-    # Create arnold options before loading the UI
-    utils.create_arnold_options()
+    profiler = startup_profiler.StartupProfiler()
+
+    if instrumentation.ENABLED_AT_STARTUP:
+        instrumentation.get_instrumentation().enable()
+
+    with profiler.phase("parent window"):
+        parent = pyside_util.get_maya_window_by_name("aov_manager_ui")
+
+    ui = AovManagerDialog(parent=parent, profiler=profiler)
+
+    with profiler.phase("show"):
+        ui.show()
+
+    # Arnold options are created before the trees are filled
+    ui.load_content()
 
-    parent = pyside_util.get_maya_window_by_name("aov_manager_ui")
-    ui = AovManagerDialog(parent=parent)
-    ui.show()
+    return ui
 
 
 if __name__ == '__main__':
@@ -1,59 +1,232 @@
+import functools
 import json
 
 from PySide import QtGui, QtCore
 
 
-class AovPresetItem(QtGui.QTreeWidgetItem):
-    """
-    Class to create an TreeWidgetItem for the aovs added to the presets
-    tree view
+# Parent pointer of the group rows, aov rows point to their PresetGroup
+ROOT = object()
+
+# Fields of the aov preset tuples
+UI_NAME, AOV_NAME, AOV_TYPE, DATA_TYPE, EDIT = range(5)
+
 
+class PresetGroup(object):
     """
-    def __init__(self,
-                 ui_name,
-                 aov_name,
-                 aov_type,
-                 data_type,
-                 edit,
-                 parent,
-                 tree):
-        QtGui.QTreeWidgetItem.__init__(self, parent)
-        self.tree = tree
-
-        font = QtGui.QFont()
-        font.setPointSize(10)
-
-        self.setText(0, ui_name)
-        self.setText(1, aov_type)
-        self.setFont(0, font)
-
-        self.setData(0, QtCore.Qt.UserRole, "aov_pr")
-        self.setData(1, QtCore.Qt.UserRole, aov_name)
-        self.setData(2, QtCore.Qt.UserRole, aov_type)
-        self.setData(3, QtCore.Qt.UserRole, data_type)
-
-        if edit:
-            self.setFlags(QtCore.Qt.ItemIsEditable |
-                          QtCore.Qt.ItemIsEnabled |
-                          QtCore.Qt.ItemIsSelectable |
-                          QtCore.Qt.ItemIsDragEnabled)
-        else:
-            self.setFlags(QtCore.Qt.ItemIsEnabled |
-                          QtCore.Qt.ItemIsSelectable |
-                          QtCore.Qt.ItemIsDragEnabled)
+    Class holding a preset group name and its aov preset tuples
+    """
+    __slots__ = ["name", "aovs"]
 
+    def __init__(self, name, aovs):
+        self.name = name
+        self.aovs = aovs
 
-class AovPresetsTreeView(QtGui.QTreeWidget):
+
+class AovPresetsModel(QtCore.QAbstractItemModel):
     """
-    Tree Widget Class to create the aov presets tree
+    Item model for the aov presets tree.
+    Each aov preset is stored as a tuple under its group, rows are served
+    from them without creating item objects
     """
+    _aov_font = None
+
     def __init__(self, aov_presets, aov_groups, parent=None):
         """
-        Initialise Tree Widget
+        Initialise the model
+
+        :param aov_presets: dictionary for the aov presets data
+        :param aov_groups: dictionary for the aov groups data
+        :param parent: parent object
+        """
+        super(AovPresetsModel, self).__init__(parent)
+
+        # Fonts are shared by every row
+        if AovPresetsModel._aov_font is None:
+            AovPresetsModel._aov_font = QtGui.QFont()
+            AovPresetsModel._aov_font.setPointSize(10)
+
+        self.groups = []
+
+        for aov_data in [aov_presets, aov_groups]:
+            for aov_group in aov_data.keys():
+                self.groups.append(PresetGroup(aov_group,
+                                               preset_tuples(aov_data[aov_group])))
+
+    def add_group(self, name, aov_list):
+        """
+        Append a preset group row
+
+        :param name: the group name as a string
+        :param aov_list: a list of aov data dictionaries
+        :return:
+        """
+
+        row = len(self.groups)
+
+        self.beginInsertRows(QtCore.QModelIndex(), row, row)
+        self.groups.append(PresetGroup(name, preset_tuples(aov_list)))
+        self.endInsertRows()
+
+        return
+
+    def index(self, row, column, parent=QtCore.QModelIndex()):
+        if not self.hasIndex(row, column, parent):
+            return QtCore.QModelIndex()
+
+        if not parent.isValid():
+            return self.createIndex(row, column, ROOT)
+
+        return self.createIndex(row, column, self.groups[parent.row()])
+
+    def parent(self, index):
+        if not index.isValid():
+            return QtCore.QModelIndex()
+
+        group = index.internalPointer()
+
+        if group is ROOT:
+            return QtCore.QModelIndex()
+
+        return self.createIndex(self.groups.index(group), 0, ROOT)
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if not parent.isValid():
+            return len(self.groups)
+
+        if parent.internalPointer() is ROOT:
+            return len(self.groups[parent.row()].aovs)
+
+        return 0
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return 1
+
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        if role == QtCore.Qt.DisplayRole and \
+                orientation == QtCore.Qt.Horizontal:
+            return "AOV PRESETS"
+
+        return None
+
+    def flags(self, index):
+        if not index.isValid():
+            return QtCore.Qt.NoItemFlags
+
+        if self.is_group(index):
+            return QtCore.Qt.ItemIsEnabled | QtCore.Qt.ItemIsSelectable
+
+        flags = (QtCore.Qt.ItemIsEnabled |
+                 QtCore.Qt.ItemIsSelectable |
+                 QtCore.Qt.ItemIsDragEnabled)
+
+        if self.aov_preset(index)[EDIT]:
+            flags |= QtCore.Qt.ItemIsEditable
+
+        return flags
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+
+        if self.is_group(index):
+            if role == QtCore.Qt.DisplayRole:
+                return self.groups[index.row()].name
+
+            return None
+
+        aov_preset = self.aov_preset(index)
+
+        if role in [QtCore.Qt.DisplayRole, QtCore.Qt.EditRole]:
+            return aov_preset[UI_NAME]
+
+        if role == QtCore.Qt.FontRole:
+            return self._aov_font
+
+        if role == QtCore.Qt.UserRole:
+            return "aov_pr"
+
+        return None
+
+    def setData(self, index, value, role=QtCore.Qt.EditRole):
+        if role != QtCore.Qt.EditRole or self.is_group(index):
+            return False
+
+        group = index.internalPointer()
+        aov_preset = list(group.aovs[index.row()])
+        aov_preset[UI_NAME] = value
+
+        group.aovs[index.row()] = tuple(aov_preset)
+
+        self.dataChanged.emit(index, index)
+
+        return True
+
+    def mimeTypes(self):
+        return ["application/leftdrag"]
+
+    def mimeData(self, indexes):
+        aov_list = []
+
+        for index in indexes:
+            if self.is_group(index):
+                continue
+
+            aov_preset = self.aov_preset(index)
+
+            aov_dict = dict()
+
+            ui_name = aov_preset[UI_NAME]
+
+            # FIXME: temp solution for id aov name changed
+            aov_name = "aiAOV_%s" % ui_name
+            # aov_name = aov_preset[AOV_NAME]
+
+            aov_dict["ui_Name"] = ui_name
+            aov_dict["aov_Name"] = aov_name
+            aov_dict["type"] = aov_preset[AOV_TYPE]
+            aov_dict["data"] = aov_preset[DATA_TYPE]
+
+            aov_list.append(aov_dict)
+
+        mime_data = QtCore.QMimeData()
+        mime_data.setData("application/leftdrag",
+                          QtCore.QByteArray(json.dumps(aov_list)))
+
+        return mime_data
+
+    def is_group(self, index):
+        """
+        Check if an index is a group row
+
+        :param index: a QModelIndex
+        :return: a bool
+        """
+
+        return index.internalPointer() is ROOT
+
+    def aov_preset(self, index):
+        """
+        Get the aov preset tuple of an aov row
+
+        :param index: a QModelIndex
+        :return: a (ui_name, aov_name, aov_type, data_type, edit) tuple
+        """
+
+        return index.internalPointer().aovs[index.row()]
+
+
+class AovPresetsTreeView(QtGui.QTreeView):
+    """
+    Tree View Class to create the aov presets tree
+    """
+    def __init__(self, aov_presets=None, aov_groups=None, parent=None):
+        """
+        Initialise Tree View
         Create variables
         Ui settings and tree content
 
-        :param aov_presets: dictionary for the aov presets data
+        :param aov_presets: dictionary for the aov presets data, the tree is
+        left empty until set_presets is called if None
         :param aov_groups: dictionary for the aov groups data
         :param parent: parent widget
         """
@@ -61,29 +234,23 @@ class AovPresetsTreeView(QtGui.QTreeWidget):
 
         self.ui = parent
 
-        self.aov_presets = aov_presets
-        self.aov_groups = aov_groups
+        self.aov_presets = None
+        self.aov_groups = None
 
         self._ui_settings()
 
-        self._tree_content()
+        if aov_presets is not None:
+            self.set_presets(aov_presets, aov_groups or {})
 
     def _ui_settings(self):
         """
-        UI settings for the tree widget.
-        Setup the header text and size
+        UI settings for the tree view.
         Drag an drop mode
         Selection mode
 
         :return:
         """
 
-        # Header text
-        self.headerItem().setText(0, "AOV PRESETS")
-
-        # Header size
-        self.header().resizeSection(0, 180)
-
         self.setDragDropMode(QtGui.QAbstractItemView.DragDrop)
         self.setDefaultDropAction(QtCore.Qt.IgnoreAction)
 
@@ -92,56 +259,56 @@ class AovPresetsTreeView(QtGui.QTreeWidget):
 
         return
 
-    def _tree_content(self):
+    def set_presets(self, aov_presets, aov_groups):
         """
-        Set the tree content
+        Set the aov presets shown by the tree
 
+        :param aov_presets: dictionary for the aov presets data
+        :param aov_groups: dictionary for the aov groups data
         :return:
         """
 
-        self.clear()
+        for step in self.presets_steps(aov_presets, aov_groups):
+            step()
 
-        font = QtGui.QFont()
-        font.setPointSize(10)
+        return
 
-        for aov_group in self.aov_presets.keys():
-            self._add_aov_group_item(self.aov_presets, aov_group)
+    def presets_steps(self, aov_presets, aov_groups):
+        """
+        Set an empty tree and get the steps adding the preset groups, so
+        they can be added apart like set_presets does at once
 
-        for aov_group in self.aov_groups.keys():
-            self._add_aov_group_item(self.aov_groups, aov_group)
+        :param aov_presets: dictionary for the aov presets data
+        :param aov_groups: dictionary for the aov groups data
+        :return: a list of functions adding a group each
+        """
 
-        return
+        self.aov_presets = aov_presets
+        self.aov_groups = aov_groups
 
-    def _add_aov_group_item(self, aov_list, aov_group):
-        """
+        self._tree_content()
 
+        steps = []
 
-        :param aov_list:
-        :param aov_group:
-        :return:
-        """
+        for aov_data in [aov_presets, aov_groups]:
+            for aov_group in aov_data.keys():
+                steps.append(functools.partial(self.model().add_group,
+                                               aov_group,
+                                               aov_data[aov_group]))
 
-        group_item = QtGui.QTreeWidgetItem(self)
+        return steps
 
-        group_item.setText(0, aov_group)
+    def _tree_content(self):
+        """
+        Set an empty tree content
 
-        for aov_data in aov_list[aov_group]:
-            ui_name = aov_data.get("ui_Name", None)
-            aov_name = aov_data.get("aov_Name", None)
-            edit = aov_data.get("edit", False)
-            aov_type = aov_data.get("type", "")
-            data_type = aov_data.get("data", None)
+        :return:
+        """
 
-            if ui_name is None or aov_name is None:
-                continue
+        self.setModel(AovPresetsModel({}, {}, self))
 
-            AovPresetItem(ui_name,
-                          aov_name,
-                          aov_type,
-                          data_type,
-                          edit,
-                          group_item,
-                          self)
+        # Header size
+        self.header().resizeSection(0, 180)
 
         return
 
@@ -153,38 +320,10 @@ class AovPresetsTreeView(QtGui.QTreeWidget):
         :return:
         """
 
-        md = event.mimeData()
-
-        selected_aov_items = [x for x in self.selectedItems()
-                              if "aov" in x.data(0, QtCore.Qt.UserRole)] or None
-
-        if selected_aov_items is None:
+        if not event.mimeData().hasFormat("application/leftdrag"):
             event.ignore()
             return
 
-        aov_list = []
-
-        for aov in selected_aov_items:
-            aov_dict = dict()
-
-            ui_name = aov.text(0)
-
-            # FIXME: temp solution for id aov name changed
-            aov_name = "aiAOV_%s" % aov.text(0)
-            # aov_name = aov.data(1, QtCore.Qt.UserRole)\
-
-            aov_type = aov.data(2, QtCore.Qt.UserRole)
-            data_type = aov.data(3, QtCore.Qt.UserRole)
-
-            aov_dict["ui_Name"] = ui_name
-            aov_dict["aov_Name"] = aov_name
-            aov_dict["type"] = aov_type
-            aov_dict["data"] = data_type
-
-            aov_list.append(aov_dict)
-
-        ba = QtCore.QByteArray(json.dumps(aov_list))
-        md.setData("application/leftdrag", ba)
         event.accept()
 
     def dropEvent(self, event):
@@ -209,3 +348,28 @@ class AovPresetsTreeView(QtGui.QTreeWidget):
         event.accept()
 
         return None
+
+
+def preset_tuples(aov_list):
+    """
+    Get the aov preset tuples of a preset group
+
+    :param aov_list: a list of aov data dictionaries
+    :return: a list of (ui_name, aov_name, aov_type, data_type, edit) tuples
+    """
+
+    aov_presets = []
+
+    for aov_data in aov_list:
+        ui_name = aov_data.get("ui_Name", None)
+        aov_name = aov_data.get("aov_Name", None)
+        edit = aov_data.get("edit", False)
+        aov_type = aov_data.get("type", "")
+        data_type = aov_data.get("data", None)
+
+        if ui_name is None or aov_name is None:
+            continue
+
+        aov_presets.append((ui_name, aov_name, aov_type, data_type, edit))
+
+    return aov_presets
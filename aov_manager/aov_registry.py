@@ -0,0 +1,233 @@
+import json
+import os
+
+import maya.cmds as cmds
+from mtoa import aovs
+
+import scene_events
+
+
+# Folder holding the files kept between sessions
+CACHE_FOLDER = os.environ.get("AOV_MANAGER_CACHE",
+                              os.path.join(os.path.expanduser("~"),
+                                           ".aov_manager"))
+
+CACHE_FILE = os.path.join(CACHE_FOLDER, "aov_registry.json")
+
+# Reloading the module replaces the shared cache, the plugin callbacks of the
+# previous one are removed first
+if globals().get("_registry", None) is not None:
+    _registry.unwatch()
+
+_registry = None
+
+
+class AovRegistryCache(object):
+    """
+    Class caching the mtoa aov registry.
+    The grouped aovs are keyed by the loaded plugins and the mtoa version and
+    kept on disk between sessions. While watching the plugin callbacks the
+    cached aovs are served without checking the key
+    """
+    def __init__(self, cache_file=CACHE_FILE):
+        """
+        Initialise the cache
+
+        :param cache_file: the file the registry is kept in between sessions
+        """
+
+        self.cache_file = cache_file
+
+        self._key = None
+        self._grouped_aovs = None
+
+        self._registry = None
+        self._callback_ids = []
+
+    def grouped_aovs(self, force_rebuild=False):
+        """
+        Get the available mtoa aovs grouped under their categories.
+        The returned dictionary is shared and should not be modified
+
+        :param force_rebuild: bool used to walk the mtoa registry again
+        :return: a dictionary where keys are aov category and values a list
+        of aovs
+        """
+
+        if force_rebuild:
+            return self.rebuild()
+
+        if self._grouped_aovs is not None and self.is_watching():
+            return self._grouped_aovs
+
+        key = registry_key()
+
+        if self._grouped_aovs is not None and key == self._key:
+            return self._grouped_aovs
+
+        grouped_aovs = self._read_cache_file(key)
+
+        if grouped_aovs is None:
+            return self.rebuild(key=key)
+
+        self._key = key
+        self._grouped_aovs = grouped_aovs
+
+        return self._grouped_aovs
+
+    def rebuild(self, key=None):
+        """
+        Walk the mtoa registry again and store it in the cache file
+
+        :param key: the registry key, read from maya if None
+        :return: the grouped aovs dictionary
+        """
+
+        self._key = key or registry_key()
+        self._grouped_aovs = read_grouped_aovs()
+
+        self._write_cache_file()
+
+        return self._grouped_aovs
+
+    def invalidate(self):
+        """
+        Drop the cached aovs held in memory, the registry key is checked again
+        on the next request
+
+        :return:
+        """
+
+        self._key = None
+        self._grouped_aovs = None
+
+        return
+
+    def watch(self, registry=None):
+        """
+        Invalidate the cache when plugins are loaded or unloaded
+
+        :param registry: the callback registry, MayaCallbackRegistry if None
+        :return:
+        """
+
+        if self.is_watching():
+            return
+
+        self._registry = registry or scene_events.MayaCallbackRegistry()
+
+        def plugin_changed(plugin_name):
+            self.invalidate()
+
+        self._callback_ids = [
+            self._registry.add_plugin_loaded_callback(plugin_changed),
+            self._registry.add_plugin_unloaded_callback(plugin_changed)]
+
+        return
+
+    def unwatch(self):
+        """
+        Remove the plugin callbacks
+
+        :return:
+        """
+
+        for callback_id in self._callback_ids:
+            self._registry.remove_callback(callback_id)
+
+        self._registry = None
+        self._callback_ids = []
+
+        return
+
+    def is_watching(self):
+        """
+        Check if the plugin callbacks are registered
+
+        :return: a bool
+        """
+
+        return bool(self._callback_ids)
+
+    def _read_cache_file(self, key):
+        try:
+            with open(self.cache_file) as f:
+                cache_data = json.load(f)
+        except (IOError, OSError, ValueError):
+            return None
+
+        if cache_data.get("key", None) != key:
+            return None
+
+        return cache_data.get("grouped_aovs", None)
+
+    def _write_cache_file(self):
+        # The cache is only a speed up, failing to write it isn't an error
+        try:
+            cache_folder = os.path.dirname(self.cache_file)
+
+            if not os.path.isdir(cache_folder):
+                os.makedirs(cache_folder)
+
+            with open(self.cache_file, "w") as f:
+                json.dump({"key": self._key,
+                           "grouped_aovs": self._grouped_aovs}, f)
+        except (IOError, OSError):
+            pass
+
+
+def get_registry():
+    """
+    Get the shared aov registry cache
+
+    :return: an AovRegistryCache object
+    """
+
+    global _registry
+
+    if _registry is None:
+        _registry = AovRegistryCache()
+
+    return _registry
+
+
+def registry_key():
+    """
+    Get the key the aov registry is cached under, built from the loaded
+    plugins and the mtoa version
+
+    :return: the key as a string
+    """
+
+    plugins = sorted(cmds.pluginInfo(query=True, listPlugins=True) or [])
+    mtoa_version = cmds.pluginInfo("mtoa", query=True, version=True)
+
+    return "mtoa-%s:%s" % (mtoa_version, ",".join(plugins))
+
+
+def read_grouped_aovs():
+    """
+    Walk the mtoa registry for the aovs grouped under their categories
+
+    :return: a dictionary where keys are aov category and values a list of aovs
+    """
+
+    aov_groups = sorted(set(aovs.getNodeTypesWithAOVs()))
+
+    aovs_dict = dict()
+
+    for aovGrp in aov_groups:
+        group_list = []
+
+        aov_list = [x for x in aovs.getRegisteredAOVs(nodeType=aovGrp) if x]
+
+        for aov in aov_list:
+            aov_data = {"ui_Name": aov,
+                        "aov_Name": "aiAOV_%s" % aov,
+                        "type": aovGrp}
+
+            group_list.append(aov_data)
+
+        aovs_dict[aovGrp] = group_list
+
+    return aovs_dict
@@ -0,0 +1,426 @@
+import json
+import multiprocessing
+import os
+from timeit import default_timer
+
+
+PRESETS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            "aov_presets_data.json")
+
+# Seconds a worker process is given for a scene before it is reported as
+# failed, a worker crashing hard never returns its scene result
+SCENE_TIMEOUT = 3600
+
+
+def initialize_maya():
+    """
+    Start a standalone maya session with mtoa loaded, used to initialise the
+    worker processes
+
+    :return:
+    """
+
+    import maya.standalone
+    maya.standalone.initialize(name="python")
+
+    import maya.cmds as cmds
+    cmds.loadPlugin("mtoa", quiet=True)
+
+    return
+
+
+def load_assignment(assignment_file):
+    """
+    Load an aov assignment file.
+    The file holds a "layers" dictionary where keys are render layer names
+    and values lists of aovs, given by name or as aov data dictionaries.
+    Aov layout files exported from a scene are assignments too
+
+    :param assignment_file: the json file path as a string
+    :return: the assignment dictionary
+    """
+
+    with open(assignment_file) as f:
+        assignment = json.load(f)
+
+    if not isinstance(assignment.get("layers", None), dict):
+        raise ValueError("%s has no layers dictionary" % assignment_file)
+
+    return assignment
+
+
+def load_aov_presets():
+    """
+    Load the aov presets data
+
+    :return: dictionary for the aov presets data
+    """
+
+    with open(PRESETS_FILE) as f:
+        aov_presets = json.load(f)
+
+    return aov_presets
+
+
+def get_aov_data_list(aov_entries, aov_presets):
+    """
+    Get the aov data dictionaries used to add aovs to a render layer.
+    Aovs given by name take their type and data from the presets, aovs
+    missing in the presets are builtin aovs
+
+    :param aov_entries: a list of aov names or aov data dictionaries
+    :param aov_presets: dictionary for the aov presets data
+    :return: a list of aov data dictionaries with the ui_Name, aov_Name, type
+    and data keys
+    """
+
+    presets = dict()
+
+    for preset_list in aov_presets.values():
+        for preset in preset_list:
+            presets[preset["ui_Name"]] = preset
+
+    aov_list = []
+
+    for aov_entry in aov_entries:
+        if not isinstance(aov_entry, dict):
+            aov_entry = {"ui_Name": aov_entry}
+
+        ui_name = aov_entry["ui_Name"]
+        preset = presets.get(ui_name, {})
+
+        aov_list.append({"ui_Name": ui_name,
+                         "aov_Name": "aiAOV_%s" % ui_name,
+                         "type": aov_entry.get("type",
+                                               preset.get("type", "<builtin>")),
+                         "data": aov_entry.get("data",
+                                               preset.get("data", None))})
+
+    return aov_list
+
+
+def apply_assignment(assignment,
+                     aov_presets=None,
+                     delete_aovs=False,
+                     procedural=None):
+    """
+    Enable the aovs of an assignment on the render layers of the open scene.
+    Aov layouts make the scene match the layout.
+    Render layers missing in the scene are skipped and reported
+
+    :param assignment: the assignment dictionary
+    :param aov_presets: dictionary for the aov presets data, read from the
+    presets file if None
+    :param delete_aovs: bool used to delete the scene aovs missing in an aov
+    layout, they are kept by default
+    :param procedural: bool used to build the preset shaders from their
+    network description, shader_library.PROCEDURAL_SHADERS if None
+    :return: dictionary with the lists of created_aovs and deleted_aovs
+    aiAOV node names and of the missing_layers render layer names
+    """
+
+    import aov_layout
+    import scene_backend
+    import utils
+
+    if "aovs" in assignment:
+        diff = aov_layout.apply_layout(assignment,
+                                       delete_aovs=delete_aovs,
+                                       procedural=procedural)
+
+        return {"created_aovs": [x["aov_Name"] for x in diff.created_aovs],
+                "deleted_aovs": diff.deleted_aovs,
+                "missing_layers": diff.missing_layers}
+
+    if aov_presets is None:
+        aov_presets = load_aov_presets()
+
+    scene_layers = set(scene_backend.get_backend().nodes_of_type("renderLayer"))
+    scene_layers.add("masterLayer")
+
+    render_layers = sorted(assignment["layers"])
+
+    missing_layers = [x for x in render_layers if x not in scene_layers]
+
+    created_aovs = []
+
+    for render_layer in render_layers:
+        if render_layer in missing_layers:
+            continue
+
+        aov_list = get_aov_data_list(assignment["layers"][render_layer],
+                                     aov_presets=aov_presets)
+
+        created_aovs.extend(utils.add_aovs_to_render_layer(
+            aov_list, render_layer, procedural=procedural))
+
+    return {"created_aovs": created_aovs,
+            "deleted_aovs": [],
+            "missing_layers": missing_layers}
+
+
+def export_scene_layout(scene_file, layout_file):
+    """
+    Open a scene and export its aov layout
+
+    :param scene_file: the scene file path as a string
+    :param layout_file: the json layout file path as a string
+    :return: the layout dictionary
+    """
+
+    import maya.cmds as cmds
+
+    import aov_layout
+
+    cmds.file(scene_file, open=True, force=True)
+
+    return aov_layout.write_layout(layout_file)
+
+
+def audit_scene_file(scene_file, fix=False):
+    """
+    Open a scene and audit its aovs, the problems found are fixed and the
+    scene saved if asked
+
+    :param scene_file: the scene file path as a string
+    :param fix: bool used to fix the problems and save the scene
+    :return: an AuditReport object
+    """
+
+    import maya.cmds as cmds
+
+    import aov_audit
+
+    cmds.file(scene_file, open=True, force=True)
+
+    report = aov_audit.audit_scene()
+
+    if fix and report:
+        aov_audit.fix_scene(report)
+        cmds.file(save=True, force=True)
+
+    return report
+
+
+def process_scene(scene_file,
+                  assignment,
+                  save=True,
+                  delete_aovs=False,
+                  procedural=None):
+    """
+    Open a scene, apply an aov assignment and save it.
+    The status is "warning" when render layers of the assignment are missing
+    in the scene
+
+    :param scene_file: the scene file path as a string
+    :param assignment: the assignment dictionary
+    :param save: bool used to save the scene after the assignment
+    :param delete_aovs: bool used to delete the scene aovs missing in an aov
+    layout
+    :param procedural: bool used to build the preset shaders from their
+    network description, shader_library.PROCEDURAL_SHADERS if None
+    :return: the scene result dictionary with the scene, status, error,
+    created_aovs, deleted_aovs, missing_layers and seconds keys
+    """
+
+    import maya.cmds as cmds
+
+    start_time = default_timer()
+
+    result = {"scene": scene_file,
+              "status": "ok",
+              "error": None,
+              "created_aovs": [],
+              "deleted_aovs": [],
+              "missing_layers": []}
+
+    try:
+        cmds.file(scene_file, open=True, force=True)
+
+        result.update(apply_assignment(assignment,
+                                       delete_aovs=delete_aovs,
+                                       procedural=procedural))
+
+        if result["missing_layers"]:
+            result["status"] = "warning"
+            result["error"] = "Render layers missing in the scene: %s" % \
+                              ", ".join(result["missing_layers"])
+
+        if save:
+            cmds.file(save=True, force=True)
+
+    except Exception as e:
+        result["status"] = "error"
+        result["error"] = "%s: %s" % (type(e).__name__, e)
+
+    result["seconds"] = default_timer() - start_time
+
+    return result
+
+
+def _process_scene_job(job):
+    return process_scene(*job)
+
+
+def _scene_error_result(scene_file, error):
+    return {"scene": scene_file,
+            "status": "error",
+            "error": error,
+            "created_aovs": [],
+            "deleted_aovs": [],
+            "missing_layers": [],
+            "seconds": None}
+
+
+def read_finished_scenes(results_file):
+    """
+    Get the scenes already processed by a previous run, scenes with warnings
+    are done as far as they can be
+
+    :param results_file: the json lines results file path as a string
+    :return: a set of scene file paths
+    """
+
+    finished_scenes = set()
+
+    if not os.path.exists(results_file):
+        return finished_scenes
+
+    with open(results_file) as f:
+        for line in f:
+            # The last line is cut if the previous run crashed while writing
+            try:
+                result = json.loads(line)
+            except ValueError:
+                continue
+
+            if result.get("status", None) in ("ok", "warning"):
+                finished_scenes.add(result["scene"])
+
+    return finished_scenes
+
+
+def run_batch(scene_files,
+              assignment,
+              results_file,
+              workers=1,
+              resume=False,
+              save=True,
+              delete_aovs=False,
+              procedural=None,
+              timeout=SCENE_TIMEOUT,
+              scenes_per_worker=None,
+              initializer=initialize_maya):
+    """
+    Apply an aov assignment to many scenes, spread across worker processes.
+    Every scene result is appended to the results file as a json line as soon
+    as it is done, in the scene order when using worker processes
+
+    :param scene_files: a list of scene file paths
+    :param assignment: the assignment dictionary
+    :param results_file: the json lines results file path as a string
+    :param workers: the number of worker processes, scenes are processed in
+    the current process if lower than 2
+    :param resume: bool used to skip the scenes already processed
+    successfully in the results file
+    :param save: bool used to save the scenes after the assignment
+    :param delete_aovs: bool used to delete the scene aovs missing in an aov
+    layout
+    :param procedural: bool used to build the preset shaders from their
+    network description, shader_library.PROCEDURAL_SHADERS if None
+    :param timeout: seconds a worker process is given for a scene before the
+    scene is reported as failed, None to wait forever
+    :param scenes_per_worker: the number of scenes a worker process handles
+    before it is replaced by a new one, None to keep the workers
+    :param initializer: function run once in every worker process before it
+    processes scenes
+    :return: a list of the scene result dictionaries of this run
+    """
+
+    if resume:
+        finished_scenes = read_finished_scenes(results_file)
+        scene_files = [x for x in scene_files if x not in finished_scenes]
+
+    jobs = [(x, assignment, save, delete_aovs, procedural)
+            for x in scene_files]
+
+    results = []
+
+    if not jobs:
+        return results
+
+    pool = None
+    timed_out = False
+
+    if workers > 1:
+        pool = multiprocessing.Pool(processes=min(workers, len(jobs)),
+                                    initializer=initializer,
+                                    maxtasksperchild=scenes_per_worker)
+        async_results = [(x[0], pool.apply_async(_process_scene_job, (x,)))
+                         for x in jobs]
+        scene_results = _wait_results(async_results, timeout)
+    else:
+        if initializer is not None:
+            initializer()
+
+        scene_results = (_process_scene_job(x) for x in jobs)
+
+    try:
+        with open(results_file, "a" if resume else "w") as f:
+            # Start on a new line after a line cut by a crash
+            if resume and f.tell() and not _ends_with_newline(results_file):
+                f.write("\n")
+
+            for result in scene_results:
+                # Only the scenes given up on have no time
+                timed_out = timed_out or result["seconds"] is None
+
+                f.write(json.dumps(result) + "\n")
+                f.flush()
+
+                results.append(result)
+    except BaseException:
+        # Don't wait for the pending scenes when interrupted
+        if pool is not None:
+            pool.terminate()
+        raise
+    finally:
+        if pool is not None:
+            # The pool waits forever for the result of a crashed worker
+            if timed_out:
+                pool.terminate()
+            else:
+                pool.close()
+            pool.join()
+
+    return results
+
+
+def _wait_results(async_results, timeout):
+    """
+    Get the scene results of the worker processes in the scene order.
+    The previous scenes are done when a scene is waited for, so every scene
+    is given at least the timeout
+
+    :param async_results: a list of (scene_file, AsyncResult) pairs
+    :param timeout: the seconds to wait for every scene, None to wait forever
+    :return: a scene result dictionary generator
+    """
+
+    for scene_file, async_result in async_results:
+        # AsyncResult.get without timeout can't be interrupted in python 2
+        try:
+            yield async_result.get(timeout if timeout is not None else 1e9)
+        except multiprocessing.TimeoutError:
+            yield _scene_error_result(
+                scene_file,
+                "TimeoutError: the scene was not done after %s seconds, "
+                "its worker process may have crashed" % timeout)
+
+    return
+
+
+def _ends_with_newline(file_path):
+    with open(file_path, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
@@ -0,0 +1,167 @@
+from PySide import QtGui, QtCore
+
+import instrumentation
+
+
+class InstrumentationPanel(QtGui.QDialog):
+    """
+    Class for the debug panel listing the maya commands recorded by the
+    instrumentation, grouped by the dialog operation which issued them
+    """
+    def __init__(self, parent=None):
+        """
+        Initialise the panel
+
+        :param parent: parent widget
+        """
+        super(InstrumentationPanel, self).__init__(parent)
+
+        self.instrumentation = instrumentation.get_instrumentation()
+
+        self.setWindowTitle("AOV MANAGER DEBUG")
+        self.resize(520, 420)
+
+        self._ui_content()
+
+        self.refresh()
+
+    def _ui_content(self):
+        """
+        Set the ui content
+
+        :return:
+        """
+
+        layout = QtGui.QVBoxLayout(self)
+
+        self.chk_record = QtGui.QCheckBox("Record Maya Commands", self)
+        self.chk_record.setChecked(self.instrumentation.enabled)
+        layout.addWidget(self.chk_record)
+
+        self.stats_tree = QtGui.QTreeWidget(self)
+        self.stats_tree.setHeaderLabels(["OPERATION / COMMAND",
+                                         "CALLS",
+                                         "SECONDS"])
+        self.stats_tree.setColumnWidth(0, 260)
+        layout.addWidget(self.stats_tree)
+
+        ly_btns = QtGui.QHBoxLayout()
+
+        self.btn_refresh = QtGui.QPushButton("Refresh", self)
+        self.btn_reset = QtGui.QPushButton("Reset", self)
+        self.btn_export_json = QtGui.QPushButton("Export JSON", self)
+        self.btn_export_trace = QtGui.QPushButton("Export Trace", self)
+
+        for button in [self.btn_refresh,
+                       self.btn_reset,
+                       self.btn_export_json,
+                       self.btn_export_trace]:
+            ly_btns.addWidget(button)
+
+        layout.addLayout(ly_btns)
+
+        # Signals
+        self.chk_record.toggled.connect(self._record_callback)
+        self.btn_refresh.clicked.connect(self.refresh)
+        self.btn_reset.clicked.connect(self._reset_callback)
+        self.btn_export_json.clicked.connect(self._export_json_callback)
+        self.btn_export_trace.clicked.connect(self._export_trace_callback)
+
+        return
+
+    def refresh(self):
+        """
+        Fill the tree with the recorded stats, one item per operation holding
+        its commands
+
+        :return:
+        """
+
+        self.stats_tree.clear()
+
+        operation_items = dict()
+
+        for stats in self.instrumentation.summary():
+            operation_item = operation_items.get(stats["operation"], None)
+
+            if operation_item is None:
+                operation_item = QtGui.QTreeWidgetItem(self.stats_tree,
+                                                       [stats["operation"],
+                                                        "0",
+                                                        "0.000"])
+                operation_item.setData(1, QtCore.Qt.UserRole, 0)
+                operation_item.setData(2, QtCore.Qt.UserRole, 0.0)
+                operation_items[stats["operation"]] = operation_item
+
+            QtGui.QTreeWidgetItem(operation_item,
+                                  [stats["command"],
+                                   str(stats["count"]),
+                                   "%.3f" % stats["seconds"]])
+
+            count = operation_item.data(1, QtCore.Qt.UserRole) + stats["count"]
+            seconds = (operation_item.data(2, QtCore.Qt.UserRole) +
+                       stats["seconds"])
+
+            operation_item.setData(1, QtCore.Qt.UserRole, count)
+            operation_item.setData(2, QtCore.Qt.UserRole, seconds)
+            operation_item.setText(1, str(count))
+            operation_item.setText(2, "%.3f" % seconds)
+
+        return
+
+    def _record_callback(self, checked):
+        """
+        Callback for the record check box
+
+        :param checked: bool for the check box state
+        :return:
+        """
+
+        if checked:
+            self.instrumentation.enable()
+        else:
+            self.instrumentation.disable()
+
+        return
+
+    def _reset_callback(self):
+        """
+        Callback for clearing the recorded stats
+
+        :return:
+        """
+
+        self.instrumentation.reset()
+        self.refresh()
+
+        return
+
+    def _export_json_callback(self):
+        """
+        Callback for exporting the recorded stats to a json file
+
+        :return:
+        """
+
+        json_file = QtGui.QFileDialog.getSaveFileName(
+            self, "Export Maya Command Stats", "", "JSON (*.json)")[0]
+
+        if json_file:
+            self.instrumentation.write_json(json_file)
+
+        return
+
+    def _export_trace_callback(self):
+        """
+        Callback for exporting the recorded events to a chrome trace file
+
+        :return:
+        """
+
+        trace_file = QtGui.QFileDialog.getSaveFileName(
+            self, "Export Chrome Trace", "", "JSON (*.json)")[0]
+
+        if trace_file:
+            self.instrumentation.write_chrome_trace(trace_file)
+
+        return
@@ -0,0 +1,207 @@
+import colorsys
+import hashlib
+import struct
+
+import maya.cmds as cmds
+
+import utils
+import visibility
+
+
+# Shape attributes exported as arnold user data, read by aiUserDataColor
+USER_DATA_PREFIX = "mtoa_constant_"
+
+# Objects keyed by their own name or by the asset they belong to
+KEY_NAME = "name"
+KEY_ASSET = "asset"
+
+_assigners = dict()
+
+
+class IdAssigner(object):
+    """
+    Class writing the id colours read by an attribute id aov on the visible
+    shapes of render layers.
+    The colour written on every shape is kept as its fingerprint, later runs
+    only write the shapes whose colour changed or which lost the attribute.
+    Values changed outside the assigner, like with an undo, need a forced run
+    """
+    def __init__(self, aov_name, key=KEY_NAME):
+        """
+        Initialise the assigner
+
+        :param aov_name: the attribute id aov name, which is also the user
+        data name read by its aiUserDataColor
+        :param key: KEY_NAME to give every object its own colour or
+        KEY_ASSET to share the colour across an asset
+        """
+
+        self.aov_name = aov_name
+        self.key = key
+
+        # shape full path -> id colour written by the last run
+        self._fingerprints = dict()
+
+    def attribute(self):
+        """
+        Get the shape attribute holding the id colour
+
+        :return: the attribute name as a string
+        """
+
+        return USER_DATA_PREFIX + self.aov_name
+
+    def assign_render_layer(self, render_layer, force=False):
+        """
+        Write the id colours of the visible objects of a render layer
+
+        :param render_layer: the name of a render layer as a string
+        :param force: bool used to write every shape again
+        :return: a list of the written shape paths
+        """
+
+        return self.assign(utils.get_render_layer_objects(render_layer) or [],
+                           force=force)
+
+    def assign(self, nodes, force=False):
+        """
+        Write the id colours of the visible nodes in one undo chunk.
+        The attribute is added to every shape missing it at once
+
+        :param nodes: a list of transform or shape node names
+        :param force: bool used to write every shape again
+        :return: a list of the written shape paths
+        """
+
+        evaluator = visibility.get_evaluator()
+
+        node_shapes = evaluator.visible_shapes(
+            nodes, utils.get_render_layer_accepted_objects())
+
+        colors = dict((shape, id_color(object_key(node, key=self.key)))
+                      for node, shape in node_shapes.items())
+
+        attribute = self.attribute()
+
+        existing_plugs = set(cmds.ls(["%s.%s" % (x, attribute)
+                                      for x in colors]) or [])
+
+        missing_shapes = [x for x in sorted(colors)
+                          if "%s.%s" % (x, attribute) not in existing_plugs]
+
+        changed_shapes = [x for x in sorted(colors)
+                          if force or
+                          x in missing_shapes or
+                          self._fingerprints.get(x, None) != colors[x]]
+
+        if not changed_shapes:
+            return changed_shapes
+
+        with utils.undo_chunk("assign_id_colors"):
+            if missing_shapes:
+                add_color_attribute(missing_shapes, attribute)
+
+            for shape in changed_shapes:
+                cmds.setAttr("%s.%s" % (shape, attribute),
+                             *colors[shape],
+                             type="float3")
+
+                self._fingerprints[shape] = colors[shape]
+
+        return changed_shapes
+
+    def invalidate(self):
+        """
+        Drop the fingerprints so the next run writes every shape
+
+        :return:
+        """
+
+        self._fingerprints = dict()
+
+        return
+
+
+def get_assigner(aov_name, key=KEY_NAME):
+    """
+    Get the shared id assigner of an attribute id aov
+
+    :param aov_name: the attribute id aov name as a string
+    :param key: KEY_NAME or KEY_ASSET
+    :return: an IdAssigner object
+    """
+
+    assigner = _assigners.get((aov_name, key), None)
+
+    if assigner is None:
+        assigner = _assigners[(aov_name, key)] = IdAssigner(aov_name, key=key)
+
+    return assigner
+
+
+def object_key(node, key=KEY_NAME):
+    """
+    Get the name an object id colour is derived from
+
+    :param node: the node name or full path as a string
+    :param key: KEY_NAME for the node name or KEY_ASSET for its namespace,
+    or its top dag node when it has no namespace
+    :return: the key as a string
+    """
+
+    name = node.split("|")[-1]
+
+    if key != KEY_ASSET:
+        return name
+
+    if ":" in name:
+        return name.rpartition(":")[0]
+
+    return node.lstrip("|").split("|")[0]
+
+
+def id_color(key):
+    """
+    Get the stable id colour of a key.
+    The hue comes from a hash of the key and the saturation and value are
+    kept high so ids stay apart from each other and from the background
+
+    :param key: the object key as a string
+    :return: a tuple with the red, green and blue values
+    """
+
+    if isinstance(key, unicode):
+        key = key.encode("utf-8")
+
+    hue, saturation, value = struct.unpack(">IBB",
+                                           hashlib.md5(key).digest()[:6])
+
+    color = colorsys.hsv_to_rgb(hue / 4294967296.0,
+                                0.55 + 0.45 * saturation / 255.0,
+                                0.65 + 0.35 * value / 255.0)
+
+    # Rounded so fingerprints compare equal across runs
+    return tuple(round(x, 4) for x in color)
+
+
+def add_color_attribute(shapes, attribute):
+    """
+    Add a colour attribute to many shapes at once
+
+    :param shapes: a list of shape node names
+    :param attribute: the attribute name as a string
+    :return:
+    """
+
+    cmds.addAttr(*shapes,
+                 longName=attribute,
+                 attributeType="float3",
+                 usedAsColor=True)
+
+    for channel in "RGB":
+        cmds.addAttr(*shapes,
+                     longName=attribute + channel,
+                     attributeType="float",
+                     parent=attribute)
+
+    return
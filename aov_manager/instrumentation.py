@@ -0,0 +1,405 @@
+import json
+import os
+import sys
+from timeit import default_timer
+
+
+# Tool modules whose maya.cmds calls are recorded
+INSTRUMENTED_MODULES = ["utils",
+                        "scene_backend",
+                        "shader_library",
+                        "aov_layout",
+                        "aov_registry",
+                        "layer_members",
+                        "visibility",
+                        "id_assignment",
+                        "aov_audit",
+                        "aov_manager"]
+
+# Record the maya commands from startup
+ENABLED_AT_STARTUP = os.environ.get("AOV_MANAGER_INSTRUMENT", "0") == "1"
+
+# Operation the commands issued outside any operation are recorded under
+NO_OPERATION = "<none>"
+
+# Number of timed events kept for the trace export
+MAX_EVENTS = 100000
+
+_PACKAGE = __name__.rpartition(".")[0]
+
+_instrumentation = None
+
+
+class _NullScope(object):
+    """
+    Context manager doing nothing, used for the operations run while the
+    instrumentation is disabled
+    """
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+_NULL_SCOPE = _NullScope()
+
+
+class _OperationScope(object):
+    """
+    Context manager recording the commands issued inside it under an
+    operation name
+    """
+    def __init__(self, instrumentation, name):
+        self.instrumentation = instrumentation
+        self.name = name
+        self.start_time = None
+
+    def __enter__(self):
+        self.start_time = self.instrumentation.timer()
+        self.instrumentation.operations.append(self.name)
+
+        return self
+
+    def __exit__(self, *args):
+        instrumentation = self.instrumentation
+        instrumentation.operations.pop()
+
+        instrumentation.add_event(self.name,
+                                  "operation",
+                                  self.start_time,
+                                  instrumentation.timer() - self.start_time)
+
+        return False
+
+
+class InstrumentedCmds(object):
+    """
+    Class standing in for the maya.cmds module, every command is timed and
+    recorded before the result is returned
+    """
+    def __init__(self, cmds_module, instrumentation):
+        """
+        Initialise the wrapper
+
+        :param cmds_module: the maya.cmds module
+        :param instrumentation: the Instrumentation recording the commands
+        """
+
+        self._cmds = cmds_module
+        self._instrumentation = instrumentation
+
+    def __getattr__(self, name):
+        command = getattr(self._cmds, name)
+
+        if not callable(command):
+            return command
+
+        instrumentation = self._instrumentation
+        timer = instrumentation.timer
+
+        def wrapper(*args, **kwargs):
+            start_time = timer()
+
+            try:
+                return command(*args, **kwargs)
+            finally:
+                instrumentation.record(name, start_time, timer() - start_time)
+
+        wrapper.__name__ = name
+
+        # Later calls find the wrapper without going through __getattr__
+        setattr(self, name, wrapper)
+
+        return wrapper
+
+
+class Instrumentation(object):
+    """
+    Class recording the maya commands issued by the tool modules.
+    While enabled the cmds module of the instrumented modules is replaced by
+    an InstrumentedCmds wrapper, disabling puts the maya.cmds module back so
+    no cost is left on the commands
+    """
+    def __init__(self, timer=default_timer):
+        """
+        Initialise a disabled instrumentation
+
+        :param timer: function returning the current time in seconds
+        """
+
+        self.timer = timer
+        self.enabled = False
+
+        # (operation, command) -> [call count, seconds]
+        self.stats = dict()
+
+        # (name, category, start time, duration) of the commands and
+        # operations, in the order they ended
+        self.events = []
+
+        # Stack of the running operation names
+        self.operations = []
+
+        # (module, cmds module) of the patched modules
+        self._patched_modules = []
+
+    def enable(self, modules=None):
+        """
+        Start recording the maya commands of the tool modules
+
+        :param modules: an optional list of modules to instrument, defaults
+        to the loaded INSTRUMENTED_MODULES
+        :return:
+        """
+
+        if self.enabled:
+            return
+
+        if modules is None:
+            modules = [sys.modules.get(_module_name(x), None)
+                       for x in INSTRUMENTED_MODULES]
+
+        for module in modules:
+            cmds_module = getattr(module, "cmds", None)
+
+            if cmds_module is None or isinstance(cmds_module,
+                                                 InstrumentedCmds):
+                continue
+
+            module.cmds = InstrumentedCmds(cmds_module, self)
+            self._patched_modules.append((module, cmds_module))
+
+        self.enabled = True
+
+        return
+
+    def disable(self):
+        """
+        Stop recording and restore the maya.cmds module of the instrumented
+        modules, the recorded stats are kept
+
+        :return:
+        """
+
+        for module, cmds_module in self._patched_modules:
+            module.cmds = cmds_module
+
+        self._patched_modules = []
+        self.enabled = False
+
+        return
+
+    def reset(self):
+        """
+        Clear the recorded stats and events
+
+        :return:
+        """
+
+        self.stats = dict()
+        self.events = []
+
+        return
+
+    def operation(self, name):
+        """
+        Get a context manager recording the commands issued inside it under
+        a high level operation name, like refresh or drop
+
+        :param name: the operation name as a string
+        :return: a context manager
+        """
+
+        if not self.enabled:
+            return _NULL_SCOPE
+
+        return _OperationScope(self, name)
+
+    def current_operation(self):
+        """
+        Get the innermost running operation
+
+        :return: the operation name as a string
+        """
+
+        if not self.operations:
+            return NO_OPERATION
+
+        return self.operations[-1]
+
+    def record(self, command, start_time, duration):
+        """
+        Record a maya command
+
+        :param command: the command name as a string
+        :param start_time: the command start time in seconds
+        :param duration: the command duration in seconds
+        :return:
+        """
+
+        operation = self.current_operation()
+
+        stats = self.stats.get((operation, command), None)
+
+        if stats is None:
+            stats = self.stats[(operation, command)] = [0, 0.0]
+
+        stats[0] += 1
+        stats[1] += duration
+
+        self.add_event(command, operation, start_time, duration)
+
+        return
+
+    def add_event(self, name, category, start_time, duration):
+        """
+        Keep a timed event for the trace export, events past MAX_EVENTS are
+        dropped
+
+        :param name: the event name as a string
+        :param category: the event category as a string
+        :param start_time: the event start time in seconds
+        :param duration: the event duration in seconds
+        :return:
+        """
+
+        if len(self.events) < MAX_EVENTS:
+            self.events.append((name, category, start_time, duration))
+
+        return
+
+    def summary(self):
+        """
+        Get the recorded stats, slowest first
+
+        :return: a list of dictionaries with the operation, command, count
+        and seconds keys
+        """
+
+        summary = [{"operation": operation,
+                    "command": command,
+                    "count": stats[0],
+                    "seconds": stats[1]}
+                   for (operation, command), stats in self.stats.items()]
+
+        return sorted(summary, key=lambda x: (-x["seconds"],
+                                              x["operation"],
+                                              x["command"]))
+
+    def chrome_trace(self):
+        """
+        Get the recorded events in the chrome trace event format, which can
+        be loaded in chrome://tracing
+
+        :return: the trace dictionary
+        """
+
+        start_time = min([x[2] for x in self.events] or [0.0])
+
+        trace_events = [{"name": name,
+                         "cat": category,
+                         "ph": "X",
+                         "ts": (event_start - start_time) * 1e6,
+                         "dur": duration * 1e6,
+                         "pid": 1,
+                         "tid": 1}
+                        for name, category, event_start, duration
+                        in self.events]
+
+        return {"traceEvents": trace_events,
+                "displayTimeUnit": "ms"}
+
+    def write_json(self, json_file):
+        """
+        Export the recorded stats to a json file
+
+        :param json_file: the file path as a string
+        :return:
+        """
+
+        with open(json_file, "w") as f:
+            json.dump(self.summary(), f, indent=4)
+
+        return
+
+    def write_chrome_trace(self, trace_file):
+        """
+        Export the recorded events to a chrome trace file
+
+        :param trace_file: the file path as a string
+        :return:
+        """
+
+        with open(trace_file, "w") as f:
+            json.dump(self.chrome_trace(), f)
+
+        return
+
+
+def get_instrumentation():
+    """
+    Get the instrumentation shared by the tool
+
+    :return: the Instrumentation object
+    """
+
+    global _instrumentation
+
+    if _instrumentation is None:
+        _instrumentation = Instrumentation()
+
+    return _instrumentation
+
+
+def operation(name):
+    """
+    Get a context manager recording the maya commands issued inside it under
+    a high level operation name
+
+    :param name: the operation name as a string
+    :return: a context manager
+    """
+
+    return get_instrumentation().operation(name)
+
+
+def recorded(command):
+    """
+    Get a decorator recording the calls of a function as a command of the
+    shared instrumentation, used for the scene reads which don't go through
+    maya.cmds like the api backend reads
+
+    :param command: the command name the calls are recorded under
+    :return: the decorator function
+    """
+
+    def decorator(function):
+        def wrapper(*args, **kwargs):
+            instrumentation = get_instrumentation()
+
+            if not instrumentation.enabled:
+                return function(*args, **kwargs)
+
+            start_time = instrumentation.timer()
+
+            try:
+                return function(*args, **kwargs)
+            finally:
+                instrumentation.record(command,
+                                       start_time,
+                                       instrumentation.timer() - start_time)
+
+        wrapper.__name__ = function.__name__
+        wrapper.__doc__ = function.__doc__
+
+        return wrapper
+
+    return decorator
+
+
+def _module_name(name):
+    if not _PACKAGE:
+        return name
+
+    return "%s.%s" % (_PACKAGE, name)
@@ -0,0 +1,297 @@
+from timeit import default_timer
+
+import instrumentation
+
+
+# Time a slice of work may take before control goes back to maya, seconds
+SLICE_BUDGET = 0.008
+
+# Job states
+PENDING = "pending"
+RUNNING = "running"
+FINISHED = "finished"
+CANCELLED = "cancelled"
+FAILED = "failed"
+
+_scheduler = None
+
+
+class Job(object):
+    """
+    Class holding a long running manager job split into steps.
+    The job function is called on the first slice and returns an iterable,
+    every item taken from it is a step of work. Jobs which know their size
+    set their total so the progress can be shown
+    """
+    def __init__(self, name, function, on_progress=None, on_finished=None):
+        """
+        Initialise the job
+
+        :param name: the job name as a string
+        :param function: function called with the job and returning an
+        iterable of steps
+        :param on_progress: optional function called with the job after every
+        slice of work
+        :param on_finished: optional function called with the job once it has
+        finished, been cancelled or failed
+        """
+
+        self.name = name
+        self.function = function
+        self.on_progress = on_progress
+        self.on_finished = on_finished
+
+        self.state = PENDING
+
+        # Steps done and expected number of steps, None if unknown
+        self.done = 0
+        self.total = None
+
+        # Exception raised by a failed step
+        self.error = None
+
+        self._steps = None
+
+    def is_active(self):
+        """
+        Check if the job still has steps to run
+
+        :return: a bool
+        """
+
+        return self.state in (PENDING, RUNNING)
+
+    def cancel(self):
+        """
+        Stop the job, the step running isn't interrupted and no other step
+        is run
+
+        :return:
+        """
+
+        if self.is_active():
+            self._finish(CANCELLED)
+
+        return
+
+    def progress(self):
+        """
+        Get the fraction of the job done
+
+        :return: a float between 0 and 1, None if the total is unknown
+        """
+
+        if not self.total:
+            return None
+
+        return min(float(self.done) / self.total, 1.0)
+
+    def run_step(self):
+        """
+        Run the next step of the job
+
+        :return: True if the job has more steps to run
+        """
+
+        if not self.is_active():
+            return False
+
+        if self._steps is None:
+            self.state = RUNNING
+            self._steps = iter(self.function(self) or [])
+
+        try:
+            next(self._steps)
+        except StopIteration:
+            self._finish(FINISHED)
+            return False
+        except Exception as error:
+            self.error = error
+            self._finish(FAILED)
+            raise
+
+        self.done += 1
+
+        return True
+
+    def run(self):
+        """
+        Run every remaining step of the job at once
+
+        :return:
+        """
+
+        while self.run_step():
+            pass
+
+        return
+
+    def _finish(self, state):
+        self.state = state
+        self._steps = None
+
+        if self.on_finished is not None:
+            self.on_finished(self)
+
+
+class JobScheduler(object):
+    """
+    Class running jobs cooperatively on the ui thread.
+    Steps are run in slices of a fixed time budget, control goes back to
+    maya between slices so the ui stays responsive and jobs can be
+    cancelled. Jobs run one after the other in the order they were submitted
+    """
+    def __init__(self, scheduler=None, timer=default_timer,
+                 budget=SLICE_BUDGET):
+        """
+        Initialise the scheduler
+
+        :param scheduler: function called with a delay in milliseconds and a
+        function to run after it, QTimer.singleShot if None
+        :param timer: function returning the current time in seconds
+        :param budget: the slice time budget in seconds
+        """
+
+        if scheduler is None:
+            from PySide import QtCore
+            scheduler = QtCore.QTimer.singleShot
+
+        self.scheduler = scheduler
+        self.timer = timer
+        self.budget = budget
+
+        self.jobs = []
+
+        self._scheduled = False
+
+    def submit(self, job):
+        """
+        Queue a job, its first slice runs once maya is idle
+
+        :param job: a Job object
+        :return: the job
+        """
+
+        self.jobs.append(job)
+        self._schedule()
+
+        return job
+
+    def cancel(self, job=None):
+        """
+        Cancel a job
+
+        :param job: the Job to cancel, every queued job is cancelled if None
+        :return:
+        """
+
+        jobs = list(self.jobs) if job is None else [job]
+
+        for queued_job in jobs:
+            queued_job.cancel()
+
+        self.jobs = [x for x in self.jobs if x.is_active()]
+
+        return
+
+    def is_busy(self):
+        """
+        Check if there are jobs left to run
+
+        :return: a bool
+        """
+
+        return any(x.is_active() for x in self.jobs)
+
+    def run_slice(self):
+        """
+        Run job steps until the slice budget is spent and schedule the next
+        slice if work remains.
+        A single step is always run, so steps longer than the budget still
+        make progress
+
+        :return:
+        """
+
+        self._scheduled = False
+
+        start_time = self.timer()
+
+        try:
+            while self.jobs:
+                job = self.jobs[0]
+
+                with instrumentation.operation(job.name):
+                    has_steps = job.run_step()
+
+                if not has_steps:
+                    self.jobs.pop(0)
+                    continue
+
+                if self.timer() - start_time >= self.budget:
+                    break
+        finally:
+            self.jobs = [x for x in self.jobs if x.is_active()]
+
+            if self.jobs:
+                self._progress(self.jobs[0])
+                self._schedule()
+
+        return
+
+    def run_all(self):
+        """
+        Run every queued job at once, used when there's no event loop like
+        in batch mode
+
+        :return:
+        """
+
+        while self.jobs:
+            self.jobs.pop(0).run()
+
+        return
+
+    def _progress(self, job):
+        if job.on_progress is not None:
+            job.on_progress(job)
+
+    def _schedule(self):
+        if self._scheduled:
+            return
+
+        self._scheduled = True
+        self.scheduler(0, self.run_slice)
+
+
+def get_scheduler():
+    """
+    Get the shared job scheduler
+
+    :return: a JobScheduler object
+    """
+
+    global _scheduler
+
+    if _scheduler is None:
+        _scheduler = JobScheduler()
+
+    return _scheduler
+
+
+def iter_steps(function):
+    """
+    Get the steps of a function run lazily, the function is only called
+    when the first step is taken. Functions returning None have no steps
+
+    :param function: function returning an iterable of steps or None
+    :return: a generator of steps
+    """
+
+    steps = function()
+
+    if steps is None:
+        return
+
+    for step in steps:
+        yield step
@@ -0,0 +1,195 @@
+import maya.cmds as cmds
+
+import scene_events
+
+
+# Render layer attribute the layer members are connected to
+MEMBERSHIP_ATTRIBUTE = "renderInfo"
+
+_resolver = None
+
+
+class LayerMembershipResolver(object):
+    """
+    Class resolving the transform nodes of render layers.
+    Resolved layers are cached while the render layer callbacks are watched,
+    a membership change on a layer only drops that layer
+    """
+    def __init__(self):
+        """
+        Initialise an empty resolver
+        """
+
+        # render layer -> list of transform node paths
+        self._layer_objects = dict()
+
+        self._registry = None
+        self._callback_ids = []
+        self._layer_callback_ids = dict()
+
+    def layer_objects(self, render_layer):
+        """
+        Get the transform nodes added to a render layer
+
+        :param render_layer: the name of a render layer as a string
+        :return: a list of transform node paths in the layer member order
+        """
+
+        layer_objects = self._layer_objects.get(render_layer, None)
+
+        if layer_objects is None:
+            layer_objects = resolve_layer_objects(render_layer)
+
+            # Without callbacks there is no way to know the cache is stale
+            if self.is_watching():
+                self._layer_objects[render_layer] = layer_objects
+
+        return list(layer_objects)
+
+    def invalidate(self, render_layer=None):
+        """
+        Drop the cached transform nodes of a render layer
+
+        :param render_layer: the name of a render layer, every layer is
+        dropped if None
+        :return:
+        """
+
+        if render_layer is None:
+            self._layer_objects = dict()
+        else:
+            self._layer_objects.pop(render_layer, None)
+
+        return
+
+    def watch(self, registry=None, render_layers=None):
+        """
+        Invalidate the cached layers when their members change
+
+        :param registry: the callback registry, MayaCallbackRegistry if None
+        :param render_layers: the render layers of the scene, read from maya
+        if None
+        :return:
+        """
+
+        if self.is_watching():
+            return
+
+        self._registry = registry or scene_events.MayaCallbackRegistry()
+
+        if render_layers is None:
+            render_layers = cmds.ls(type="renderLayer") or []
+
+        self._callback_ids = [
+            self._registry.add_node_added_callback(self._watch_layer,
+                                                   "renderLayer"),
+            self._registry.add_node_removed_callback(self._layer_removed,
+                                                     "renderLayer")]
+
+        for render_layer in render_layers:
+            self._watch_layer(render_layer)
+
+        return
+
+    def unwatch(self):
+        """
+        Remove the render layer callbacks and drop the cached layers
+
+        :return:
+        """
+
+        callback_ids = self._callback_ids + self._layer_callback_ids.values()
+
+        for callback_id in callback_ids:
+            self._registry.remove_callback(callback_id)
+
+        self._registry = None
+        self._callback_ids = []
+        self._layer_callback_ids = dict()
+
+        self.invalidate()
+
+        return
+
+    def is_watching(self):
+        """
+        Check if the render layer callbacks are registered
+
+        :return: a bool
+        """
+
+        return bool(self._callback_ids)
+
+    def _watch_layer(self, render_layer):
+        if render_layer in self._layer_callback_ids:
+            return
+
+        def attribute_changed(node_name, attribute):
+            if attribute.split("[")[0] == MEMBERSHIP_ATTRIBUTE:
+                self.invalidate(node_name)
+
+        self._layer_callback_ids[render_layer] = \
+            self._registry.add_attribute_changed_callback(render_layer,
+                                                          attribute_changed)
+
+    def _layer_removed(self, render_layer):
+        callback_id = self._layer_callback_ids.pop(render_layer, None)
+
+        if callback_id is not None:
+            self._registry.remove_callback(callback_id)
+
+        self.invalidate(render_layer)
+
+
+def get_resolver():
+    """
+    Get the shared render layer membership resolver
+
+    :return: a LayerMembershipResolver object
+    """
+
+    global _resolver
+
+    if _resolver is None:
+        _resolver = LayerMembershipResolver()
+
+    return _resolver
+
+
+def resolve_layer_objects(render_layer):
+    """
+    Read the transform nodes added to a render layer with two maya calls,
+    the members and then all their node types at once.
+    Members which are not transforms are replaced by their parent, read from
+    their full path
+
+    :param render_layer: the name of a render layer as a string
+    :return: a list of transform node paths in the layer member order
+    """
+
+    members = cmds.editRenderLayerMembers(render_layer,
+                                          q=True,
+                                          fullNames=True) or []
+
+    if not members:
+        return []
+
+    # Flat list of node path and node type pairs
+    typed_members = cmds.ls(members, long=True, showType=True) or []
+
+    layer_transform_nodes = []
+    found_nodes = set()
+
+    for node, node_type in zip(typed_members[::2], typed_members[1::2]):
+        if node_type != "transform":
+            node = node.rpartition("|")[0]
+
+            # Dependency nodes have no parent transform
+            if not node:
+                continue
+
+        if node not in found_nodes:
+            found_nodes.add(node)
+            layer_transform_nodes.append(node)
+
+    return layer_transform_nodes
@@ -0,0 +1,459 @@
+import json
+import os
+
+import aov_registry
+import scene_snapshot
+import tree_data
+
+
+# Channels of the aov data types, arnold type values are read as names
+DATA_TYPE_CHANNELS = {"int": 1,
+                      "bool": 1,
+                      "float": 1,
+                      "rgb": 3,
+                      "rgba": 4,
+                      "vector": 3,
+                      "point": 3,
+                      "point2": 2,
+                      "pointer": 1}
+
+ARNOLD_TYPES = {1: "int", 3: "bool", 4: "float", 5: "rgb", 6: "rgba",
+                7: "vector", 8: "point", 9: "point2", 11: "pointer"}
+
+# Data types written as 32 bit integer channels whatever the precision
+INTEGER_TYPES = set(["int", "bool", "pointer"])
+
+# Type of the aovs not in the snapshot yet, like the aovs just dropped
+DEFAULT_DATA_TYPE = "rgb"
+
+# The beauty is always rendered
+BEAUTY_CHANNELS = 4
+
+# Arnold keeps every framebuffer channel as a 32 bit float
+FRAMEBUFFER_CHANNEL_BYTES = 4
+
+# Render settings giving the size of the images of a layer
+RESOLUTION_WIDTH = "defaultResolution.width"
+RESOLUTION_HEIGHT = "defaultResolution.height"
+HALF_PRECISION = "defaultArnoldDriver.halfPrecision"
+
+RENDER_SETTINGS = [RESOLUTION_WIDTH, RESOLUTION_HEIGHT, HALF_PRECISION]
+DEFAULT_RENDER_SETTINGS = [960, 540, False]
+
+# Size of a zip compressed exr relative to its raw channels, an estimate
+EXR_COMPRESSION_RATIO = 0.6
+
+MEGABYTE = 1024 * 1024
+
+# Framebuffer memory budget of the layers without a budget of their own
+DEFAULT_BUDGET = 2048 * MEGABYTE
+
+# Per layer budgets in megabytes: {"default": 2048, "layers": {"layerA": 4096}}
+BUDGETS_FILE = os.environ.get("AOV_MANAGER_BUDGETS",
+                              os.path.join(aov_registry.CACHE_FOLDER,
+                                           "layer_budgets.json"))
+
+
+class LayerCost(object):
+    """
+    Class holding the estimated memory and disk cost of a render layer frame
+    """
+    def __init__(self, render_layer, width, height, half_precision,
+                 aov_count, float_channels, integer_channels, budget):
+        """
+        Initialise the layer cost
+
+        :param render_layer: the render layer name as a string
+        :param width: the image width in pixels
+        :param height: the image height in pixels
+        :param half_precision: bool for the 16 bit float exr output
+        :param aov_count: the number of aovs, the beauty excluded
+        :param float_channels: the number of float channels, the beauty
+        included
+        :param integer_channels: the number of integer channels
+        :param budget: the framebuffer memory budget in bytes
+        """
+
+        self.render_layer = render_layer
+        self.width = width
+        self.height = height
+        self.half_precision = half_precision
+        self.aov_count = aov_count
+        self.float_channels = float_channels
+        self.integer_channels = integer_channels
+        self.budget = budget
+
+    def channels(self):
+        """
+        Get the number of channels rendered
+
+        :return: the number of channels as an int
+        """
+
+        return self.float_channels + self.integer_channels
+
+    def framebuffer_bytes(self):
+        """
+        Get the framebuffer memory of a frame
+
+        :return: the size in bytes as an int
+        """
+
+        return (self.width * self.height * self.channels() *
+                FRAMEBUFFER_CHANNEL_BYTES)
+
+    def output_bytes(self):
+        """
+        Get the estimated size of the exr files of a frame
+
+        :return: the size in bytes as an int
+        """
+
+        float_bytes = 2 if self.half_precision else 4
+
+        channel_bytes = (self.float_channels * float_bytes +
+                         self.integer_channels * 4)
+
+        return int(self.width * self.height * channel_bytes *
+                   EXR_COMPRESSION_RATIO)
+
+    def over_budget(self):
+        """
+        Check if the framebuffer memory is over the layer budget
+
+        :return: a bool
+        """
+
+        return self.budget is not None and \
+            self.framebuffer_bytes() > self.budget
+
+    def label(self):
+        """
+        Get the short cost text shown next to the layer
+
+        :return: the text as a string
+        """
+
+        return "%s mem / %s exr" % (format_bytes(self.framebuffer_bytes()),
+                                    format_bytes(self.output_bytes()))
+
+    def description(self):
+        """
+        Get the cost details
+
+        :return: the text as a string
+        """
+
+        lines = ["%s x %s, %s aovs, %s channels, %s exr"
+                 % (self.width, self.height, self.aov_count, self.channels(),
+                    "half" if self.half_precision else "full float"),
+                 "Framebuffer memory: %s"
+                 % format_bytes(self.framebuffer_bytes()),
+                 "Estimated exr output per frame: %s"
+                 % format_bytes(self.output_bytes())]
+
+        if self.budget is not None:
+            lines.append("Budget: %s%s" % (format_bytes(self.budget),
+                                           " EXCEEDED" if self.over_budget()
+                                           else ""))
+
+        return "\n".join(lines)
+
+
+class RenderCostModel(object):
+    """
+    Class estimating the cost of the aovs of every render layer.
+    The channels of every layer are kept as running totals so aovs added or
+    removed only update their own layer, the render settings and aov data
+    types are read from a scene snapshot once.
+    The channels charged for every aov are kept so removing it subtracts
+    exactly what was added, whatever its data type is by then
+    """
+    def __init__(self, budgets=None):
+        """
+        Initialise a model without snapshot, every aov is costed with the
+        default data type and render settings are read when a snapshot is set
+
+        :param budgets: a dictionary of the layer budgets in bytes, read from
+        the budgets file if None
+        """
+
+        self.snapshot = None
+        self.budgets = load_budgets() if budgets is None else budgets
+
+        # render layer -> [{aov: (float channels, integer channels)},
+        #                  float channels, integer channels]
+        self._layers = dict()
+
+        # render layer -> (width, height, half precision)
+        self._settings = dict()
+
+    def set_snapshot(self, snapshot):
+        """
+        Set the scene snapshot the render settings and aov data types are
+        read from, the layer totals are computed again
+
+        :param snapshot: a SceneSnapshot object
+        :return:
+        """
+
+        self.snapshot = snapshot
+        self._settings = dict()
+
+        snapshot.read_values(["%s.type" % x for x in snapshot.aovs])
+
+        for render_layer, layer_data in self._layers.items():
+            self.set_layer_aovs(render_layer, list(layer_data[0]))
+
+        return
+
+    def set_layer_aovs(self, render_layer, aov_list):
+        """
+        Set all the aovs of a layer
+
+        :param render_layer: the render layer name as a string
+        :param aov_list: a list of aov names
+        :return:
+        """
+
+        self._layers[render_layer] = [dict(), 0, 0]
+
+        for aov in aov_list:
+            self.add_aov(render_layer, aov)
+
+        return
+
+    def add_aov(self, render_layer, aov):
+        """
+        Add an aov to the total of a layer
+
+        :param render_layer: the render layer name as a string
+        :param aov: the aov name as a string
+        :return:
+        """
+
+        layer_data = self._layers.setdefault(render_layer, [dict(), 0, 0])
+
+        if aov in layer_data[0]:
+            return
+
+        channels = self.aov_channels(render_layer, aov)
+
+        layer_data[0][aov] = channels
+
+        self._add_channels(layer_data, channels, 1)
+
+        return
+
+    def remove_aov(self, render_layer, aov):
+        """
+        Remove an aov from the total of a layer
+
+        :param render_layer: the render layer name as a string
+        :param aov: the aov name as a string
+        :return:
+        """
+
+        layer_data = self._layers.get(render_layer, None)
+
+        if layer_data is None or aov not in layer_data[0]:
+            return
+
+        self._add_channels(layer_data, layer_data[0].pop(aov), -1)
+
+        return
+
+    def update_aovs(self, aov_list):
+        """
+        Charge again aovs whose data type changed or was not known when they
+        were added, like the aovs created after the snapshot was read
+
+        :param aov_list: a list of aov names
+        :return: a list of the render layers whose total changed
+        """
+
+        changed_layers = []
+
+        for render_layer, layer_data in self._layers.items():
+            for aov in aov_list:
+                if aov not in layer_data[0]:
+                    continue
+
+                channels = self.aov_channels(render_layer, aov)
+
+                if channels == layer_data[0][aov]:
+                    continue
+
+                self._add_channels(layer_data, layer_data[0][aov], -1)
+                self._add_channels(layer_data, channels, 1)
+
+                layer_data[0][aov] = channels
+
+                if render_layer not in changed_layers:
+                    changed_layers.append(render_layer)
+
+        return changed_layers
+
+    def remove_layer(self, render_layer):
+        """
+        Forget a layer
+
+        :param render_layer: the render layer name as a string
+        :return:
+        """
+
+        self._layers.pop(render_layer, None)
+
+        return
+
+    def layer_cost(self, render_layer):
+        """
+        Get the cost of a layer frame
+
+        :param render_layer: the render layer name as a string
+        :return: a LayerCost object
+        """
+
+        aovs, float_channels, integer_channels = self._layers.get(
+            render_layer, [dict(), 0, 0])
+
+        width, height, half_precision = self._layer_settings(render_layer)
+
+        return LayerCost(render_layer,
+                         width,
+                         height,
+                         half_precision,
+                         len(aovs),
+                         BEAUTY_CHANNELS + float_channels,
+                         integer_channels,
+                         self.budgets.get(render_layer,
+                                          self.budgets.get("default", None)))
+
+    def data_type(self, render_layer, aov):
+        """
+        Get the data type of an aov on a layer
+
+        :param render_layer: the render layer name as a string
+        :param aov: the aov name as a string
+        :return: the data type name as a string
+        """
+
+        if self.snapshot is None:
+            return DEFAULT_DATA_TYPE
+
+        try:
+            data_type = self.snapshot.layer_value("aiAOV_%s.type" % aov,
+                                                  scene_layer(render_layer))
+        except (RuntimeError, ValueError):
+            # Aovs created after the snapshot was read
+            return DEFAULT_DATA_TYPE
+
+        return ARNOLD_TYPES.get(data_type, data_type)
+
+    def aov_channels(self, render_layer, aov):
+        """
+        Get the channels an aov adds to a layer
+
+        :param render_layer: the render layer name as a string
+        :param aov: the aov name as a string
+        :return: a tuple with the number of float and integer channels
+        """
+
+        data_type = self.data_type(render_layer, aov)
+        channels = DATA_TYPE_CHANNELS.get(data_type, 3)
+
+        if data_type in INTEGER_TYPES:
+            return 0, channels
+
+        return channels, 0
+
+    def _add_channels(self, layer_data, channels, sign):
+        layer_data[1] += sign * channels[0]
+        layer_data[2] += sign * channels[1]
+
+    def _layer_settings(self, render_layer):
+        settings = self._settings.get(render_layer, None)
+
+        if settings is None:
+            scene_render_layer = scene_layer(render_layer)
+
+            settings = tuple(
+                self._setting(x, scene_render_layer, y)
+                for x, y in zip(RENDER_SETTINGS, DEFAULT_RENDER_SETTINGS))
+
+            self._settings[render_layer] = settings
+
+        return settings
+
+    def _setting(self, node_attribute, render_layer, default):
+        if self.snapshot is None:
+            return default
+
+        try:
+            value = self.snapshot.layer_value(node_attribute, render_layer)
+        except (RuntimeError, ValueError):
+            # The arnold driver only exists once the render settings are set,
+            # getAttr raises a ValueError for missing nodes
+            return default
+
+        return type(default)(value)
+
+
+def scene_layer(render_layer):
+    """
+    Get the scene render layer of a tree layer
+
+    :param render_layer: the tree render layer name as a string
+    :return: the render layer node name as a string
+    """
+
+    if render_layer == tree_data.MASTER_LAYER:
+        return scene_snapshot.DEFAULT_LAYER
+
+    return render_layer
+
+
+def load_budgets(budgets_file=BUDGETS_FILE):
+    """
+    Load the layer framebuffer budgets.
+    The file holds a default budget and the budgets of some layers in
+    megabytes, layers without a budget use the default one
+
+    :param budgets_file: the json budgets file path as a string
+    :return: a dictionary where keys are render layers and values budgets in
+    bytes, the "default" key holds the default budget
+    """
+
+    budgets = {"default": DEFAULT_BUDGET}
+
+    if not os.path.exists(budgets_file):
+        return budgets
+
+    with open(budgets_file) as f:
+        budgets_data = json.load(f)
+
+    if "default" in budgets_data:
+        budgets["default"] = int(budgets_data["default"] * MEGABYTE)
+
+    for render_layer, budget in budgets_data.get("layers", {}).items():
+        budgets[render_layer] = int(budget * MEGABYTE)
+
+    return budgets
+
+
+def format_bytes(size):
+    """
+    Get a readable text for a size
+
+    :param size: the size in bytes as an int
+    :return: the size as a string
+    """
+
+    if size < 1024:
+        return "%d B" % size
+
+    for unit in ["KB", "MB", "GB"]:
+        size /= 1024.0
+
+        if size < 1024 or unit == "GB":
+            return "%.1f %s" % (size, unit)
@@ -0,0 +1,327 @@
+import maya.cmds as cmds
+
+import instrumentation
+
+
+# Backend names, the api backend is used when maya.api.OpenMaya is available
+BACKEND_API = "api"
+BACKEND_CMDS = "cmds"
+
+_backend = None
+
+
+class CmdsBackend(object):
+    """
+    Class reading the scene through maya.cmds, one command per query.
+    It is the fallback when the OpenMaya API can't be imported
+    """
+    name = BACKEND_CMDS
+
+    def current_render_layer(self):
+        """
+        Get the current render layer
+
+        :return: the render layer name as a string
+        """
+
+        return cmds.editRenderLayerGlobals(query=True, crl=True)
+
+    def nodes_of_type(self, node_type):
+        """
+        Get the scene nodes of a type
+
+        :param node_type: the maya node type as a string
+        :return: a list of node names in scene order
+        """
+
+        return cmds.ls(type=node_type) or []
+
+    def get_values(self, node_attributes):
+        """
+        Get the values of many node attributes
+
+        :param node_attributes: a list of node attributes as strings
+        :return: a dictionary where keys are node attributes and values the
+        attribute values
+        """
+
+        return dict((x, cmds.getAttr(x)) for x in node_attributes)
+
+    def layer_adjustments(self, render_layer, node_attributes=None,
+                          read_values=True, value_plugs=None):
+        """
+        Get the adjustments of a render layer from its adjustment plugs
+
+        :param render_layer: the render layer name as a string
+        :param node_attributes: an optional set of the node attributes to
+        read, all the layer adjustments are read if None
+        :param read_values: bool used to read the adjustment values
+        :param value_plugs: an optional set of the adjustments[i].plug names
+        whose values are read, every value is read if None
+        :return: a list of tuples with the adjustments[i].plug name, the
+        overridden node attribute and the adjustment value, None when the
+        values aren't read
+        """
+
+        connections = cmds.listConnections("%s.adjustments" % render_layer,
+                                           source=True,
+                                           destination=False,
+                                           plugs=True,
+                                           connections=True) or []
+
+        adjustments = []
+
+        for adjustment_plug, node_attribute in zip(connections[::2],
+                                                   connections[1::2]):
+            if node_attributes is not None and \
+                    node_attribute not in node_attributes:
+                continue
+
+            value = None
+
+            if read_values and (value_plugs is None or
+                                adjustment_plug in value_plugs):
+                value = cmds.getAttr(value_plug(adjustment_plug))
+
+            adjustments.append((adjustment_plug, node_attribute, value))
+
+        return adjustments
+
+
+class ApiBackend(CmdsBackend):
+    """
+    Class reading the scene through maya.api.OpenMaya.
+    Nodes are iterated with MItDependencyNodes and the adjustments read from
+    the render layer plugs, without building and parsing command strings.
+    Queries the API can't answer go through maya.cmds
+    """
+    name = BACKEND_API
+
+    # Iterator filters of the node types listed through the API
+    NODE_TYPE_FILTERS = {"renderLayer": "kRenderLayer",
+                         "aiAOV": "kPluginDependNode"}
+
+    def __init__(self):
+        """
+        Initialise the backend
+
+        :raise ImportError: when maya.api.OpenMaya isn't available
+        """
+
+        import maya.api.OpenMaya as om
+
+        self.om = om
+
+        numeric_data = om.MFnNumericData
+
+        self._bool_types = set([numeric_data.kBoolean])
+        self._int_types = set([numeric_data.kByte,
+                               numeric_data.kChar,
+                               numeric_data.kShort,
+                               numeric_data.kInt,
+                               numeric_data.kLong])
+        self._float_types = set([numeric_data.kFloat,
+                                 numeric_data.kDouble])
+
+    @instrumentation.recorded("api.nodes_of_type")
+    def nodes_of_type(self, node_type):
+        """
+        Get the scene nodes of a type
+
+        :param node_type: the maya node type as a string
+        :return: a list of node names in scene order
+        """
+
+        type_filter = self.NODE_TYPE_FILTERS.get(node_type, None)
+
+        if type_filter is None:
+            return CmdsBackend.nodes_of_type(self, node_type)
+
+        nodes = []
+
+        iterator = self.om.MItDependencyNodes(getattr(self.om.MFn,
+                                                      type_filter))
+
+        while not iterator.isDone():
+            node_fn = self.om.MFnDependencyNode(iterator.thisNode())
+
+            if node_fn.typeName == node_type:
+                nodes.append(node_fn.name())
+
+            iterator.next()
+
+        return nodes
+
+    @instrumentation.recorded("api.get_values")
+    def get_values(self, node_attributes):
+        """
+        Get the values of many node attributes
+
+        :param node_attributes: a list of node attributes as strings
+        :return: a dictionary where keys are node attributes and values the
+        attribute values
+        """
+
+        values = dict()
+
+        for node_attribute in node_attributes:
+            plug = self._plug(node_attribute)
+
+            values[node_attribute] = self._plug_value(plug, plug,
+                                                      node_attribute)
+
+        return values
+
+    @instrumentation.recorded("api.layer_adjustments")
+    def layer_adjustments(self, render_layer, node_attributes=None,
+                          read_values=True, value_plugs=None):
+        """
+        Get the adjustments of a render layer from its adjustment plugs
+
+        :param render_layer: the render layer name as a string
+        :param node_attributes: an optional set of the node attributes to
+        read, all the layer adjustments are read if None
+        :param read_values: bool used to read the adjustment values
+        :param value_plugs: an optional set of the adjustments[i].plug names
+        whose values are read, every value is read if None
+        :return: a list of tuples with the adjustments[i].plug name, the
+        overridden node attribute and the adjustment value, None when the
+        values aren't read
+        """
+
+        selection = self.om.MSelectionList()
+        selection.add(render_layer)
+
+        layer_fn = self.om.MFnDependencyNode(selection.getDependNode(0))
+
+        adjustments_plug = layer_fn.findPlug("adjustments", False)
+        plug_attribute = layer_fn.attribute("plug")
+        value_attribute = layer_fn.attribute("value")
+
+        adjustments = []
+
+        for index in range(adjustments_plug.numElements()):
+            element = adjustments_plug.elementByPhysicalIndex(index)
+
+            adjustment_plug = element.child(plug_attribute)
+            source = adjustment_plug.source()
+
+            if source.isNull:
+                continue
+
+            node_attribute = source.partialName(includeNodeName=True,
+                                                useLongNames=True)
+
+            if node_attributes is not None and \
+                    node_attribute not in node_attributes:
+                continue
+
+            adjustment_name = adjustment_plug.name()
+
+            value = None
+
+            if read_values and (value_plugs is None or
+                                adjustment_name in value_plugs):
+                # The generic value plug is read with the overridden
+                # attribute type
+                value = self._plug_value(element.child(value_attribute),
+                                         source,
+                                         value_plug(adjustment_name))
+
+            adjustments.append((adjustment_name, node_attribute, value))
+
+        return adjustments
+
+    def _plug(self, node_attribute):
+        """
+        Get the MPlug of a node attribute
+
+        :param node_attribute: the node attribute as a string
+        :return: an MPlug object
+        """
+
+        selection = self.om.MSelectionList()
+
+        try:
+            selection.add(node_attribute)
+        except RuntimeError:
+            # Same error as a getAttr on a missing plug
+            raise RuntimeError("No object matches name: %s" % node_attribute)
+
+        return selection.getPlug(0)
+
+    def _plug_value(self, plug, attribute_plug, node_attribute):
+        """
+        Read a plug value with the type of an attribute.
+        Attributes which aren't single numeric values are read with getAttr
+
+        :param plug: the MPlug to read
+        :param attribute_plug: the MPlug of the attribute giving the type
+        :param node_attribute: the plug name read through getAttr as a string
+        :return: the plug value
+        """
+
+        attribute = attribute_plug.attribute()
+
+        if attribute.hasFn(self.om.MFn.kNumericAttribute):
+            numeric_type = self.om.MFnNumericAttribute(attribute).numericType()
+
+            if numeric_type in self._bool_types:
+                return plug.asBool()
+
+            if numeric_type in self._int_types:
+                return plug.asInt()
+
+            if numeric_type in self._float_types:
+                return plug.asDouble()
+
+        return cmds.getAttr(node_attribute)
+
+
+BACKENDS = {BACKEND_API: ApiBackend,
+            BACKEND_CMDS: CmdsBackend}
+
+
+def get_backend():
+    """
+    Get the scene backend, the api backend is used when it is available
+
+    :return: an ApiBackend or CmdsBackend object
+    """
+
+    global _backend
+
+    if _backend is None:
+        try:
+            _backend = ApiBackend()
+        except ImportError:
+            _backend = CmdsBackend()
+
+    return _backend
+
+
+def set_backend(name):
+    """
+    Set the scene backend used by the scene reads
+
+    :param name: BACKEND_API or BACKEND_CMDS
+    :return: the backend object
+    :raise ImportError: when the api backend isn't available
+    """
+
+    global _backend
+
+    _backend = BACKENDS[name]()
+
+    return _backend
+
+
+def value_plug(adjustment_plug):
+    """
+    Get the value plug of a render layer adjustment
+
+    :param adjustment_plug: the adjustments[i].plug name as a string
+    :return: the adjustments[i].value name as a string
+    """
+
+    return "%s.value" % adjustment_plug.rsplit(".", 1)[0]
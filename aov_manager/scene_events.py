@@ -0,0 +1,488 @@
+import re
+
+
+# Node types and attributes watched to keep the manager in sync
+WATCHED_NODE_TYPES = ["aiAOV", "renderLayer"]
+WATCHED_ATTRIBUTES = {"aiAOV": ["enabled", "type"],
+                      "renderLayer": ["adjustments"],
+                      "resolution": ["width", "height"],
+                      "aiAOVDriver": ["halfPrecision"]}
+
+# Render settings nodes giving the layer costs, watched by name only as they
+# are created with the scene
+RENDER_SETTINGS_NODES = {"resolution": "defaultResolution",
+                         "aiAOVDriver": "defaultArnoldDriver"}
+
+# Single adjustment of a render layer, the element or one of its children
+ADJUSTMENT_ATTRIBUTE = re.compile(
+    r"^(?P<layer>[^.]+)\.adjustments\[(?P<index>\d+)\]")
+
+# Delay used to coalesce bursts of scene events, in milliseconds
+DEBOUNCE_DELAY = 100
+
+
+class MayaCallbackRegistry(object):
+    """
+    Class registering scene callbacks through the maya OpenMaya messages.
+    Callbacks are given node and attribute names instead of MObjects and
+    MPlugs so listeners don't depend on the maya api
+    """
+    def add_node_added_callback(self, callback, node_type):
+        """
+        Register a callback for nodes of a given type being added
+
+        :param callback: function called with the node name
+        :param node_type: the maya node type as a string
+        :return: the callback id
+        """
+
+        import maya.OpenMaya as om
+
+        def node_added(node, client_data):
+            callback(om.MFnDependencyNode(node).name())
+
+        return om.MDGMessage.addNodeAddedCallback(node_added, node_type)
+
+    def add_node_removed_callback(self, callback, node_type):
+        """
+        Register a callback for nodes of a given type being removed
+
+        :param callback: function called with the node name
+        :param node_type: the maya node type as a string
+        :return: the callback id
+        """
+
+        import maya.OpenMaya as om
+
+        def node_removed(node, client_data):
+            callback(om.MFnDependencyNode(node).name())
+
+        return om.MDGMessage.addNodeRemovedCallback(node_removed, node_type)
+
+    def add_attribute_changed_callback(self, node_name, callback):
+        """
+        Register a callback for attribute changes on a node
+
+        :param node_name: the node name as a string
+        :param callback: function called with the node name and the
+        attribute name
+        :return: the callback id
+        """
+
+        import maya.OpenMaya as om
+
+        selection = om.MSelectionList()
+        selection.add(node_name)
+
+        node = om.MObject()
+        selection.getDependNode(0, node)
+
+        def attribute_changed(message, plug, other_plug, client_data):
+            plug_node = om.MFnDependencyNode(plug.node()).name()
+            attribute = plug.partialName(False, True, False,
+                                         False, True, True)
+            callback(plug_node, attribute)
+
+        return om.MNodeMessage.addAttributeChangedCallback(node,
+                                                           attribute_changed)
+
+    def add_name_changed_callback(self, node_name, callback):
+        """
+        Register a callback for a node being renamed
+
+        :param node_name: the node name as a string
+        :param callback: function called with the previous and the new node
+        names
+        :return: the callback id
+        """
+
+        import maya.OpenMaya as om
+
+        selection = om.MSelectionList()
+        selection.add(node_name)
+
+        node = om.MObject()
+        selection.getDependNode(0, node)
+
+        def name_changed(node, previous_name, client_data):
+            callback(previous_name, om.MFnDependencyNode(node).name())
+
+        return om.MNodeMessage.addNameChangedCallback(node, name_changed)
+
+    def add_plugin_loaded_callback(self, callback):
+        """
+        Register a callback for plugins being loaded
+
+        :param callback: function called with the plugin name
+        :return: the callback id
+        """
+
+        import maya.OpenMaya as om
+
+        def plugin_loaded(strings, client_data):
+            # Strings hold the plugin path and the plugin name
+            callback(strings[-1])
+
+        return om.MSceneMessage.addStringArrayCallback(
+            om.MSceneMessage.kAfterPluginLoad, plugin_loaded)
+
+    def add_plugin_unloaded_callback(self, callback):
+        """
+        Register a callback for plugins being unloaded
+
+        :param callback: function called with the plugin name
+        :return: the callback id
+        """
+
+        import maya.OpenMaya as om
+
+        def plugin_unloaded(strings, client_data):
+            # Strings hold the plugin name and the plugin path
+            callback(strings[0])
+
+        return om.MSceneMessage.addStringArrayCallback(
+            om.MSceneMessage.kAfterPluginUnload, plugin_unloaded)
+
+    def remove_callback(self, callback_id):
+        """
+        Remove a registered callback
+
+        :param callback_id: the callback id
+        :return:
+        """
+
+        import maya.OpenMaya as om
+
+        om.MMessage.removeCallback(callback_id)
+
+        return
+
+
+class SceneChanges(object):
+    """
+    Class collecting the scene events received between two updates
+    """
+    def __init__(self):
+        self.nodes_added = set()
+        self.nodes_removed = set()
+
+        # node -> node type of the added and removed nodes
+        self.node_types = dict()
+
+        # node attributes changed as "node.attribute" strings
+        self.attributes_changed = set()
+
+    def __nonzero__(self):
+        return bool(self.nodes_added or
+                    self.nodes_removed or
+                    self.attributes_changed)
+
+    def structure_changed(self):
+        """
+        Check if the changes need a full scene read, render layers were added
+        or removed or a whole adjustments array changed
+
+        :return: a bool
+        """
+
+        if self.added("renderLayer") or self.removed("renderLayer"):
+            return True
+
+        return any(x.split(".", 1)[1] == "adjustments"
+                   for x in self.attributes_changed)
+
+    def added(self, node_type):
+        """
+        Get the nodes of a type added
+
+        :param node_type: the maya node type as a string
+        :return: a list of node names
+        """
+
+        return sorted(x for x in self.nodes_added
+                      if self.node_types.get(x, None) == node_type)
+
+    def removed(self, node_type):
+        """
+        Get the nodes of a type removed
+
+        :param node_type: the maya node type as a string
+        :return: a list of node names
+        """
+
+        return sorted(x for x in self.nodes_removed
+                      if self.node_types.get(x, None) == node_type)
+
+    def adjustment_plugs(self):
+        """
+        Get the render layer adjustments changed
+
+        :return: a list of adjustments[i].plug names
+        """
+
+        adjustment_plugs = set()
+
+        for node_attribute in self.attributes_changed:
+            match = ADJUSTMENT_ATTRIBUTE.match(node_attribute)
+
+            if match is not None:
+                adjustment_plugs.add("%s.adjustments[%s].plug"
+                                     % match.group("layer", "index"))
+
+        return sorted(adjustment_plugs)
+
+    def attribute_values(self):
+        """
+        Get the node attributes whose value changed, the adjustments left out
+
+        :return: a list of node attributes
+        """
+
+        return sorted(x for x in self.attributes_changed
+                      if x.split(".")[1].split("[")[0] != "adjustments")
+
+    def changed(self, attribute):
+        """
+        Get the nodes whose given attribute value changed
+
+        :param attribute: the attribute name as a string
+        :return: a list of node names
+        """
+
+        return sorted(x.split(".")[0] for x in self.attributes_changed
+                      if x.split(".", 1)[1] == attribute)
+
+
+class SceneEventListener(object):
+    """
+    Class listening to aiAOV, renderLayer and render settings scene events
+    and coalescing them into a single debounced change notification
+    """
+    def __init__(self,
+                 on_change,
+                 registry=None,
+                 scheduler=None,
+                 delay=DEBOUNCE_DELAY):
+        """
+        Initialise the listener
+
+        :param on_change: function called with a SceneChanges object
+        :param registry: the callback registry, MayaCallbackRegistry if None
+        :param scheduler: function called with a delay in milliseconds and a
+        function to run after it, QTimer.singleShot if None
+        :param delay: the debounce delay in milliseconds
+        """
+
+        if scheduler is None:
+            from PySide import QtCore
+            scheduler = QtCore.QTimer.singleShot
+
+        self.on_change = on_change
+        self.registry = registry or MayaCallbackRegistry()
+        self.scheduler = scheduler
+        self.delay = delay
+
+        self._callback_ids = []
+        self._node_callback_ids = dict()
+
+        self._changes = SceneChanges()
+        self._scheduled = False
+        self._listening = False
+
+    def start(self, scene_nodes):
+        """
+        Register the scene callbacks
+
+        :param scene_nodes: dictionary where keys are watched node types and
+        values the existing nodes of that type, render settings nodes only
+        get their attribute changes
+        :return:
+        """
+
+        if self._listening:
+            return
+
+        for node_type in WATCHED_NODE_TYPES:
+            def node_added(node, node_type=node_type):
+                self._node_added(node, node_type)
+
+            def node_removed(node, node_type=node_type):
+                self._node_removed(node, node_type)
+
+            self._callback_ids.append(
+                self.registry.add_node_added_callback(node_added, node_type))
+
+            self._callback_ids.append(
+                self.registry.add_node_removed_callback(node_removed,
+                                                        node_type))
+
+        for node_type, nodes in scene_nodes.items():
+            for node in nodes:
+                self._watch_node(node, node_type)
+
+        self._listening = True
+
+        return
+
+    def stop(self):
+        """
+        Remove every registered callback and drop the pending changes
+
+        :return:
+        """
+
+        callback_ids = list(self._callback_ids)
+
+        for node_callback_ids in self._node_callback_ids.values():
+            callback_ids.extend(node_callback_ids)
+
+        for callback_id in callback_ids:
+            self.registry.remove_callback(callback_id)
+
+        self._callback_ids = []
+        self._node_callback_ids = dict()
+
+        self._changes = SceneChanges()
+        self._listening = False
+
+        return
+
+    def is_listening(self):
+        """
+        Check if the scene callbacks are registered
+
+        :return: a bool
+        """
+
+        return self._listening
+
+    def flush(self):
+        """
+        Send the pending changes to the change function
+
+        :return:
+        """
+
+        self._scheduled = False
+
+        if not self._listening or not self._changes:
+            return
+
+        changes = self._changes
+        self._changes = SceneChanges()
+
+        self.on_change(changes)
+
+        return
+
+    def _watch_node(self, node, node_type):
+        """
+        Register the attribute and name callbacks of a node, the callbacks
+        follow the node through renames
+
+        :param node: the node name as a string
+        :param node_type: the watched node type as a string
+        :return:
+        """
+
+        if node in self._node_callback_ids:
+            return
+
+        attributes = WATCHED_ATTRIBUTES[node_type]
+
+        def attribute_changed(node_name, attribute):
+            if attribute.split("[")[0] not in attributes:
+                return
+
+            self._changes.attributes_changed.add("%s.%s" % (node_name,
+                                                            attribute))
+            self._schedule()
+
+        def name_changed(previous_name, node_name):
+            self._node_renamed(previous_name, node_name, node_type)
+
+        self._node_callback_ids[node] = [
+            self.registry.add_attribute_changed_callback(node,
+                                                         attribute_changed),
+            self.registry.add_name_changed_callback(node, name_changed)]
+
+    def _node_added(self, node, node_type):
+        """
+        Watch a new node and record it as added
+
+        :param node: the node name as a string
+        :param node_type: the watched node type as a string
+        :return:
+        """
+
+        self._watch_node(node, node_type)
+
+        self._changes.nodes_removed.discard(node)
+        self._changes.nodes_added.add(node)
+        self._changes.node_types[node] = node_type
+        self._schedule()
+
+    def _node_removed(self, node, node_type):
+        """
+        Remove the callbacks of a deleted node and record it as removed
+
+        :param node: the node name as a string
+        :param node_type: the watched node type as a string
+        :return:
+        """
+
+        for callback_id in self._node_callback_ids.pop(node, []):
+            self.registry.remove_callback(callback_id)
+
+        self._changes.nodes_added.discard(node)
+        self._changes.nodes_removed.add(node)
+        self._changes.node_types[node] = node_type
+        self._schedule()
+
+    def _node_renamed(self, previous_name, node, node_type):
+        """
+        Keep the callbacks of a renamed node under its new name, the node is
+        recorded as removed under its previous name and added under the new
+        one
+
+        :param previous_name: the previous node name as a string
+        :param node: the new node name as a string
+        :param node_type: the watched node type as a string
+        :return:
+        """
+
+        # Maya also sends the name given to the nodes being created
+        if not previous_name or previous_name == node or \
+                previous_name not in self._node_callback_ids:
+            return
+
+        self._node_callback_ids[node] = \
+            self._node_callback_ids.pop(previous_name)
+
+        # Render settings nodes only send their attribute changes
+        if node_type not in WATCHED_NODE_TYPES:
+            return
+
+        self._changes.nodes_added.discard(previous_name)
+        self._changes.nodes_removed.add(previous_name)
+        self._changes.node_types[previous_name] = node_type
+
+        self._changes.nodes_removed.discard(node)
+        self._changes.nodes_added.add(node)
+        self._changes.node_types[node] = node_type
+
+        self._schedule()
+
+    def _schedule(self):
+        """
+        Schedule the pending changes to be sent after the debounce delay,
+        once for a burst of events
+
+        :return:
+        """
+
+        if self._scheduled:
+            return
+
+        self._scheduled = True
+        self.scheduler(self.delay, self.flush)
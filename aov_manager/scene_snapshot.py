@@ -0,0 +1,591 @@
+import scene_backend
+
+
+DEFAULT_LAYER = "defaultRenderLayer"
+
+
+class SceneSnapshot(object):
+    """
+    Class holding an in memory layer x aov matrix of the scene.
+    All the render layers, aovs and layer adjustments are read once in bulk
+    through the scene backend so queries can be answered without going back
+    to maya
+    """
+    def __init__(self):
+        """
+        Initialise an empty snapshot
+        """
+        self.current_layer = DEFAULT_LAYER
+
+        # Render layers excluding the default render layer
+        self.render_layers = []
+
+        # aiAOV node names in scene order
+        self.aovs = []
+
+        # Live value of every node attribute read by the snapshot
+        self.values = dict()
+
+        # node attribute -> {render layer: override value}
+        self.overrides = dict()
+
+        # node attribute -> {render layer: adjustment plug}
+        self.adjustment_plugs = dict()
+
+    @classmethod
+    def read(cls):
+        """
+        Read the scene render layers, aovs and layer adjustments in one pass
+
+        :return: a SceneSnapshot object
+        """
+
+        backend = scene_backend.get_backend()
+
+        snapshot = cls()
+        snapshot.current_layer = backend.current_render_layer()
+
+        all_layers = backend.nodes_of_type("renderLayer")
+        snapshot.render_layers = [x for x in all_layers
+                                  if x != DEFAULT_LAYER]
+
+        snapshot.aovs = backend.nodes_of_type("aiAOV")
+
+        # Read every aov enabled plug once
+        snapshot.values.update(backend.get_values(["%s.enabled" % x
+                                                   for x in snapshot.aovs]))
+
+        # Read every layer adjustment with one query per layer
+        for render_layer in all_layers:
+            snapshot._read_layer_adjustments(render_layer)
+
+        return snapshot
+
+    @classmethod
+    def read_attributes(cls, node_attributes):
+        """
+        Read the layer adjustments of only the given node attributes.
+        The snapshot aov list is left empty
+
+        :param node_attributes: a list of node attributes as strings
+        :return: a SceneSnapshot object
+        """
+
+        backend = scene_backend.get_backend()
+
+        snapshot = cls()
+        snapshot.current_layer = backend.current_render_layer()
+
+        snapshot.render_layers = [x for x in
+                                  backend.nodes_of_type("renderLayer")
+                                  if x != DEFAULT_LAYER]
+
+        snapshot.refresh_attributes(node_attributes)
+
+        return snapshot
+
+    def refresh_attributes(self, node_attributes):
+        """
+        Read again the live value and the layer adjustments of node
+        attributes changed after the snapshot was read. The current render
+        layer is read again first as the live values depend on it
+
+        :param node_attributes: a list of node attributes as strings
+        :return:
+        """
+
+        node_attributes = set(node_attributes)
+
+        self.set_current_layer(
+            scene_backend.get_backend().current_render_layer())
+
+        for node_attribute in node_attributes:
+            self.overrides.pop(node_attribute, None)
+            self.adjustment_plugs.pop(node_attribute, None)
+
+        self.values.update(
+            scene_backend.get_backend().get_values(node_attributes))
+
+        if not node_attributes:
+            return
+
+        for render_layer in [DEFAULT_LAYER] + self.render_layers:
+            self._read_layer_adjustments(render_layer, node_attributes)
+
+        return
+
+    def refresh_adjustments(self, adjustment_plugs):
+        """
+        Read again the layer adjustments changed after the snapshot was read.
+        The adjustments of every changed layer are listed without their
+        values, only the values of the changed adjustments are read
+
+        :param adjustment_plugs: a list of the changed adjustments[i].plug
+        names
+        :return:
+        """
+
+        backend = scene_backend.get_backend()
+
+        self.set_current_layer(backend.current_render_layer())
+
+        adjustment_plugs = set(adjustment_plugs)
+
+        for render_layer in sorted(set(x.split(".")[0]
+                                       for x in adjustment_plugs)):
+            current_layer = render_layer == self.current_layer
+
+            adjustments = backend.layer_adjustments(
+                render_layer,
+                read_values=not current_layer,
+                value_plugs=adjustment_plugs)
+
+            layer_plugs = dict((node_attribute, adjustment_plug)
+                               for adjustment_plug, node_attribute, _
+                               in adjustments)
+
+            # Adjustments removed from the layer
+            for node_attribute, adjusted_layers in \
+                    self.adjustment_plugs.items():
+                if render_layer in adjusted_layers and \
+                        node_attribute not in layer_plugs:
+                    self._remove_adjustment(render_layer, node_attribute)
+
+                    # The live value falls back to the master value
+                    if current_layer:
+                        self.values.pop(node_attribute, None)
+
+            for adjustment_plug, node_attribute, value in adjustments:
+                if adjustment_plug not in adjustment_plugs:
+                    # Overrides recorded by the tool without their plug
+                    adjusted_layers = self.adjustment_plugs.get(
+                        node_attribute, {})
+
+                    if render_layer in adjusted_layers:
+                        adjusted_layers[render_layer] = adjustment_plug
+
+                    continue
+
+                if current_layer:
+                    value = self.value(node_attribute)
+
+                self._read_adjustment(render_layer,
+                                      adjustment_plug,
+                                      node_attribute,
+                                      value)
+
+        return
+
+    def add_aovs(self, aov_nodes):
+        """
+        Add aiAOV nodes created after the snapshot was read, their
+        attributes are read with refresh_attributes
+
+        :param aov_nodes: a list of aiAOV node names
+        :return:
+        """
+
+        for aov_node in aov_nodes:
+            if aov_node not in self.aovs:
+                self.aovs.append(aov_node)
+
+        return
+
+    def remove_aovs(self, aov_nodes):
+        """
+        Forget aiAOV nodes deleted after the snapshot was read with the
+        values and adjustments of their attributes
+
+        :param aov_nodes: a list of aiAOV node names
+        :return:
+        """
+
+        aov_nodes = set(aov_nodes)
+
+        self.aovs = [x for x in self.aovs if x not in aov_nodes]
+
+        for attribute_data in [self.values,
+                               self.overrides,
+                               self.adjustment_plugs]:
+            for node_attribute in list(attribute_data):
+                if node_attribute.split(".")[0] in aov_nodes:
+                    del attribute_data[node_attribute]
+
+        return
+
+    def set_current_layer(self, render_layer):
+        """
+        Record a render layer switch made after the snapshot was read.
+        The live values of the previous layer are kept as its overrides or
+        as the master values, the live values of the new layer are taken
+        from the snapshot overrides
+
+        :param render_layer: the render layer name as a string
+        :return:
+        """
+
+        if render_layer == self.current_layer:
+            return
+
+        for node_attribute, value in self.values.items():
+            layer_overrides = self.overrides.get(node_attribute, None)
+
+            if not layer_overrides:
+                continue
+
+            if self.current_layer in layer_overrides:
+                layer_overrides[self.current_layer] = value
+            else:
+                layer_overrides[DEFAULT_LAYER] = value
+
+        self.current_layer = render_layer
+
+        for node_attribute in self.values:
+            layer_overrides = self.overrides.get(node_attribute, None)
+
+            if not layer_overrides:
+                continue
+
+            if render_layer in layer_overrides:
+                self.values[node_attribute] = layer_overrides[render_layer]
+            elif DEFAULT_LAYER in layer_overrides:
+                self.values[node_attribute] = layer_overrides[DEFAULT_LAYER]
+
+        return
+
+    def _read_layer_adjustments(self, render_layer, node_attributes=None):
+        """
+        Read the adjustments of a render layer from its adjustment plugs.
+        The plugs are read directly so the overrides of every layer are found
+        without switching the current render layer
+
+        :param render_layer: the render layer name as a string
+        :param node_attributes: an optional set of the node attributes to
+        read, all the layer adjustments are read if None
+        :return:
+        """
+
+        # The adjustment of the current layer is only written back when
+        # switching layers, the live attribute holds the up to date value
+        current_layer = render_layer == self.current_layer
+
+        adjustments = scene_backend.get_backend().layer_adjustments(
+            render_layer,
+            node_attributes=node_attributes,
+            read_values=not current_layer)
+
+        for adjustment_plug, node_attribute, value in adjustments:
+            if current_layer:
+                value = self.value(node_attribute)
+
+            self._read_adjustment(render_layer,
+                                  adjustment_plug,
+                                  node_attribute,
+                                  value)
+
+        return
+
+    def _read_adjustment(self, render_layer, adjustment_plug, node_attribute,
+                         value):
+        """
+        Store a single layer adjustment
+
+        :param render_layer: the render layer name as a string
+        :param adjustment_plug: the adjustments[i].plug name as a string
+        :param node_attribute: the overridden node attribute as a string
+        :param value: the adjustment value
+        :return:
+        """
+
+        self.adjustment_plugs.setdefault(node_attribute,
+                                         dict())[render_layer] = adjustment_plug
+
+        self.overrides.setdefault(node_attribute, dict())[render_layer] = value
+
+        return
+
+    def _remove_adjustment(self, render_layer, node_attribute):
+        """
+        Forget a single layer adjustment
+
+        :param render_layer: the render layer name as a string
+        :param node_attribute: the overridden node attribute as a string
+        :return:
+        """
+
+        for attribute_data in [self.overrides, self.adjustment_plugs]:
+            layer_data = attribute_data.get(node_attribute, {})
+            layer_data.pop(render_layer, None)
+
+            if not layer_data:
+                attribute_data.pop(node_attribute, None)
+
+        return
+
+    def value(self, node_attribute):
+        """
+        Get the live value of a node attribute, read lazily for attributes
+        which are not aov enabled plugs
+
+        :param node_attribute: the node attribute as a string
+        :return: the attribute value
+        """
+
+        if node_attribute not in self.values:
+            self.values.update(
+                scene_backend.get_backend().get_values([node_attribute]))
+
+        return self.values[node_attribute]
+
+    def read_values(self, node_attributes):
+        """
+        Read the live value of the node attributes not read yet with a
+        single backend query
+
+        :param node_attributes: a list of node attributes as strings
+        :return:
+        """
+
+        missing_attributes = [x for x in node_attributes
+                              if x not in self.values]
+
+        if missing_attributes:
+            self.values.update(
+                scene_backend.get_backend().get_values(missing_attributes))
+
+        return
+
+    def master_value(self, node_attribute):
+        """
+        Get the value of a node attribute on the master layer
+
+        :param node_attribute: the node attribute as a string
+        :return: the master layer value
+        """
+
+        layer_overrides = self.overrides.get(node_attribute, {})
+
+        if self.current_layer == DEFAULT_LAYER:
+            return self.value(node_attribute)
+
+        if DEFAULT_LAYER in layer_overrides:
+            return layer_overrides[DEFAULT_LAYER]
+
+        return self.value(node_attribute)
+
+    def layer_value(self, node_attribute, render_layer):
+        """
+        Get the value a node attribute evaluates to on a render layer
+
+        :param node_attribute: the node attribute as a string
+        :param render_layer: the render layer name as a string
+        :return: the attribute value on the render layer
+        """
+
+        if render_layer != DEFAULT_LAYER:
+            layer_overrides = self.overrides.get(node_attribute, {})
+
+            if render_layer in layer_overrides:
+                return layer_overrides[render_layer]
+
+        return self.master_value(node_attribute)
+
+    def set_override(self, node_attribute, render_layer, value,
+                     adjustment_plug=None):
+        """
+        Record a layer override written to the scene after the snapshot
+        was read
+
+        :param node_attribute: the node attribute as a string
+        :param render_layer: the render layer name as a string
+        :param value: the override value
+        :param adjustment_plug: the adjustments[i].plug name if known
+        :return:
+        """
+
+        layer_overrides = self.overrides.setdefault(node_attribute, dict())
+
+        # Maya stores the master value on the default layer with the first
+        # override of an attribute
+        if DEFAULT_LAYER not in layer_overrides:
+            layer_overrides[DEFAULT_LAYER] = self.master_value(node_attribute)
+
+        layer_overrides[render_layer] = value
+
+        layer_plugs = self.adjustment_plugs.setdefault(node_attribute, dict())
+
+        if adjustment_plug is not None or render_layer not in layer_plugs:
+            layer_plugs[render_layer] = adjustment_plug
+
+        if render_layer == self.current_layer:
+            self.values[node_attribute] = value
+
+        return
+
+    def remove_override(self, node_attribute, render_layer):
+        """
+        Record a layer override removed from the scene after the snapshot
+        was read
+
+        :param node_attribute: the node attribute as a string
+        :param render_layer: the render layer name as a string
+        :return:
+        """
+
+        self.overrides.get(node_attribute, {}).pop(render_layer, None)
+        self.adjustment_plugs.get(node_attribute, {}).pop(render_layer, None)
+
+        if render_layer == self.current_layer:
+            self.values[node_attribute] = self.master_value(node_attribute)
+
+        return
+
+    def set_value(self, node_attribute, value):
+        """
+        Record a live attribute value written to the scene after the snapshot
+        was read
+
+        :param node_attribute: the node attribute as a string
+        :param value: the attribute value
+        :return:
+        """
+
+        self.values[node_attribute] = value
+
+        layer_overrides = self.overrides.get(node_attribute, {})
+
+        # Without an override on the current layer the master value changes
+        if self.current_layer in layer_overrides:
+            layer_overrides[self.current_layer] = value
+        elif DEFAULT_LAYER in layer_overrides:
+            layer_overrides[DEFAULT_LAYER] = value
+
+        return
+
+    def override_data(self, node_attribute):
+        """
+        Get the layer override values of a node attribute
+
+        :param node_attribute: the node attribute as a string
+        :return: dictionary where keys are render layers and value is the
+        attribute override value for the render layer, False if the attribute
+        has no layer overrides
+        """
+
+        layer_overrides = self.overrides.get(node_attribute, None)
+
+        if layer_overrides is None:
+            return False
+
+        return dict((render_layer, value)
+                    for render_layer, value in layer_overrides.items()
+                    if render_layer in self.render_layers)
+
+    def scene_aovs(self):
+        """
+        Get the aov names existing in the scene
+
+        :return: list of the scene aovs
+        """
+
+        return [aov_short_name(x) for x in self.aovs]
+
+    def layer_aovs(self):
+        """
+        Get the aovs enabled for each render layer
+
+        :return: a dictionary where keys are render layers and values the
+                 render layer enabled aovs
+        """
+
+        aov_dict = dict()
+
+        for render_layer in self.render_layers:
+            aov_dict[render_layer] = ["beauty"]
+
+            for aov in self.aovs:
+                if self.layer_value("%s.enabled" % aov, render_layer):
+                    aov_dict[render_layer].append(aov_short_name(aov))
+
+        return aov_dict
+
+
+def aov_short_name(aov_node):
+    """
+    Get the aov name from an aiAOV node name
+
+    :param aov_node: the aiAOV node name as a string
+    :return: the aov name as a string
+    """
+
+    return aov_node.split("aiAOV_")[-1]
+
+
+# Kept here for the writers which pair snapshots with adjustment values
+value_plug = scene_backend.value_plug
+
+
+def read_adjusted_layers(node_attributes):
+    """
+    Get the render layers holding an adjustment of some node attributes,
+    without reading the adjustment values
+
+    :param node_attributes: a list of node attributes as strings
+    :return: a dictionary where keys are node attributes and values a list of
+    render layers, the default render layer included
+    """
+
+    backend = scene_backend.get_backend()
+
+    node_attributes = set(node_attributes)
+
+    adjusted_layers = dict()
+
+    for render_layer in backend.nodes_of_type("renderLayer"):
+        adjustments = backend.layer_adjustments(
+            render_layer,
+            node_attributes=node_attributes,
+            read_values=False)
+
+        for _, node_attribute, _ in adjustments:
+            adjusted_layers.setdefault(node_attribute,
+                                       []).append(render_layer)
+
+    return adjusted_layers
+
+
+def diff_layer_aovs(previous, current):
+    """
+    Get the difference between two layer aovs states
+
+    :param previous: dictionary where keys are render layers and values the
+    render layer aovs
+    :param current: dictionary where keys are render layers and values the
+    render layer aovs
+    :return: a tuple with the added render layers, the removed render layers,
+    a dictionary of the added aovs per render layer and a dictionary of the
+    removed aovs per render layer
+    """
+
+    added_layers = [x for x in current if x not in previous]
+    removed_layers = [x for x in previous if x not in current]
+
+    added_aovs = dict()
+    removed_aovs = dict()
+
+    for render_layer, aov_list in current.items():
+        previous_aovs = previous.get(render_layer, [])
+
+        previous_set = set(previous_aovs)
+        current_set = set(aov_list)
+
+        added = [x for x in aov_list if x not in previous_set]
+        removed = [x for x in previous_aovs if x not in current_set]
+
+        if added:
+            added_aovs[render_layer] = added
+
+        if removed:
+            removed_aovs[render_layer] = removed
+
+    return added_layers, removed_layers, added_aovs, removed_aovs
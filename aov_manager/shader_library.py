@@ -0,0 +1,326 @@
+import json
+import os
+import struct
+
+import maya.cmds as cmds
+
+
+SHADERS_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                              "shaders")
+
+# Procedural descriptions of the preset shader networks
+NETWORKS_FILE = "shader_networks.json"
+
+PRESET_PREFIX = "AOV_"
+PRESET_EXTENSION = ".mb"
+
+# Build the preset networks described in the networks file by default
+# instead of importing their binary preset files
+PROCEDURAL_SHADERS = os.environ.get("AOV_MANAGER_PROCEDURAL_SHADERS",
+                                    "0") == "1"
+
+_library = None
+
+
+class ShaderPreset(object):
+    """
+    Class holding the manifest entry of a preset shader file
+    """
+    __slots__ = ["name", "path", "mtime", "nodes"]
+
+    def __init__(self, name, path, mtime, nodes):
+        self.name = name
+        self.path = path
+        self.mtime = mtime
+        self.nodes = nodes
+
+
+class ShaderLibrary(object):
+    """
+    Class indexing the preset shaders of the shaders folder.
+    The folder is scanned once into a manifest and preset networks already
+    in the scene are reused instead of importing their file again
+    """
+    def __init__(self, shaders_folder=SHADERS_FOLDER):
+        """
+        Initialise the library
+
+        :param shaders_folder: the folder holding the preset shader files
+        """
+
+        self.shaders_folder = shaders_folder
+
+        self.presets = dict()
+        self.networks = dict()
+
+        self._networks_mtime = None
+        self._scanned = False
+
+    def scan(self, force=False):
+        """
+        Index the preset shader files and load the network descriptions.
+        Files unchanged since the last scan keep their node list
+
+        :param force: bool used to read every file again
+        :return:
+        """
+
+        presets = dict()
+
+        for file_name in sorted(os.listdir(self.shaders_folder)):
+            base_name, extension = os.path.splitext(file_name)
+
+            if extension != PRESET_EXTENSION or \
+                    not base_name.startswith(PRESET_PREFIX):
+                continue
+
+            name = base_name[len(PRESET_PREFIX):]
+            path = os.path.join(self.shaders_folder, file_name)
+            mtime = os.path.getmtime(path)
+
+            preset = self.presets.get(name, None)
+
+            if force or preset is None or preset.mtime != mtime:
+                preset = ShaderPreset(name,
+                                      path,
+                                      mtime,
+                                      read_preset_nodes(path))
+
+            presets[name] = preset
+
+        self.presets = presets
+
+        networks_file = os.path.join(self.shaders_folder, NETWORKS_FILE)
+
+        if not os.path.exists(networks_file):
+            self.networks = dict()
+            self._networks_mtime = None
+
+        elif force or os.path.getmtime(networks_file) != self._networks_mtime:
+            with open(networks_file) as f:
+                self.networks = json.load(f)
+
+            self._networks_mtime = os.path.getmtime(networks_file)
+
+        self._scanned = True
+
+        return
+
+    def manifest(self):
+        """
+        Get the manifest index of the preset shaders
+
+        :return: dictionary where keys are preset names and values dictionaries
+        with the path, mtime and nodes of the preset file
+        """
+
+        self._ensure_scanned()
+
+        manifest = dict()
+
+        for name, preset in self.presets.items():
+            manifest[name] = {"path": preset.path,
+                              "mtime": preset.mtime,
+                              "nodes": list(preset.nodes)}
+
+        return manifest
+
+    def preset(self, name):
+        """
+        Get the manifest entry of a preset
+
+        :param name: the preset name as a string
+        :return: a ShaderPreset object or None if there is no preset file
+        """
+
+        self._ensure_scanned()
+
+        return self.presets.get(name, None)
+
+    def has_network(self, name):
+        """
+        Check if a preset can be built procedurally
+
+        :param name: the preset name as a string
+        :return: a bool
+        """
+
+        self._ensure_scanned()
+
+        return name in self.networks
+
+    def existing_shaders(self, names):
+        """
+        Get the presets whose shader is already in the scene, with a single
+        scene query
+
+        :param names: a list of preset names
+        :return: a set of preset names
+        """
+
+        shaders = dict((shader_name(x), x) for x in names)
+
+        return set(shaders[x] for x in cmds.ls(shaders.keys()) or [])
+
+    def import_presets(self, names, procedural=None):
+        """
+        Bring the shader networks of many presets to the scene.
+        Presets already in the scene are reused and every preset is brought
+        at most once
+
+        :param names: a list of preset names
+        :param procedural: bool used to build the networks from their
+        description instead of importing the preset files,
+        PROCEDURAL_SHADERS if None
+        :return: a list of the created node names
+        """
+
+        if procedural is None:
+            procedural = PROCEDURAL_SHADERS
+
+        self._ensure_scanned()
+
+        existing_shaders = self.existing_shaders(names)
+
+        created_nodes = []
+
+        for name in names:
+            if name in existing_shaders:
+                continue
+
+            existing_shaders.add(name)
+
+            if procedural and name in self.networks:
+                created_nodes.extend(self.build_network(name))
+
+            elif name in self.presets:
+                created_nodes.extend(self.import_preset(name) or [])
+
+        return created_nodes
+
+    def import_preset(self, name):
+        """
+        Import the preset shader file of a preset
+
+        :param name: the preset name as a string
+        :return: the imported nodes
+        """
+
+        import_nodes = cmds.file(self.preset(name).path,
+                                 force=True,
+                                 options="v=0",
+                                 typ="mayaBinary",
+                                 pr=True,
+                                 i=True,
+                                 gr=True,
+                                 dns=True,
+                                 rnn=True)
+
+        return import_nodes
+
+    def build_network(self, name):
+        """
+        Build the shader network of a preset from its description, without
+        opening the preset file
+
+        :param name: the preset name as a string
+        :return: a list of the created node names
+        """
+
+        network = self.networks[name]
+
+        # Description node names to the names given by maya
+        node_names = dict()
+
+        for node_type, node_name, classification in network["nodes"]:
+            if classification is None:
+                new_node = cmds.createNode(node_type, name=node_name)
+            else:
+                # asShader, asTexture or asUtility flag
+                flags = {"as%s" % classification.title(): True}
+
+                new_node = cmds.shadingNode(node_type, name=node_name, **flags)
+
+            node_names[node_name] = new_node
+
+        def scene_plug(plug):
+            node, _, attribute = plug.partition(".")
+            return "%s.%s" % (node_names.get(node, node), attribute)
+
+        for plug in network["removed"]:
+            cmds.removeMultiInstance(scene_plug(plug), b=True)
+
+        for plug, value in network["attributes"]:
+            if isinstance(value, list):
+                cmds.setAttr(scene_plug(plug), *value, type="double3")
+            else:
+                cmds.setAttr(scene_plug(plug), value)
+
+        for source, destination in network["connections"]:
+            cmds.connectAttr(scene_plug(source),
+                             scene_plug(destination),
+                             force=True)
+
+        return [node_names[x[1]] for x in network["nodes"]]
+
+    def _ensure_scanned(self):
+        if not self._scanned:
+            self.scan()
+
+
+def get_library():
+    """
+    Get the shared shader library, scanned on first use
+
+    :return: a ShaderLibrary object
+    """
+
+    global _library
+
+    if _library is None:
+        _library = ShaderLibrary()
+
+    return _library
+
+
+def shader_name(name):
+    """
+    Get the surface shader name of a preset
+
+    :param name: the preset name as a string
+    :return: the shader name as a string
+    """
+
+    return "%s%s_MAT" % (PRESET_PREFIX, name)
+
+
+def read_preset_nodes(path):
+    """
+    Get the nodes created by a maya binary file without opening it in maya.
+    The node names are read from the CREA chunks of the file
+
+    :param path: the maya binary file path as a string
+    :return: a list of node names
+    """
+
+    with open(path, "rb") as f:
+        data = f.read()
+
+    nodes = []
+
+    offset = data.find(b"CREA")
+
+    while offset != -1:
+        # 64 bit chunks: tag, 4 bytes of padding and the data size
+        size = struct.unpack(">Q", data[offset + 8:offset + 16])[0]
+        body = data[offset + 16:offset + 16 + size]
+
+        # The first byte holds the creation flags followed by the node name
+        node_name = body[1:].split(b"\x00")[0]
+
+        if node_name:
+            nodes.append(node_name.decode("ascii"))
+
+        offset = data.find(b"CREA", offset + 16 + size)
+
+    return nodes
@@ -0,0 +1,70 @@
+import contextlib
+from timeit import default_timer
+
+
+class StartupProfiler(object):
+    """
+    Class timing the startup phases of the tool.
+    The total time is measured from the profiler creation so the report
+    gives the time to interactive once the last phase has run
+    """
+    def __init__(self, timer=default_timer):
+        """
+        Initialise the profiler and start the total time
+
+        :param timer: function returning the current time in seconds
+        """
+
+        self.timer = timer
+        self.start_time = timer()
+
+        # (phase name, duration in seconds) in the order they ran
+        self.phases = []
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """
+        Context manager timing a startup phase.
+        Phases run in several slices in a row are summed
+
+        :param name: the phase name as a string
+        :return:
+        """
+
+        start_time = self.timer()
+
+        try:
+            yield
+        finally:
+            duration = self.timer() - start_time
+
+            if self.phases and self.phases[-1][0] == name:
+                duration += self.phases.pop()[1]
+
+            self.phases.append((name, duration))
+
+    def elapsed(self):
+        """
+        Get the time since the profiler was created
+
+        :return: the elapsed time in seconds as a float
+        """
+
+        return self.timer() - self.start_time
+
+    def report(self):
+        """
+        Get the report of the phase durations
+
+        :return: the report as a string
+        """
+
+        lines = ["AOV MANAGER STARTUP"]
+
+        for name, duration in self.phases:
+            lines.append("    %-24s %8.3fs" % (name, duration))
+
+        lines.append("    %-24s %8.3fs" % ("time to interactive",
+                                            self.elapsed()))
+
+        return "\n".join(lines)
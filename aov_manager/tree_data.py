@@ -0,0 +1,225 @@
+from array import array
+
+
+MASTER_LAYER = "masterLayer"
+
+
+class NameTable(object):
+    """
+    Class interning names so they are stored once and referenced by index
+    """
+    def __init__(self):
+        self._names = []
+        self._indexes = dict()
+
+    def __len__(self):
+        return len(self._names)
+
+    def intern(self, name):
+        """
+        Get the index of a name, adding it to the table if needed
+
+        :param name: the name as a string
+        :return: the name index as an int
+        """
+
+        index = self._indexes.get(name, None)
+
+        if index is None:
+            index = len(self._names)
+            self._names.append(name)
+            self._indexes[name] = index
+
+        return index
+
+    def index(self, name):
+        """
+        Get the index of a name
+
+        :param name: the name as a string
+        :return: the name index as an int or None if not in the table
+        """
+
+        return self._indexes.get(name, None)
+
+    def name(self, index):
+        """
+        Get the name stored at an index
+
+        :param index: the name index as an int
+        :return: the name as a string
+        """
+
+        return self._names[index]
+
+
+class LayerEntry(object):
+    """
+    Class holding a render layer name and the interned indexes of its aovs
+    """
+    __slots__ = ["name", "aovs"]
+
+    def __init__(self, name):
+        self.name = name
+        self.aovs = array("i")
+
+
+class LayerAovTable(object):
+    """
+    Class holding the layer x aov table displayed by the layers tree.
+    Layers are kept sorted with the master layer last and every layer stores
+    its aovs as an array of indexes into a shared name table
+    """
+    def __init__(self):
+        self.aov_names = NameTable()
+        self.layers = []
+        self._layer_rows = dict()
+
+    def layer_count(self):
+        """
+        Get the number of layers
+
+        :return: the number of layers as an int
+        """
+
+        return len(self.layers)
+
+    def layer_row(self, render_layer):
+        """
+        Get the row of a layer
+
+        :param render_layer: the name of the render layer as a string
+        :return: the layer row as an int or None if not in the table
+        """
+
+        return self._layer_rows.get(render_layer, None)
+
+    def layer_entry(self, render_layer):
+        """
+        Get the entry of a layer
+
+        :param render_layer: the name of the render layer as a string
+        :return: a LayerEntry object or None if not in the table
+        """
+
+        row = self._layer_rows.get(render_layer, None)
+
+        if row is None:
+            return None
+
+        return self.layers[row]
+
+    def insert_row(self, render_layer):
+        """
+        Get the row a new layer would be inserted at
+
+        :param render_layer: the name of the render layer as a string
+        :return: the row as an int
+        """
+
+        key = layer_sort_key(render_layer)
+
+        return len([x for x in self.layers if layer_sort_key(x.name) < key])
+
+    def insert_layer(self, render_layer):
+        """
+        Insert a layer at its sorted row
+
+        :param render_layer: the name of the render layer as a string
+        :return: the inserted LayerEntry
+        """
+
+        entry = LayerEntry(render_layer)
+
+        self.layers.insert(self.insert_row(render_layer), entry)
+        self._update_rows()
+
+        return entry
+
+    def remove_layer(self, render_layer):
+        """
+        Remove a layer
+
+        :param render_layer: the name of the render layer as a string
+        :return:
+        """
+
+        del self.layers[self._layer_rows[render_layer]]
+        self._update_rows()
+
+        return
+
+    def _update_rows(self):
+        self._layer_rows = dict((x.name, row)
+                                for row, x in enumerate(self.layers))
+
+    def aovs(self, render_layer):
+        """
+        Get the aovs of a layer
+
+        :param render_layer: the name of the render layer as a string
+        :return: a list of aov names
+        """
+
+        entry = self.layer_entry(render_layer)
+
+        if entry is None:
+            return []
+
+        return [self.aov_names.name(x) for x in entry.aovs]
+
+    def aov_row(self, render_layer, aov):
+        """
+        Get the row of an aov under a layer
+
+        :param render_layer: the name of the render layer as a string
+        :param aov: the aov name as a string
+        :return: the aov row as an int or None if not under the layer
+        """
+
+        entry = self.layer_entry(render_layer)
+        aov_index = self.aov_names.index(aov)
+
+        if entry is None or aov_index is None or aov_index not in entry.aovs:
+            return None
+
+        return entry.aovs.index(aov_index)
+
+    def insert_aov(self, render_layer, row, aov):
+        """
+        Insert an aov under a layer
+
+        :param render_layer: the name of the render layer as a string
+        :param row: the aov row as an int
+        :param aov: the aov name as a string
+        :return:
+        """
+
+        self.layer_entry(render_layer).aovs.insert(row,
+                                                   self.aov_names.intern(aov))
+
+        return
+
+    def remove_aov(self, render_layer, row):
+        """
+        Remove an aov from a layer
+
+        :param render_layer: the name of the render layer as a string
+        :param row: the aov row as an int
+        :return:
+        """
+
+        del self.layer_entry(render_layer).aovs[row]
+
+        return
+
+
+def layer_sort_key(render_layer):
+    """
+    Sort key for the layer rows, the master layer is kept last
+
+    :param render_layer: the name of the render layer as a string
+    :return: a tuple to sort by
+    """
+
+    return render_layer == MASTER_LAYER, render_layer
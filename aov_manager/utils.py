@@ -1,130 +1,182 @@
-import os
+import contextlib
 
 import maya.cmds as cmds
 from mtoa import core, aovs
 
+import aov_registry
+import layer_members
+import scene_snapshot
+import shader_library
+import visibility
 
-def get_scene_aovs():
-    """
-    Get the aov existing in the maya scene
 
-    :return: list of the scene aovs
-    """
+# Number of transactions running, only the outermost one opens an undo chunk
+_transaction_depth = 0
 
-    scene_aovs = cmds.ls(type="aiAOV") or None
-    
-    if scene_aovs is None:
-        return []
+# Aov types rendered by a colour shader, created as rgb aovs
+SHADER_AOV_TYPES = ["<presets>", "<attrId>", "<customID>"]
 
-    scene_aovs = [aov.split("aiAOV_")[-1] for aov in scene_aovs]
+# Shared arnold nodes every aov created in bulk is wired to
+DEFAULT_DRIVER = "defaultArnoldDriver"
+DEFAULT_FILTER = "defaultArnoldFilter"
+RENDER_OPTIONS = "defaultArnoldRenderOptions"
 
-    return scene_aovs
 
+def get_scene_snapshot():
+    """
+    Read the scene render layers, aovs and layer adjustments in one pass
 
-def get_grouped_aovs():
+    :return: a SceneSnapshot object
     """
-    Get the available mtoa aovs grouped under their catergories setup for mtoa
 
-    :return: a dictionary where keys are aov category and values a list of aovs
+    return scene_snapshot.SceneSnapshot.read()
+
+
+def get_scene_aovs(snapshot=None):
     """
+    Get the aov existing in the maya scene
 
-    aov_groups = sorted(set(aovs.getNodeTypesWithAOVs()))
+    :param snapshot: an optional SceneSnapshot to answer from
+    :return: list of the scene aovs
+    """
 
-    aovs_dict = dict()
+    if snapshot is None:
+        scene_aovs = cmds.ls(type="aiAOV") or []
 
-    for aovGrp in aov_groups:
-        group_list = []
+        return [scene_snapshot.aov_short_name(x) for x in scene_aovs]
 
-        aov_list = [x for x in aovs.getRegisteredAOVs(nodeType=aovGrp) if x]
+    return snapshot.scene_aovs()
 
-        for aov in aov_list:
-            aov_data = {"ui_Name": aov,
-                        "aov_Name": "aiAOV_%s" % aov,
-                        "type": aovGrp}
 
-            group_list.append(aov_data)
+def get_grouped_aovs(force_rebuild=False):
+    """
+    Get the available mtoa aovs grouped under their catergories setup for mtoa.
+    The aovs are served from the aov registry cache
 
-        aovs_dict[aovGrp] = group_list
+    :param force_rebuild: bool used to walk the mtoa registry again
+    :return: a dictionary where keys are aov category and values a list of aovs
+    """
 
-    return aovs_dict
+    return aov_registry.get_registry().grouped_aovs(force_rebuild=force_rebuild)
 
 
-def get_layers_aovs():
+def get_layers_aovs(snapshot=None):
     """
     Get the aovs enabled for each render layer
 
+    :param snapshot: an optional SceneSnapshot to answer from
     :return: a dictionary where keys are render layers and values the
              render layer enabled aovs
     """
 
-    aov_dict = dict()
-    render_layers = [x for x in cmds.ls(type="renderLayer")
-                     if "defaultRenderLayer" not in x]
+    if snapshot is None:
+        snapshot = get_scene_snapshot()
 
-    scn_aovs = cmds.ls(type="aiAOV")
+    return snapshot.layer_aovs()
 
-    for render_layer in render_layers:
-        aov_dict[render_layer] = ["beauty"]
 
-        for aov in scn_aovs:
-            attr = "enabled"
-            layer_overrides = cmds.listConnections("%s.%s" % (aov, attr),
-                                                   plugs=1)
+def create_new_aov(aov_name, data_type="rgb", scene_aovs=None):
+    """
+    Create a new aov
 
-            # Use attribute value if attribute has no overrides on any layer
-            value = cmds.getAttr("%s.%s" % (aov, attr))
+    :param aov_name: the aov name to create as a string
+    :param data_type: the data type for the aov to create as a string
+    :param scene_aovs: an optional set of the existing aiAOV nodes, the scene
+    is queried if None
+    :return: the ai aov name for the created aov as a string
+    """
 
-            if layer_overrides:
-                attribute_plug = False
+    if scene_aovs is None:
+        scene_aovs = set(cmds.ls(type="aiAOV") or [])
 
-                # Use default Render Layer Value if attribute
-                #  is not overriden for a layer
+    ai_aov_name = "aiAOV_%s" % aov_name
 
-                for layerOver in layer_overrides:
-                    if "defaultRenderLayer" == layerOver.split(".")[0]:
-                        attribute_plug = layerOver
+    if ai_aov_name in scene_aovs:
+        print "%s already exists in the scene" % aov_name
+        return False
 
-                # Query attr Layer Override value
-                for layerOver in layer_overrides:
-                    if render_layer == layerOver.split(".")[0]:
-                        attribute_plug = layerOver
+    create_new_aovs([(aov_name, data_type)], scene_aovs=scene_aovs)
 
-                if not attribute_plug:
-                    continue
+    return ai_aov_name
 
-                values = [False, True]
 
-                value = values[int(cmds.getAttr(attribute_plug
-                                                .replace("plug", "value")))]
+def create_new_aovs(aov_types, scene_aovs=None):
+    """
+    Create many disabled aovs in one pass.
+    The aiAOV nodes are wired to the default arnold driver and filter without
+    going through AOVInterface.addAOV for every aov, mtoa refreshes its aov
+    list once at the end. Aovs without a data type, or with a default filter
+    of their own, are still created by mtoa
+
+    :param aov_types: a list of (aov name, data type) tuples, the data type
+    may be None
+    :param scene_aovs: an optional set of the existing aiAOV nodes, the scene
+    is queried if None. It is updated with the created aovs
+    :return: a list of the created aiAOV node names
+    """
 
-            if value is True:
-                aov_dict[render_layer].append(aov.split("aiAOV_")[-1])
+    if scene_aovs is None:
+        scene_aovs = set(cmds.ls(type="aiAOV") or [])
 
-    return aov_dict
+    data_types = dict(getattr(aovs, "TYPES", ()))
+    default_filters = getattr(aovs, "defaultFiltersByName", {})
 
+    created_aovs = []
+    aov_interface = None
 
-def create_new_aov(aov_name, data_type="rgb"):
-    """
-    Create a new aov
+    for aov_name, data_type in aov_types:
+        ai_aov_name = "aiAOV_%s" % aov_name
 
-    :param aov_name: the aov name to create as a string
-    :param data_type: the data type for the aov to create as a string
-    :return: the ai aov name for the created aov as a string
+        if ai_aov_name in scene_aovs:
+            continue
+
+        if data_type in data_types and aov_name not in default_filters:
+            _create_aov_node(aov_name, data_types[data_type])
+        else:
+            if aov_interface is None:
+                aov_interface = aovs.AOVInterface()
+
+            aov_interface.addAOV(aov_name, data_type)
+
+        # Set AOV disabled
+        cmds.setAttr("%s.enabled" % ai_aov_name, 0)
+
+        scene_aovs.add(ai_aov_name)
+        created_aovs.append(ai_aov_name)
+
+    refresh_aliases = getattr(aovs, "refreshAliases", None)
+
+    if created_aovs and refresh_aliases is not None:
+        refresh_aliases()
+
+    return created_aovs
+
+
+def _create_aov_node(aov_name, data_type):
     """
+    Create an aiAOV node like AOVInterface.addAOV does, without refreshing
+    the mtoa aov list
 
-    scene_aovs = [x for x in cmds.ls(type="aiAOV")]
+    :param aov_name: the aov name as a string
+    :param data_type: the arnold data type as an int
+    :return: the aiAOV node name as a string
+    """
 
-    ai_aov_name = "aiAOV_%s" % aov_name
+    ai_aov_name = cmds.createNode("aiAOV",
+                                  name="aiAOV_%s" % aov_name,
+                                  skipSelect=True)
 
-    if ai_aov_name in scene_aovs:
-        print "%s already exists in the scene" % aov_name
-        return False
+    cmds.setAttr("%s.name" % ai_aov_name, aov_name, type="string")
+    cmds.setAttr("%s.type" % ai_aov_name, data_type)
 
-    new_aov = aovs.AOVInterface()
-    new_aov.addAOV(aov_name, data_type)
+    cmds.connectAttr("%s.message" % DEFAULT_DRIVER,
+                     "%s.outputs[0].driver" % ai_aov_name)
+    cmds.connectAttr("%s.message" % DEFAULT_FILTER,
+                     "%s.outputs[0].filter" % ai_aov_name)
 
-    # Set AOV disabled
-    cmds.setAttr("%s.enabled" % ai_aov_name, 0)
+    cmds.connectAttr("%s.message" % ai_aov_name,
+                     "%s.aovList" % RENDER_OPTIONS,
+                     nextAvailable=True)
 
     return ai_aov_name
 
@@ -192,74 +244,251 @@ def add_aov_to_render_layer(ui_name,
     :return:
     """
 
-    # Create AOV if it doesn't exist
-    new_aov = create_new_aov(ui_name, data_type=data_type)
-    aov_shader = "AOV_%s_MAT" % ui_name
+    add_aovs_to_render_layer([{"ui_Name": ui_name,
+                               "aov_Name": node_name,
+                               "type": aov_type,
+                               "data": data_type}],
+                             render_layer)
+
+    return
+
+
+def add_aovs_to_render_layer(aov_list, render_layer, snapshot=None,
+                             procedural=None):
+    """
+    Enable many aovs on a render layer in a single undo chunk.
+    Missing aovs are created in one pass, their shaders brought to the scene
+    together and every layer override written with one batched operation
+
+    :param aov_list: a list of aov data dictionaries with the ui_Name,
+    aov_Name, type and data keys as used by the tree drag and drop
+    :param render_layer: the name of the render layer as a string
+    :param snapshot: an optional SceneSnapshot to diff the overrides against
+    :param procedural: bool used to build the preset shaders from their
+    network description, shader_library.PROCEDURAL_SHADERS if None
+    :return: a list of the created aiAOV node names
+    """
+
+    with undo_chunk("add_aovs_to_render_layer"):
+        created_aovs = create_aovs(aov_list, procedural=procedural)
+
+        # Set AOV layer overrides
+        if render_layer != "masterLayer":
+            overrides = [("%s.enabled" % x["aov_Name"], {render_layer: True})
+                         for x in aov_list]
+
+            set_layers_overrides(overrides, snapshot=snapshot)
+
+    return created_aovs
+
+
+def create_aovs(aov_list, scene_aovs=None, procedural=None):
+    """
+    Create the missing aovs of an aov list and bring their shaders to the
+    scene, the preset shaders are brought together
+
+    :param aov_list: a list of aov data dictionaries with the ui_Name, type
+    and data keys
+    :param scene_aovs: an optional set of the existing aiAOV nodes, the scene
+    is queried if None. It is updated with the created aovs
+    :param procedural: bool used to build the preset shaders from their
+    network description, shader_library.PROCEDURAL_SHADERS if None
+    :return: a list of the created aiAOV node names
+    """
+
+    if scene_aovs is None:
+        scene_aovs = set(cmds.ls(type="aiAOV") or [])
+
+    aov_types = []
+    new_aovs = dict()
+
+    for aov_data in aov_list:
+        ui_name = aov_data["ui_Name"]
+        aov_type = aov_data.get("type", None)
+        data_type = aov_data.get("data", None)
+
+        if "aiAOV_%s" % ui_name in scene_aovs or ui_name in new_aovs:
+            continue
+
+        if data_type is None and aov_type in SHADER_AOV_TYPES:
+            data_type = "rgb"
+
+        aov_types.append((ui_name, data_type))
+        new_aovs[ui_name] = aov_type
+
+    created_aovs = create_new_aovs(aov_types, scene_aovs=scene_aovs)
+
+    preset_aovs = []
+
+    for ui_name, _ in aov_types:
+        aov_type = new_aovs[ui_name]
 
-    if new_aov and aov_type != "<builtin>":
         # Bring shader to the scene
         if aov_type == "<attrId>":
             create_connect_aov_shader(ui_name, attribute_id=True)
 
         elif aov_type != "<builtin>":
-            if not cmds.objExists(aov_shader):
-                import_aov_preset_shader(ui_name)
+            preset_aovs.append(ui_name)
 
-            # Add Default shader to Aov
-            if cmds.objExists(aov_shader):
-                cmds.connectAttr("%s.outColor" % aov_shader,
-                                 "aiAOV_%s.defaultValue" % ui_name,
-                                 force=True)
+    if preset_aovs:
+        connect_aov_preset_shaders(preset_aovs, procedural=procedural)
 
-    # Set AOV layer overrides
-    if render_layer != "masterLayer":
-        set_layer_overrides("%s.enabled" % node_name, {render_layer: True})
+    return created_aovs
+
+
+def connect_aov_preset_shaders(aov_names, procedural=None):
+    """
+    Connect the preset shaders of many aovs as their default value,
+    bringing the shaders missing in the scene from the shader library
+
+    :param aov_names: a list of aov names as strings
+    :param procedural: bool used to build the missing shaders from their
+    network description instead of importing the preset files,
+    shader_library.PROCEDURAL_SHADERS if None
+    :return:
+    """
+
+    aov_shaders = [shader_library.shader_name(x) for x in aov_names]
+
+    shader_library.get_library().import_presets(aov_names,
+                                                procedural=procedural)
+
+    existing_shaders = set(cmds.ls(aov_shaders) or [])
+
+    # Add Default shader to Aov
+    for aov_name, aov_shader in zip(aov_names, aov_shaders):
+        if aov_shader in existing_shaders:
+            cmds.connectAttr("%s.outColor" % aov_shader,
+                             "aiAOV_%s.defaultValue" % aov_name,
+                             force=True)
 
     return
 
 
-def get_master_layer_value(aov_name):
+def get_master_layer_value(aov_name, snapshot=None):
     """
     Get the aov enabled state of an aov on the master render layer
 
     :param aov_name: the aov name as a string
+    :param snapshot: an optional SceneSnapshot to answer from
     :return: the enabled value as a bool
     """
 
-    current_layer = cmds.editRenderLayerGlobals(currentRenderLayer=True,
-                                                query=True)
+    return get_master_layer_values([aov_name], snapshot=snapshot)[aov_name]
 
-    # If we are in the master layer return the current value
-    if current_layer == "defaultRenderLayer":
-        return cmds.getAttr("%s.enabled" % aov_name)
 
-    # If we are not in the master layer check if the layer has an override
-    layer_overrides = cmds.listConnections('%s.enabled' % aov_name) or []
+def get_master_layer_values(aov_names, snapshot=None):
+    """
+    Get the aov enabled state of many aovs on the master render layer.
+    The values are read from the default render layer adjustments without
+    switching layers or editing any override
+
+    :param aov_names: a list of aov names as strings
+    :param snapshot: an optional SceneSnapshot to answer from
+    :return: a dictionary where keys are the aov names and values the
+    enabled value as a bool
+    """
 
-    # If there is not an override for this layer return the curr value
-    if current_layer not in layer_overrides:
-        return cmds.getAttr("%s.enabled" % aov_name)
+    node_attributes = ["%s.enabled" % x for x in aov_names]
 
-    # If the layer has  an override
-    # Query the override value
-    layer_value = cmds.getAttr("%s.enabled" % aov_name)
+    if snapshot is None:
+        snapshot = scene_snapshot.SceneSnapshot.read_attributes(node_attributes)
 
-    # Remove the override
-    cmds.editRenderLayerAdjustment("%s.enabled" % aov_name,
-                                   layer=current_layer,
-                                   remove=True)
+    return dict((aov_name, bool(snapshot.master_value(node_attribute)))
+                for aov_name, node_attribute in zip(aov_names, node_attributes))
 
-    # Get the master value
-    master_value = cmds.getAttr("%s.enabled" % aov_name)
 
-    # Reinstate the override
-    cmds.editRenderLayerAdjustment("%s.enabled" % aov_name,
-                                   layer=current_layer)
+def set_master_layer_values(values, snapshot):
+    """
+    Set the master layer value of many node attributes without switching
+    layers.
+    Attributes overridden on the current layer get the value written to
+    their default render layer adjustment, the others to the attribute itself
+
+    :param values: a dictionary where keys are node attributes and values
+    the master layer values
+    :param snapshot: the SceneSnapshot to keep up to date
+    :return:
+    """
+
+    current_layer = snapshot.current_layer
+
+    for node_attribute, value in values.items():
+        layer_overrides = snapshot.overrides.get(node_attribute, {})
+
+        if current_layer == scene_snapshot.DEFAULT_LAYER or \
+                current_layer not in layer_overrides:
+            cmds.setAttr(node_attribute, value)
+            snapshot.set_value(node_attribute, value)
+            continue
 
-    # Set the override value
-    cmds.setAttr("%s.enabled" % aov_name, layer_value)
+        adjustment_plug = _get_adjustment_plug(node_attribute,
+                                               scene_snapshot.DEFAULT_LAYER,
+                                               snapshot)
 
-    return master_value
+        cmds.setAttr(scene_snapshot.value_plug(adjustment_plug), value)
+        layer_overrides[scene_snapshot.DEFAULT_LAYER] = value
+
+    return
+
+
+def disable_aovs_for_all_layers(aov_names, snapshot=None):
+    """
+    Disable aovs on every render layer and on the master layer.
+    Only the existing layer adjustments are removed, with one command per
+    render layer, and the aovs are set disabled
+
+    :param aov_names: a list of aiAOV node names
+    :param snapshot: an optional SceneSnapshot holding the aov adjustments,
+    it is kept up to date with the applied changes. Without it the render
+    layer adjustments are listed without reading their values
+    :return: a dictionary where keys are render layers and values the list
+    of removed node attribute adjustments
+    """
+
+    node_attributes = ["%s.enabled" % x for x in aov_names]
+
+    if snapshot is None:
+        adjusted_layers = scene_snapshot.read_adjusted_layers(node_attributes)
+
+        # Every aov is set as the master values are unknown
+        master_values = dict((x, True) for x in node_attributes)
+    else:
+        adjusted_layers = dict((x, list(snapshot.overrides.get(x, {})))
+                               for x in node_attributes)
+
+        master_values = dict((x, snapshot.master_value(x))
+                             for x in node_attributes)
+
+    removals = dict()
+
+    for node_attribute in node_attributes:
+        for render_layer in adjusted_layers.get(node_attribute, []):
+            # Default render layers hold the master value, referenced scenes
+            # bring their own
+            if "defaultRenderLayer" in render_layer:
+                continue
+
+            removals.setdefault(render_layer, []).append(node_attribute)
+
+    with undo_chunk("disable_aovs_for_all_layers"):
+        for render_layer in sorted(removals):
+            cmds.editRenderLayerAdjustment(*removals[render_layer],
+                                           layer=render_layer,
+                                           remove=True)
+
+        for node_attribute in node_attributes:
+            if master_values[node_attribute]:
+                cmds.setAttr(node_attribute, False)
+
+    if snapshot is not None:
+        for node_attribute in node_attributes:
+            # Maya drops the master value adjustment with the last override
+            snapshot.overrides.pop(node_attribute, None)
+            snapshot.adjustment_plugs.pop(node_attribute, None)
+            snapshot.values[node_attribute] = False
+
+    return removals
 
 
 def get_render_layer_accepted_objects():
@@ -286,35 +515,34 @@ def get_object_primary_visibility(node):
     :return: a bool for the node primary visibility value
     """
 
-    override = "primaryVisibility"
+    return get_objects_primary_visibility([node])[node]
 
-    if cmds.nodeType(node) == "mesh":
-        shape_node = node
-    else:
-        shape_node = get_object_shape_node(node)
 
-    if shape_node is False:
-        return False
+def get_objects_primary_visibility(nodes):
+    """
+    Get the primary visibility of many nodes with bulk queries
 
-    if not cmds.attributeQuery(override, node=shape_node, exists=True):
-        return False
+    :param nodes: a list of transform or shape node names
+    :return: a dictionary where keys are the nodes and values a bool for the
+    node primary visibility value
+    """
 
-    if cmds.getAttr("%s.%s" % (shape_node, override)) is False:
-        return False
+    evaluator = visibility.get_evaluator()
 
-    object_sets = cmds.listSets(object=node) or False
+    return evaluator.evaluate(nodes, get_render_layer_accepted_objects())
 
-    if not object_sets:
-        return True
 
-    for object_set in object_sets:
-        if not cmds.attributeQuery(override, node=object_set, exists=True):
-            continue
+def get_render_layer_primary_visibility(render_layer):
+    """
+    Get the primary visibility of every object of a render layer
 
-        if cmds.getAttr("%s.%s" % (object_set, override)) is False:
-            return False
+    :param render_layer: the name a render layer as a string
+    :return: a dictionary where keys are the render layer transform nodes
+    and values a bool for their primary visibility value
+    """
 
-    return True
+    return get_objects_primary_visibility(
+        get_render_layer_objects(render_layer) or [])
 
 
 def get_object_shape_node(node):
@@ -343,38 +571,17 @@ def get_render_layer_objects(render_layer):
     Get the transform nodes added to a render layer
 
     :param render_layer: the name a render layer as a string
-    :return: a list of the render layers transform nodes
+    :return: a list of the render layers transform nodes, False if the layer
+    has no members
     """
 
-    layer_objects = list(set(cmds.editRenderLayerMembers(render_layer,
-                                                         q=True,
-                                                         fullNames=True)
-                         or [])) or None
-
-    if layer_objects is None:
-        return False
-
-    layer_transform_nodes = []
+    layer_transform_nodes = layer_members.get_resolver().layer_objects(
+        render_layer)
 
-    for node in layer_objects:
-        if cmds.nodeType(node) != "transform":
-            transform_node = cmds.listRelatives(node,
-                                                parent=True,
-                                                fullPath=True)
+    return layer_transform_nodes or False
 
-            transform_is_valid = (transform_node[0]
-                                  not in layer_transform_nodes)
 
-            if transform_node and transform_is_valid:
-                layer_transform_nodes.append(transform_node[0])
-        else:
-            if node not in layer_transform_nodes:
-                layer_transform_nodes.append(node)
-
-    return layer_transform_nodes
-
-
-def set_layer_overrides(node_attribute, override_data):
+def set_layer_overrides(node_attribute, override_data, snapshot=None):
     """
     Set layer values overrides for a node attribute from the given per layer
     override data
@@ -382,84 +589,210 @@ def set_layer_overrides(node_attribute, override_data):
     :param node_attribute: a node's attribute name as a string
     :param override_data: dictionary data where keys are render layer
     and values the layer's override value
+    :param snapshot: an optional SceneSnapshot to diff against
     :return:
     """
 
-    current_layer = cmds.editRenderLayerGlobals(query=True, crl=True)
+    set_layers_overrides([(node_attribute, override_data)], snapshot=snapshot)
 
-    # Query the existing layerOverride Values
-    layer_values = gather_attribute_override_data(node_attribute) or {}
+    return
 
-    # Remove all layer overrides
-    for render_layer in layer_values.keys():
-        cmds.editRenderLayerAdjustment(node_attribute,
-                                       layer=render_layer,
-                                       remove=True)
 
-    # Merge user layer Override and pre-existing override values
-    for render_layer, value in override_data.iteritems():
-        layer_values[render_layer] = value
+def set_layers_overrides(overrides, snapshot=None):
+    """
+    Set layer values overrides for many node attributes at once.
+    Only the adjustments which differ from the current scene state are
+    added, changed or removed, all within a single undo chunk
+
+    :param overrides: a list of (node_attribute, override_data) pairs or a
+    dictionary where override_data is a dictionary with render layers as keys
+    and the layer's override value as values
+    :param snapshot: an optional SceneSnapshot to diff against, it is kept
+    up to date with the applied changes
+    :return:
+    """
 
-    # Query the master layer value
-    master_value = cmds.getAttr(node_attribute)
+    if isinstance(overrides, dict):
+        overrides = overrides.items()
 
-    render_layers = [x for x in cmds.ls(type='renderLayer')
-                     if x != 'defaultRenderLayer']
+    if snapshot is None:
+        snapshot = scene_snapshot.SceneSnapshot.read_attributes(
+            [x[0] for x in overrides])
 
-    # Set override value per layer
-    for render_layer in render_layers:
-        if render_layer == current_layer:
-            continue
+    additions, changes, removals = get_override_changes(overrides, snapshot)
+
+    if not additions and not changes and not removals:
+        return
+
+    with undo_chunk("set_layers_overrides"):
+        for render_layer, node_attributes in removals.items():
+            cmds.editRenderLayerAdjustment(*node_attributes,
+                                           layer=render_layer,
+                                           remove=True)
 
-        value = layer_values.get(render_layer, False)
+            for node_attribute in node_attributes:
+                snapshot.remove_override(node_attribute, render_layer)
 
-        cmds.setAttr(node_attribute, value)
-        cmds.editRenderLayerAdjustment(node_attribute,
-                                       layer=render_layer)
+        for node_attribute, render_layer, value in changes:
+            if render_layer == snapshot.current_layer:
+                cmds.setAttr(node_attribute, value)
+            else:
+                adjustment_plug = _get_adjustment_plug(node_attribute,
+                                                       render_layer,
+                                                       snapshot)
 
-    cmds.setAttr(node_attribute, master_value)
+                cmds.setAttr(scene_snapshot.value_plug(adjustment_plug), value)
 
-    current_layer_valid = current_layer in layer_values.keys()
+            snapshot.set_override(node_attribute, render_layer, value)
 
-    if "defaultRenderLayer" not in current_layer and current_layer_valid:
-        cmds.editRenderLayerAdjustment(node_attribute, layer=current_layer)
-        cmds.setAttr(node_attribute, layer_values[current_layer])
+        _add_layer_adjustments(additions, snapshot)
 
     return
 
 
-def gather_attribute_override_data(node_attribute):
+def get_override_changes(overrides, snapshot):
+    """
+    Compute the minimal set of layer adjustment edits needed to reach the
+    given override values
+
+    :param overrides: a list of (node_attribute, override_data) pairs
+    :param snapshot: the SceneSnapshot to diff against
+    :return: a tuple with the adjustments to add as a dictionary
+    {value: {render_layer: [node_attributes]}}, the values to change as a
+    list of (node_attribute, render_layer, value) and the adjustments to
+    remove as a dictionary {render_layer: [node_attributes]}
     """
 
-    :param node_attribute: attribute name as a string
-    :return: dictionary where keys are render layers and value is the attribute
-    override state for the render layer
+    additions = dict()
+    changes = []
+    removals = dict()
+
+    for node_attribute, override_data in overrides:
+        layer_overrides = snapshot.overrides.get(node_attribute, {})
+        master_value = snapshot.master_value(node_attribute)
+
+        for render_layer, value in override_data.items():
+            if render_layer not in snapshot.render_layers:
+                continue
+
+            if render_layer not in layer_overrides:
+                if value != master_value:
+                    additions.setdefault(value, dict()).setdefault(
+                        render_layer, []).append(node_attribute)
+                continue
+
+            if layer_overrides[render_layer] == value:
+                continue
+
+            # The layer matches the master layer so the override is not needed
+            if value == master_value:
+                removals.setdefault(render_layer, []).append(node_attribute)
+            else:
+                changes.append((node_attribute, render_layer, value))
+
+    return additions, changes, removals
+
+
+def _add_layer_adjustments(additions, snapshot):
+    """
+    Create new layer adjustments holding the given values.
+    Adjustments capture the live attribute value when created, so for the
+    non current layers the live values are set once per attribute, the
+    adjustments created with one command per layer and the live values
+    restored.
+
+    :param additions: dictionary {value: {render_layer: [node_attributes]}}
+    :param snapshot: the SceneSnapshot to keep up to date
+    :return:
     """
 
-    override_data = dict()
+    current_layer = snapshot.current_layer
 
-    layer_overrides = cmds.listConnections(node_attribute,
-                                           plugs=1,
-                                           type="renderLayer")
+    for value, layer_attributes in additions.items():
+        other_layers = [x for x in layer_attributes if x != current_layer]
 
-    if layer_overrides is None:
-        return False
+        node_attributes = set()
 
-    render_layers = [x for x in cmds.ls(type='renderLayer')
-                     if x != 'defaultRenderLayer']
+        for render_layer in other_layers:
+            node_attributes.update(layer_attributes[render_layer])
 
-    for layerOver in layer_overrides:
-        render_layer = layerOver.split(".")[0]
+        live_values = dict((x, snapshot.value(x)) for x in node_attributes)
 
-        if render_layer not in render_layers:
-            continue
+        for node_attribute in node_attributes:
+            if live_values[node_attribute] != value:
+                cmds.setAttr(node_attribute, value)
+
+        for render_layer in other_layers:
+            attributes = layer_attributes[render_layer]
+            cmds.editRenderLayerAdjustment(*attributes, layer=render_layer)
+
+            for node_attribute in attributes:
+                snapshot.set_override(node_attribute, render_layer, value)
+
+        for node_attribute in node_attributes:
+            if live_values[node_attribute] != value:
+                cmds.setAttr(node_attribute, live_values[node_attribute])
+
+        # The current layer adjustment is created first so it holds the
+        # master value and then set to the override value
+        current_attributes = layer_attributes.get(current_layer, [])
+
+        if current_attributes:
+            cmds.editRenderLayerAdjustment(*current_attributes,
+                                           layer=current_layer)
+
+        for node_attribute in current_attributes:
+            cmds.setAttr(node_attribute, value)
+            snapshot.set_override(node_attribute, current_layer, value)
 
-        attribute_plug = layerOver
-        value = (cmds.getAttr(attribute_plug.replace("plug", "value")))
+    return
+
+
+def _get_adjustment_plug(node_attribute, render_layer, snapshot):
+    """
+    Get the adjustment plug of a node attribute on a render layer
+
+    :param node_attribute: the node attribute as a string
+    :param render_layer: the render layer name as a string
+    :param snapshot: the SceneSnapshot holding the known adjustment plugs
+    :return: the adjustments[i].plug name as a string or None
+    """
+
+    layer_plugs = snapshot.adjustment_plugs.get(node_attribute, {})
+    adjustment_plug = layer_plugs.get(render_layer, None)
+
+    if adjustment_plug is not None:
+        return adjustment_plug
+
+    # Adjustments created after the snapshot was read
+    connections = cmds.listConnections("%s.adjustments" % render_layer,
+                                       source=True,
+                                       destination=False,
+                                       plugs=True,
+                                       connections=True) or []
+
+    for layer_plug, layer_attribute in zip(connections[::2],
+                                           connections[1::2]):
+        if layer_attribute == node_attribute:
+            layer_plugs[render_layer] = layer_plug
+
+    return layer_plugs.get(render_layer, None)
+
+
+def gather_attribute_override_data(node_attribute, snapshot=None):
+    """
+
+    :param node_attribute: attribute name as a string
+    :param snapshot: an optional SceneSnapshot to answer from
+    :return: dictionary where keys are render layers and value is the attribute
+    override state for the render layer
+    """
 
-        override_data[render_layer] = value
+    if snapshot is None:
+        snapshot = scene_snapshot.SceneSnapshot.read_attributes(
+            [node_attribute])
 
-    return override_data
+    return snapshot.override_data(node_attribute)
 
 
 def import_aov_preset_shader(aov_name):
@@ -470,24 +803,83 @@ def import_aov_preset_shader(aov_name):
     :return: the imported nodes
     """
 
-    import_folder = os.path.dirname(os.path.abspath(__file__))
-    import_file = os.path.join(import_folder,
-                               "shaders", "AOV_%s.mb" % aov_name)
+    library = shader_library.get_library()
 
-    if not os.path.exists(import_file):
+    if library.preset(aov_name) is None:
         return False
 
-    import_nodes = cmds.file(import_file,
-                             force=True,
-                             options="v=0",
-                             typ="mayaBinary",
-                             pr=True,
-                             i=True,
-                             gr=True,
-                             dns=True,
-                             rnn=True)
-
-    return import_nodes
+    return library.import_preset(aov_name)
+
+
+@contextlib.contextmanager
+def undo_chunk(chunk_name):
+    """
+    Context manager grouping the maya commands issued inside it in a single
+    undo chunk
+
+    :param chunk_name: the undo chunk name as a string
+    :return:
+    """
+
+    with transaction(chunk_name, suspend_refresh=False, rollback=False):
+        yield
+
+
+@contextlib.contextmanager
+def transaction(name, suspend_refresh=True, rollback=True):
+    """
+    Context manager running the maya commands issued inside it as a single
+    action: one undo chunk, no viewport refresh while it runs and the
+    changes undone if an exception is raised.
+    Transactions opened inside another one are part of the outer one
+
+    :param name: the undo chunk name as a string
+    :param suspend_refresh: bool used to suspend the viewport refresh, it is
+    never suspended in batch mode
+    :param rollback: bool used to undo the chunk if an exception is raised
+    :return:
+    """
+
+    global _transaction_depth
+
+    if _transaction_depth:
+        _transaction_depth += 1
+
+        try:
+            yield
+        finally:
+            _transaction_depth -= 1
+
+        return
+
+    suspend_refresh = suspend_refresh and not cmds.about(batch=True)
+
+    # Rolling back needs the undo queue, which can be turned off
+    rollback = rollback and cmds.undoInfo(query=True, state=True)
+
+    if suspend_refresh:
+        cmds.refresh(suspend=True)
+
+    cmds.undoInfo(openChunk=True, chunkName=name)
+    _transaction_depth = 1
+
+    try:
+        yield
+    except BaseException:
+        _transaction_depth = 0
+        cmds.undoInfo(closeChunk=True)
+
+        # Only undo the chunk if it recorded any command
+        if rollback and cmds.undoInfo(query=True, undoName=True) == name:
+            cmds.undo()
+
+        raise
+    else:
+        _transaction_depth = 0
+        cmds.undoInfo(closeChunk=True)
+    finally:
+        if suspend_refresh:
+            cmds.refresh(suspend=False)
 
 
 def create_arnold_options():
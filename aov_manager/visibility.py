@@ -0,0 +1,373 @@
+import maya.cmds as cmds
+
+import scene_backend
+import scene_events
+
+
+# Attribute hiding objects from the camera rays, on shapes and override sets
+PRIMARY_VISIBILITY = "primaryVisibility"
+
+# Set attributes changing the value or the members of an override set
+SET_ATTRIBUTES = [PRIMARY_VISIBILITY, "dagSetMembers", "dnSetMembers"]
+
+_evaluator = None
+
+
+class PrimaryVisibilityEvaluator(object):
+    """
+    Class evaluating the primary visibility of many objects at once.
+    Shapes are found with a single query and every override set is read once,
+    the set values and members are cached while the set callbacks are
+    watched, a set edit only drops that set
+    """
+    def __init__(self):
+        """
+        Initialise an evaluator with no set read
+        """
+
+        # Names of the scene object sets, None until listed
+        self._object_sets = None
+
+        # override set -> primaryVisibility value
+        self._set_values = dict()
+
+        # hiding override set -> set of member full paths
+        self._set_members = dict()
+
+        self._registry = None
+        self._callback_ids = []
+        self._set_callback_ids = dict()
+
+    def evaluate(self, nodes, shape_types):
+        """
+        Get the primary visibility of many nodes.
+        A node is visible when its first shape of an accepted type has
+        primaryVisibility on and no override set holding the node turns it
+        off
+
+        :param nodes: a list of transform or shape node names
+        :param shape_types: a list of the accepted shape node types
+        :return: a dictionary where keys are the given nodes and values
+        the primary visibility as a bool
+        """
+
+        visible_shapes = self.visible_shapes(nodes, shape_types)
+
+        return dict((x, x in visible_shapes) for x in nodes)
+
+    def visible_shapes(self, nodes, shape_types):
+        """
+        Get the shapes of the visible nodes
+
+        :param nodes: a list of transform or shape node names
+        :param shape_types: a list of the accepted shape node types
+        :return: a dictionary where keys are the visible nodes and values the
+        full path of their shape
+        """
+
+        visible_shapes = dict()
+
+        if not nodes:
+            return visible_shapes
+
+        node_shapes = get_node_shapes(nodes, shape_types)
+
+        if not node_shapes:
+            return visible_shapes
+
+        # Shapes without the attribute aren't rendered by arnold
+        shape_plugs = cmds.ls(["%s.%s" % (x, PRIMARY_VISIBILITY)
+                               for x in set(node_shapes.values())]) or []
+
+        values = scene_backend.get_backend().get_values(shape_plugs)
+
+        hidden_members = self.hidden_members()
+
+        for node, shape in node_shapes.items():
+            shape_plug = "%s.%s" % (shape, PRIMARY_VISIBILITY)
+
+            if not values.get(shape_plug, False):
+                continue
+
+            # Sets hold the given node itself, like listSets -object
+            if shape_long_name(node, shape) in hidden_members:
+                continue
+
+            visible_shapes[node] = shape
+
+        return visible_shapes
+
+    def hidden_members(self):
+        """
+        Get the nodes of the override sets turning primaryVisibility off.
+        The values of the sets not read yet are read together, the members
+        of a hiding set are only read the first time it is seen
+
+        :return: a set of node full paths
+        """
+
+        object_sets = self.object_sets()
+
+        read_values = self.read_set_values(
+            [x for x in object_sets if x not in self._set_values])
+
+        if self.is_watching():
+            self._set_values.update(read_values)
+
+        hidden_members = set()
+
+        for object_set in object_sets:
+            if self._set_values.get(object_set,
+                                    read_values.get(object_set, True)):
+                continue
+
+            members = self._set_members.get(object_set, None)
+
+            if members is None:
+                members = set(cmds.ls(cmds.sets(object_set, q=True) or [],
+                                      long=True) or [])
+
+                if self.is_watching():
+                    self._set_members[object_set] = members
+
+            hidden_members.update(members)
+
+        return hidden_members
+
+    def object_sets(self):
+        """
+        Get the scene object sets, listed again only when sets were added
+        or removed
+
+        :return: a list of set names
+        """
+
+        object_sets = self._object_sets
+
+        if object_sets is None:
+            object_sets = cmds.ls(type="objectSet") or []
+
+            if self.is_watching():
+                self._object_sets = object_sets
+
+        return object_sets
+
+    def invalidate(self, object_set=None):
+        """
+        Drop the values and members read from an override set
+
+        :param object_set: the name of the set, every set and the set list
+        are dropped if None
+        :return:
+        """
+
+        if object_set is None:
+            self._object_sets = None
+            self._set_values = dict()
+            self._set_members = dict()
+        else:
+            self._set_values.pop(object_set, None)
+            self._set_members.pop(object_set, None)
+
+        return
+
+    def watch(self, registry=None, object_sets=None):
+        """
+        Invalidate the cached sets when their value or members change and
+        the set list when sets are added or removed
+
+        :param registry: the callback registry, MayaCallbackRegistry if None
+        :param object_sets: the object sets of the scene, read from maya if
+        None
+        :return:
+        """
+
+        if self.is_watching():
+            return
+
+        self._registry = registry or scene_events.MayaCallbackRegistry()
+
+        if object_sets is None:
+            object_sets = cmds.ls(type="objectSet") or []
+
+        self._callback_ids = [
+            self._registry.add_node_added_callback(self._set_added,
+                                                   "objectSet"),
+            self._registry.add_node_removed_callback(self._set_removed,
+                                                     "objectSet")]
+
+        for object_set in object_sets:
+            self._watch_set(object_set)
+
+        self.invalidate()
+
+        return
+
+    def unwatch(self):
+        """
+        Remove the set callbacks and drop the cached sets
+
+        :return:
+        """
+
+        callback_ids = self._callback_ids + self._set_callback_ids.values()
+
+        for callback_id in callback_ids:
+            self._registry.remove_callback(callback_id)
+
+        self._registry = None
+        self._callback_ids = []
+        self._set_callback_ids = dict()
+
+        self.invalidate()
+
+        return
+
+    def is_watching(self):
+        """
+        Check if the set callbacks are registered
+
+        :return: a bool
+        """
+
+        return bool(self._callback_ids)
+
+    def read_set_values(self, object_sets):
+        """
+        Read the primaryVisibility of override sets with one backend query,
+        sets without the attribute never hide their members
+
+        :param object_sets: a list of set names
+        :return: a dictionary where keys are the sets and values the
+        primaryVisibility as a bool
+        """
+
+        if not object_sets:
+            return dict()
+
+        set_plugs = cmds.ls(["%s.%s" % (x, PRIMARY_VISIBILITY)
+                             for x in object_sets]) or []
+
+        values = scene_backend.get_backend().get_values(set_plugs)
+
+        return dict((x, bool(values.get("%s.%s" % (x, PRIMARY_VISIBILITY),
+                                        True)))
+                    for x in object_sets)
+
+    def _watch_set(self, object_set):
+        """
+        Register the attribute callback dropping a set from the cache
+
+        :param object_set: the set name as a string
+        :return:
+        """
+
+        if object_set in self._set_callback_ids:
+            return
+
+        def attribute_changed(node_name, attribute):
+            if attribute.split("[")[0] in SET_ATTRIBUTES:
+                self.invalidate(node_name)
+
+        self._set_callback_ids[object_set] = \
+            self._registry.add_attribute_changed_callback(object_set,
+                                                          attribute_changed)
+
+    def _set_added(self, object_set):
+        """
+        Watch a new set and list the scene sets again
+
+        :param object_set: the set name as a string
+        :return:
+        """
+
+        self._watch_set(object_set)
+        self._object_sets = None
+
+    def _set_removed(self, object_set):
+        """
+        Forget a deleted set and list the scene sets again
+
+        :param object_set: the set name as a string
+        :return:
+        """
+
+        callback_id = self._set_callback_ids.pop(object_set, None)
+
+        if callback_id is not None:
+            self._registry.remove_callback(callback_id)
+
+        self.invalidate(object_set)
+        self._object_sets = None
+
+
+def get_evaluator():
+    """
+    Get the shared primary visibility evaluator
+
+    :return: a PrimaryVisibilityEvaluator object
+    """
+
+    global _evaluator
+
+    if _evaluator is None:
+        _evaluator = PrimaryVisibilityEvaluator()
+
+    return _evaluator
+
+
+def get_node_shapes(nodes, shape_types):
+    """
+    Get the first shape of an accepted type under many nodes with one query.
+    A node of an accepted type is its own shape
+
+    :param nodes: a list of transform or shape node names
+    :param shape_types: a list of the accepted shape node types
+    :return: a dictionary where keys are the given nodes and values the full
+    path of their shape, nodes without shape are left out
+    """
+
+    shapes = cmds.ls(nodes, dag=True, long=True, type=shape_types) or []
+
+    # Nodes can be given by full path, partial path or short name
+    wanted_nodes = set(nodes)
+
+    node_shapes = dict()
+
+    for shape in shapes:
+        for ancestor in _ancestor_paths(shape):
+            for name in _path_names(ancestor):
+                if name in wanted_nodes and name not in node_shapes:
+                    node_shapes[name] = shape
+
+    return node_shapes
+
+
+def shape_long_name(node, shape):
+    """
+    Get the full path of a node from the full path of one of its shapes
+
+    :param node: the node name, full path, partial path or short name
+    :param shape: the full path of the node shape
+    :return: the full path of the node as a string
+    """
+
+    for ancestor in _ancestor_paths(shape):
+        if node in _path_names(ancestor):
+            return ancestor
+
+    return node
+
+
+def _ancestor_paths(path):
+    # The path itself first, then its parents up to the world
+    while path:
+        yield path
+        path = path.rpartition("|")[0]
+
+
+def _path_names(path):
+    # The full path and every partial path down to the short name
+    components = path.split("|")[1:]
+
+    return [path] + ["|".join(components[x:]) for x in range(len(components))]
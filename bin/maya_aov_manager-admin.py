@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+"""
+Headless aov manager administration, run with mayapy
+
+Apply an aov assignment or layout to many scenes:
+    mayapy maya_aov_manager-admin.py apply assignment.json shot_*.mb
+        --workers 8 --results results.jsonl --resume
+
+Export the aov layout of a scene:
+    mayapy maya_aov_manager-admin.py export shot_010.mb layout.json
+
+Audit the aovs of a scene and clean it up:
+    mayapy maya_aov_manager-admin.py audit shot_010.mb --fix
+"""
+import argparse
+import json
+import sys
+
+from aov_manager import batch
+
+
+def apply_command(args):
+    """
+    Apply an aov assignment to the given scenes
+
+    :param args: the parsed command line arguments
+    :return: the exit code as an int
+    """
+
+    assignment = batch.load_assignment(args.assignment)
+
+    results = batch.run_batch(args.scenes,
+                              assignment,
+                              args.results,
+                              workers=args.workers,
+                              resume=args.resume,
+                              save=not args.no_save,
+                              delete_aovs=args.delete_aovs,
+                              procedural=args.procedural_shaders or None,
+                              timeout=args.timeout or None,
+                              scenes_per_worker=args.scenes_per_worker)
+
+    failed = [x for x in results if x["status"] == "error"]
+    warned = [x for x in results if x["status"] == "warning"]
+
+    sys.stderr.write("%s scenes processed, %s failed, %s with warnings\n" %
+                     (len(results), len(failed), len(warned)))
+
+    return 1 if failed or warned else 0
+
+
+def export_command(args):
+    """
+    Export the aov layout of a scene
+
+    :param args: the parsed command line arguments
+    :return: the exit code as an int
+    """
+
+    batch.initialize_maya()
+    batch.export_scene_layout(args.scene, args.layout)
+
+    return 0
+
+
+def audit_command(args):
+    """
+    Audit the aovs of a scene and print the problems found
+
+    :param args: the parsed command line arguments
+    :return: the exit code as an int
+    """
+
+    batch.initialize_maya()
+    report = batch.audit_scene_file(args.scene, fix=args.fix)
+
+    sys.stdout.write(report.report() + "\n")
+
+    if args.report is not None:
+        with open(args.report, "w") as f:
+            json.dump(report.to_dict(), f, indent=4)
+
+    return 1 if report and not args.fix else 0
+
+
+def main(argv=None):
+    """
+    Main entry point for the aov manager administration
+
+    :param argv: the command line arguments, sys.argv if None
+    :return: the exit code as an int
+    """
+
+    parser = argparse.ArgumentParser(description="Arnold AOV manager admin")
+    subparsers = parser.add_subparsers()
+
+    apply_parser = subparsers.add_parser(
+        "apply", help="apply an aov assignment or layout to many scenes")
+    apply_parser.add_argument("assignment",
+                              help="json file with the aovs of every layer")
+    apply_parser.add_argument("scenes", nargs="+", help="scene files")
+    apply_parser.add_argument("--workers", type=int, default=1,
+                              help="number of worker processes")
+    apply_parser.add_argument("--results", default="aov_manager_results.jsonl",
+                              help="json lines file the results are written to")
+    apply_parser.add_argument("--resume", action="store_true",
+                              help="skip the scenes already done in the "
+                                   "results file")
+    apply_parser.add_argument("--no-save", action="store_true",
+                              help="don't save the scenes")
+    apply_parser.add_argument("--timeout", type=float,
+                              default=batch.SCENE_TIMEOUT,
+                              help="seconds a worker process is given for a "
+                                   "scene, 0 to wait forever")
+    apply_parser.add_argument("--scenes-per-worker", type=int,
+                              help="replace the worker processes after this "
+                                   "number of scenes")
+    apply_parser.add_argument("--delete-aovs", action="store_true",
+                              help="delete the scene aovs missing in an aov "
+                                   "layout")
+    apply_parser.add_argument("--procedural-shaders", action="store_true",
+                              help="build the preset shaders from their "
+                                   "network description instead of "
+                                   "importing the preset files")
+    apply_parser.set_defaults(command=apply_command)
+
+    export_parser = subparsers.add_parser(
+        "export", help="export the aov layout of a scene")
+    export_parser.add_argument("scene", help="scene file")
+    export_parser.add_argument("layout", help="json layout file to write")
+    export_parser.set_defaults(command=export_command)
+
+    audit_parser = subparsers.add_parser(
+        "audit", help="find the unused aovs, shader networks and layer "
+                      "adjustments of a scene")
+    audit_parser.add_argument("scene", help="scene file")
+    audit_parser.add_argument("--fix", action="store_true",
+                              help="clean up the scene and save it")
+    audit_parser.add_argument("--report",
+                              help="json file the audit report is written to")
+    audit_parser.set_defaults(command=audit_command)
+
+    args = parser.parse_args(argv)
+
+    return args.command(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,376 @@
+"""
+Benchmarks for the aov manager scene queries
+
+Run from the repository root with: python tests/benchmarks.py [sizes...]
+Each benchmark builds a synthetic scene on the fake maya.cmds module and
+reports, for every scene backend, the number of maya commands issued, the
+most issued commands and the wall time. The OpenMaya calls of the api backend
+aren't counted as commands.
+"""
+import collections
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fake_maya
+
+
+SCENE_SIZES = [10, 100, 1000]
+
+# Scene backends the benchmarks are compared across
+SCENE_BACKENDS = ["cmds", "api"]
+
+# Number of aovs enabled on each render layer of the synthetic scenes
+OVERRIDES_PER_LAYER = 8
+
+# Number of meshes added to each render layer of the synthetic scenes
+MEMBERS_PER_LAYER = 50
+
+# Number of commands listed in the report of every benchmark
+REPORTED_COMMANDS = 3
+
+
+def legacy_layers_aovs_calls(layer_count, aov_count):
+    """
+    Get the number of maya calls made by the per layer per aov query loop
+    get_layers_aovs used before the scene snapshot
+
+    :param layer_count: the number of render layers as an int
+    :param aov_count: the number of aovs as an int
+    :return: the number of maya calls as an int
+    """
+
+    # ls renderLayer, ls aiAOV then listConnections, getAttr and the
+    # override getAttr for every layer and aov pair
+    return 2 + layer_count * aov_count * 3
+
+
+def bench_get_layers_aovs(size):
+    """
+    Benchmark utils.get_layers_aovs
+
+    :param size: the number of render layers and aovs as an int
+    :return: a tuple with the maya call count and the duration in seconds
+    """
+
+    scene = fake_maya.build_scene(size, size,
+                                  overrides_per_layer=OVERRIDES_PER_LAYER)
+
+    from aov_manager import utils
+
+    start = time.time()
+    utils.get_layers_aovs()
+    duration = time.time() - start
+
+    return scene.call_count(), duration
+
+
+def legacy_set_layer_overrides_calls(layer_count, aov_count):
+    """
+    Get the number of maya calls made by the remove and recreate
+    set_layer_overrides used before the diff based writer
+
+    :param layer_count: the number of render layers as an int
+    :param aov_count: the number of aovs as an int
+    :return: the number of maya calls as an int
+    """
+
+    # Override query, removal of every existing override, then a setAttr and
+    # an adjustment per layer and the master value restore
+    return 5 + OVERRIDES_PER_LAYER + layer_count * 2
+
+
+def bench_set_layer_overrides(size):
+    """
+    Benchmark enabling one aov on one layer with utils.set_layer_overrides
+
+    :param size: the number of render layers and aovs as an int
+    :return: a tuple with the maya call count and the duration in seconds
+    """
+
+    scene = fake_maya.build_scene(size, size,
+                                  overrides_per_layer=OVERRIDES_PER_LAYER)
+
+    from aov_manager import utils
+
+    aov_node = "aiAOV_aov%04d" % (size - 1)
+
+    start = time.time()
+    utils.set_layer_overrides("%s.enabled" % aov_node, {"layer0000": True})
+    duration = time.time() - start
+
+    return scene.call_count(), duration
+
+
+def bench_add_aov_to_render_layer(size):
+    """
+    Benchmark creating a new aov and enabling it on one layer with
+    utils.add_aov_to_render_layer
+
+    :param size: the number of render layers and aovs as an int
+    :return: a tuple with the maya call count and the duration in seconds
+    """
+
+    scene = fake_maya.build_scene(size, size,
+                                  overrides_per_layer=OVERRIDES_PER_LAYER)
+
+    from aov_manager import utils
+
+    start = time.time()
+    utils.add_aov_to_render_layer("newAov",
+                                  "aiAOV_newAov",
+                                  "layer%04d" % (size - 1),
+                                  "<builtin>")
+    duration = time.time() - start
+
+    return scene.call_count(), duration
+
+
+def legacy_render_layer_objects_calls(layer_count, aov_count):
+    """
+    Get the number of maya calls made by the get_render_layer_objects used
+    before the membership resolver, which queried every member of the layer
+
+    :param layer_count: the number of render layers as an int
+    :param aov_count: the number of aovs as an int
+    :return: the number of maya calls as an int
+    """
+
+    # Member query then a nodeType and a listRelatives per shape member of
+    # the last, odd, layer
+    return 1 + min(MEMBERS_PER_LAYER, aov_count) * 2
+
+
+def bench_get_render_layer_objects(size):
+    """
+    Benchmark utils.get_render_layer_objects on a layer holding shapes
+
+    :param size: the number of render layers and aovs as an int
+    :return: a tuple with the maya call count and the duration in seconds
+    """
+
+    scene = fake_maya.build_scene(size, size,
+                                  overrides_per_layer=OVERRIDES_PER_LAYER,
+                                  members_per_layer=MEMBERS_PER_LAYER)
+
+    from aov_manager import utils
+
+    start = time.time()
+    utils.get_render_layer_objects("layer%04d" % (size - 1))
+    duration = time.time() - start
+
+    return scene.call_count(), duration
+
+
+def legacy_layer_visibility_calls(layer_count, aov_count):
+    """
+    Get the number of maya calls made by calling the per object
+    get_object_primary_visibility used before the bulk evaluator on every
+    object of a layer
+
+    :param layer_count: the number of render layers as an int
+    :param aov_count: the number of aovs as an int
+    :return: the number of maya calls as an int
+    """
+
+    # The layer objects then a nodeType, listRelatives, attributeQuery,
+    # getAttr and listSets per object
+    members = min(MEMBERS_PER_LAYER, aov_count)
+
+    return legacy_render_layer_objects_calls(layer_count, aov_count) + \
+        members * 5
+
+
+def bench_get_render_layer_primary_visibility(size):
+    """
+    Benchmark utils.get_render_layer_primary_visibility on a layer with an
+    override set hiding some of its objects
+
+    :param size: the number of render layers and aovs as an int
+    :return: a tuple with the maya call count and the duration in seconds
+    """
+
+    scene = fake_maya.build_scene(size, size,
+                                  overrides_per_layer=OVERRIDES_PER_LAYER,
+                                  members_per_layer=MEMBERS_PER_LAYER)
+
+    scene.add_set("hidden", ["mesh%04d" % x for x in range(0, size, 2)],
+                  primary_visibility=False)
+
+    from aov_manager import utils
+
+
+    start = time.time()
+    utils.get_render_layer_primary_visibility("layer%04d" % (size - 1))
+    duration = time.time() - start
+
+    return scene.call_count(), duration
+
+
+def legacy_disable_for_all_layers_calls(layer_count, aov_count):
+    """
+    Get the number of maya calls made by the disable for all layers callback
+    used before the adjustment sweep
+
+    :param layer_count: the number of render layers as an int
+    :param aov_count: the number of aovs as an int
+    :return: the number of maya calls as an int
+    """
+
+    # Render layer query, an adjustment removal for every layer and aov pair
+    # and a setAttr per aov
+    return 1 + layer_count * aov_count + aov_count
+
+
+def bench_disable_aovs_for_all_layers(size):
+    """
+    Benchmark disabling every aov on every layer with
+    utils.disable_aovs_for_all_layers
+
+    :param size: the number of render layers and aovs as an int
+    :return: a tuple with the maya call count and the duration in seconds
+    """
+
+    scene = fake_maya.build_scene(size, size,
+                                  overrides_per_layer=OVERRIDES_PER_LAYER)
+
+    from aov_manager import utils
+
+    start = time.time()
+    utils.disable_aovs_for_all_layers(["aiAOV_aov%04d" % x
+                                       for x in range(size)])
+    duration = time.time() - start
+
+    return scene.call_count(), duration
+
+
+def legacy_create_aovs_calls(layer_count, aov_count):
+    """
+    Get an estimate of the maya calls made by creating aovs one at a time
+    with create_new_aov and AOVInterface.addAOV
+
+    :param layer_count: the number of render layers as an int
+    :param aov_count: the number of aovs as an int
+    :return: the number of maya calls as an int
+    """
+
+    # For every aov the aov query, the createNode, two setAttr and three
+    # connectAttr issued by addAOV, the mtoa alias refresh of every aov in the
+    # list and the disabled setAttr
+    return sum(8 + x for x in range(1, aov_count + 1))
+
+
+def bench_create_aovs(size):
+    """
+    Benchmark creating builtin aovs with utils.create_aovs
+
+    :param size: the number of render layers and aovs created as an int
+    :return: a tuple with the maya call count and the duration in seconds
+    """
+
+    scene = fake_maya.build_scene(size, 0)
+
+    from aov_manager import utils
+
+    aov_list = [{"ui_Name": "new%04d" % x,
+                 "type": "<builtin>",
+                 "data": "rgb"} for x in range(size)]
+
+    start = time.time()
+    utils.create_aovs(aov_list)
+    duration = time.time() - start
+
+    return scene.call_count(), duration
+
+
+def run(benchmarks, sizes=None, backends=None):
+    """
+    Run benchmarks for every scene backend and scene size and print a report
+
+    :param benchmarks: a list of (name, function, legacy_calls) tuples
+    :param sizes: a list of scene sizes, defaults to SCENE_SIZES
+    :param backends: a list of scene backend names, defaults to
+    SCENE_BACKENDS
+    :return: a list of result dictionaries
+    """
+
+    fake_maya.install()
+    fake_maya.install_api()
+
+    from aov_manager import scene_backend
+
+    results = []
+
+    for name, function, legacy_calls in benchmarks:
+        for backend in backends or SCENE_BACKENDS:
+            scene_backend.set_backend(backend)
+
+            for size in sizes or SCENE_SIZES:
+                results.append(run_benchmark(name, function, legacy_calls,
+                                             backend, size))
+
+    # Leave the default backend of the fake scene
+    scene_backend.set_backend(scene_backend.BACKEND_CMDS)
+
+    return results
+
+
+def run_benchmark(name, function, legacy_calls, backend, size):
+    """
+    Run a benchmark on one scene size and print its report line
+
+    :param name: the benchmark name as a string
+    :param function: the benchmark function
+    :param legacy_calls: the legacy call count function or None
+    :param backend: the scene backend name as a string
+    :param size: the scene size as an int
+    :return: a result dictionary
+    """
+
+    calls, duration = function(size)
+
+    scene = sys.modules["maya.cmds"]._fake_scene
+
+    result = {"benchmark": name,
+              "backend": backend,
+              "size": size,
+              "calls": calls,
+              "commands": dict(collections.Counter(scene.calls)),
+              "seconds": duration}
+
+    if legacy_calls is not None:
+        result["legacy_calls"] = legacy_calls(size, size)
+
+    top_commands = sorted(result["commands"].items(),
+                          key=lambda x: (-x[1], x[0]))
+
+    print "%-30s %-4s %5d x %-5d calls: %7d  legacy: %7s  %.4fs  %s" % (
+        name, backend, size, size, calls,
+        result.get("legacy_calls", "-"), duration,
+        ", ".join("%s %d" % x for x in top_commands[:REPORTED_COMMANDS]))
+
+    return result
+
+
+BENCHMARKS = [("get_layers_aovs", bench_get_layers_aovs,
+               legacy_layers_aovs_calls),
+              ("set_layer_overrides", bench_set_layer_overrides,
+               legacy_set_layer_overrides_calls),
+              ("add_aov_to_render_layer", bench_add_aov_to_render_layer,
+               None),
+              ("get_render_layer_objects", bench_get_render_layer_objects,
+               legacy_render_layer_objects_calls),
+              ("layer_primary_visibility",
+               bench_get_render_layer_primary_visibility,
+               legacy_layer_visibility_calls),
+              ("disable_aovs_for_all_layers",
+               bench_disable_aovs_for_all_layers,
+               legacy_disable_for_all_layers_calls),
+              ("create_aovs", bench_create_aovs, legacy_create_aovs_calls)]
+
+
+if __name__ == '__main__':
+    run(BENCHMARKS, sizes=[int(x) for x in sys.argv[1:]])
@@ -0,0 +1,1324 @@
+"""
+In memory stand-in for the parts of maya.cmds used by the aov manager
+
+The fake scene models nodes, attributes, connections and legacy render layer
+adjustments, and records every command issued so tests can count the Maya
+calls made by the utils functions.
+"""
+import copy
+import fnmatch
+import re
+import sys
+import types
+
+
+DEFAULT_LAYER = "defaultRenderLayer"
+
+# mtoa aov data types and their arnold type values
+AOV_TYPES = (("int", 1), ("bool", 3), ("float", 4), ("rgb", 5), ("rgba", 6),
+             ("vector", 7), ("point", 8), ("point2", 9), ("pointer", 11))
+
+ADJUSTMENT_PLUG = re.compile(r"^(?P<layer>[^.]+)\.adjustments\[(?P<index>\d+)\]"
+                             r"\.(?P<field>plug|value)$")
+
+
+class FakeScene(object):
+    """
+    Class holding the state of a fake maya scene
+    """
+    def __init__(self):
+        """
+        Initialise an empty scene with only the default render layer
+        """
+        self.nodes = dict()
+        self.node_order = []
+        self.values = dict()
+        self.connections = []
+
+        # Legacy render layer adjustments: layer -> {index: [plug, value]}
+        # The default render layer entries hold the master value of a plug
+        # and are kept in sync automatically like maya does
+        self.adjustments = dict()
+
+        # Dag hierarchy: node name -> parent node name
+        self.parents = dict()
+
+        # Render layer members: layer -> [node names]
+        self.layer_members = dict()
+
+        # Object set members: set -> [node names]
+        self.set_members = dict()
+
+        self.current_layer = DEFAULT_LAYER
+        self.calls = []
+
+        # Undo chunks: (chunk name, scene state before the chunk), the
+        # queue is only kept while undo is enabled
+        self.undo_enabled = True
+        self.undo_queue = []
+        self.open_chunks = 0
+        self._chunk_start = None
+
+        # Number of refresh suspensions in effect
+        self.refresh_suspended = 0
+
+        # Files which can be imported: path -> [(node type, node name)]
+        self.files = dict()
+
+        # Scene files which can be opened: path -> [render layer names]
+        self.scene_files = dict()
+        self.current_file = None
+        self.saved_files = []
+
+        # Loaded plugins: plugin name -> version
+        self.plugins = {"mtoa": "1.2.7.3"}
+
+        # mtoa aov registry: node type -> [aov names]
+        self.registered_aovs = {"aiStandard": ["direct_diffuse",
+                                               "direct_specular"],
+                                "aiSkin": ["sss", ""]}
+
+        self.create_node("renderLayer", DEFAULT_LAYER)
+
+    # Scene building helpers
+
+    def create_node(self, node_type, name):
+        """
+        Add a node to the scene
+
+        :param node_type: the maya node type as a string
+        :param name: the node name as a string
+        :return: the node name as a string
+        """
+
+        self.nodes[name] = node_type
+        self.node_order.append(name)
+
+        if node_type == "renderLayer":
+            self.adjustments[name] = dict()
+            self.layer_members[name] = []
+
+        if node_type == "aiAOV":
+            self.values["%s.enabled" % name] = True
+
+        return name
+
+    def add_render_layer(self, name):
+        """
+        Add a render layer to the scene
+
+        :param name: the render layer name as a string
+        :return: the render layer name as a string
+        """
+
+        return self.create_node("renderLayer", name)
+
+    def add_aov(self, aov_name, enabled=False, data_type="rgb"):
+        """
+        Add an aiAOV node to the scene
+
+        :param aov_name: the aov name as a string
+        :param enabled: the master enabled value as a bool
+        :param data_type: the aov data type as a string
+        :return: the aiAOV node name as a string
+        """
+
+        node = self.create_node("aiAOV", "aiAOV_%s" % aov_name)
+        self.values["%s.enabled" % node] = enabled
+        self.values["%s.type" % node] = data_type
+
+        return node
+
+    def add_mesh(self, name, parent=None):
+        """
+        Add a transform with a mesh shape to the scene
+
+        :param name: the transform node name as a string
+        :param parent: an optional parent transform node name
+        :return: the transform node name as a string
+        """
+
+        self.create_node("transform", name)
+        self.create_node("mesh", "%sShape" % name)
+
+        self.parents["%sShape" % name] = name
+
+        if parent is not None:
+            self.parents[name] = parent
+
+        self.values["%sShape.primaryVisibility" % name] = True
+
+        return name
+
+    def add_layer_members(self, render_layer, nodes):
+        """
+        Add nodes to a render layer
+
+        :param render_layer: the render layer name as a string
+        :param nodes: a list of node names
+        :return:
+        """
+
+        members = self.layer_members[render_layer]
+        members.extend([x for x in nodes if x not in members])
+
+        return
+
+    def add_set(self, name, members, primary_visibility=None):
+        """
+        Add an object set to the scene
+
+        :param name: the set name as a string
+        :param members: a list of node names
+        :param primary_visibility: the set primaryVisibility override value,
+        the set has no override if None
+        :return: the set name as a string
+        """
+
+        self.create_node("objectSet", name)
+        self.set_members[name] = list(members)
+
+        if primary_visibility is not None:
+            self.values["%s.primaryVisibility" % name] = primary_visibility
+
+        return name
+
+    def descendants(self, node):
+        """
+        Get the dag descendants of a node, depth first
+
+        :param node: the node name as a string
+        :return: a list of node names
+        """
+
+        descendants = []
+
+        children = [x for x in self.node_order if self.parents.get(x) == node]
+
+        for child in children:
+            descendants.append(child)
+            descendants.extend(self.descendants(child))
+
+        return descendants
+
+    def full_path(self, node):
+        """
+        Get the dag path of a node
+
+        :param node: the node name as a string
+        :return: the full dag path as a string
+        """
+
+        path = "|" + node
+
+        while node in self.parents:
+            node = self.parents[node]
+            path = "|" + node + path
+
+        return path
+
+    def add_override(self, node_attribute, render_layer, value):
+        """
+        Add a layer adjustment without recording a maya command
+
+        :param node_attribute: the node attribute as a string
+        :param render_layer: the render layer name as a string
+        :param value: the override value
+        :return:
+        """
+
+        index = self._adjustment_index(render_layer, node_attribute)
+
+        if index is None:
+            index = self._new_adjustment(render_layer, node_attribute)
+
+        self.adjustments[render_layer][index][1] = value
+
+        self._sync_default_adjustment(node_attribute)
+
+        return
+
+    def import_file(self, path):
+        """
+        Import the nodes registered for a file path
+
+        :param path: the file path as a string
+        :return: a list of the imported node names
+        """
+
+        imported_nodes = []
+
+        for node_type, name in self.files.get(path, []):
+            imported_nodes.append(self.create_node(node_type, name))
+
+        return imported_nodes
+
+    def open_file(self, path):
+        """
+        Replace the scene content with a registered scene file
+
+        :param path: the file path as a string
+        :return: the file path as a string
+        """
+
+        if path not in self.scene_files:
+            raise RuntimeError("File not found: %s" % path)
+
+        kept_state = dict((x, getattr(self, x))
+                          for x in ["calls", "files", "scene_files",
+                                    "saved_files", "plugins",
+                                    "registered_aovs"])
+
+        self.__init__()
+        self.__dict__.update(kept_state)
+
+        self.current_file = path
+
+        for render_layer in self.scene_files[path]:
+            self.add_render_layer(render_layer)
+
+        return path
+
+    def reset_calls(self):
+        """
+        Clear the recorded command list
+
+        :return:
+        """
+
+        self.calls = []
+
+        return
+
+    def call_count(self, command=None):
+        """
+        Get the number of recorded calls
+
+        :param command: an optional command name to filter by
+        :return: the number of calls as an int
+        """
+
+        if command is None:
+            return len(self.calls)
+
+        return len([x for x in self.calls if x == command])
+
+    # Undo
+
+    UNDO_STATE = ["nodes", "node_order", "values", "connections",
+                  "adjustments", "parents", "layer_members", "set_members"]
+
+    def undo_state(self):
+        """
+        Get a copy of the scene state restored by an undo
+
+        :return: a dictionary of the state attributes
+        """
+
+        return copy.deepcopy(dict((x, getattr(self, x))
+                                  for x in self.UNDO_STATE))
+
+    def open_chunk(self, name):
+        """
+        Open an undo chunk, nested chunks are part of the outer one
+
+        :param name: the chunk name as a string
+        :return:
+        """
+
+        if not self.open_chunks and self.undo_enabled:
+            self._chunk_start = (name, self.undo_state())
+
+        self.open_chunks += 1
+
+        return
+
+    def close_chunk(self):
+        """
+        Close an undo chunk, the outer chunk is queued if the scene changed
+
+        :return:
+        """
+
+        self.open_chunks -= 1
+
+        if self.open_chunks or self._chunk_start is None:
+            return
+
+        name, state = self._chunk_start
+        self._chunk_start = None
+
+        if state != self.undo_state():
+            self.undo_queue.append((name, state))
+
+        return
+
+    def undo(self):
+        """
+        Restore the scene state from before the last queued chunk
+
+        :return: the undone chunk name
+        """
+
+        name, state = self.undo_queue.pop()
+        self.__dict__.update(state)
+
+        return name
+
+    # Adjustments
+
+    def _adjustment_index(self, render_layer, node_attribute):
+        for index, adjustment in self.adjustments[render_layer].items():
+            if adjustment[0] == node_attribute:
+                return index
+
+        return None
+
+    def _new_adjustment(self, render_layer, node_attribute):
+        layer_adjustments = self.adjustments[render_layer]
+        index = max(layer_adjustments.keys() or [-1]) + 1
+        layer_adjustments[index] = [node_attribute, None]
+
+        return index
+
+    def _sync_default_adjustment(self, node_attribute):
+        overridden = [x for x in self.adjustments
+                      if x != DEFAULT_LAYER and
+                      self._adjustment_index(x, node_attribute) is not None]
+
+        index = self._adjustment_index(DEFAULT_LAYER, node_attribute)
+
+        if overridden and index is None:
+            self._new_adjustment(DEFAULT_LAYER, node_attribute)
+
+        if not overridden and index is not None:
+            del self.adjustments[DEFAULT_LAYER][index]
+
+    def _live_index(self, node_attribute):
+        if self.current_layer == DEFAULT_LAYER:
+            return None
+
+        return self._adjustment_index(self.current_layer, node_attribute)
+
+    def read_plug(self, plug):
+        """
+        Get the current value of a plug
+
+        :param plug: the plug name as a string
+        :return: the plug value
+        """
+
+        plug = plug_key(plug)
+        match = ADJUSTMENT_PLUG.match(plug)
+
+        if match is not None:
+            layer = match.group("layer")
+            adjustment = self.adjustments[layer][int(match.group("index"))]
+
+            if match.group("field") == "plug":
+                return None
+
+            if layer == DEFAULT_LAYER:
+                return self.values[adjustment[0]]
+
+            return adjustment[1]
+
+        live_index = self._live_index(plug)
+
+        if live_index is not None:
+            return self.adjustments[self.current_layer][live_index][1]
+
+        if plug not in self.values:
+            raise RuntimeError("No object matches name: %s" % plug)
+
+        return self.values[plug]
+
+    def write_plug(self, plug, value):
+        """
+        Set the current value of a plug
+
+        :param plug: the plug name as a string
+        :param value: the value to set
+        :return:
+        """
+
+        plug = plug_key(plug)
+        match = ADJUSTMENT_PLUG.match(plug)
+
+        if match is not None:
+            layer = match.group("layer")
+            adjustment = self.adjustments[layer][int(match.group("index"))]
+
+            if layer == DEFAULT_LAYER:
+                self.values[adjustment[0]] = value
+            else:
+                adjustment[1] = value
+
+            return
+
+        if plug.split(".")[0] not in self.nodes:
+            raise RuntimeError("No object matches name: %s" % plug)
+
+        live_index = self._live_index(plug)
+
+        if live_index is not None:
+            self.adjustments[self.current_layer][live_index][1] = value
+            return
+
+        self.values[plug] = value
+
+    def layer_value(self, node_attribute, render_layer):
+        """
+        Get the value a plug evaluates to on a given render layer
+
+        :param node_attribute: the node attribute as a string
+        :param render_layer: the render layer name as a string
+        :return: the plug value on the render layer
+        """
+
+        if render_layer != DEFAULT_LAYER:
+            index = self._adjustment_index(render_layer, node_attribute)
+
+            if index is not None:
+                return self.adjustments[render_layer][index][1]
+
+        return self.values[node_attribute]
+
+
+class FakeCmds(object):
+    """
+    Class implementing the maya.cmds commands used by the aov manager
+    on top of a FakeScene
+    """
+    def __init__(self, scene):
+        self.scene = scene
+
+    def ls(self, *args, **kwargs):
+        scene = self.scene
+        node_types = kwargs.get("type", None)
+        nodes = []
+
+        if isinstance(node_types, basestring):
+            node_types = [node_types]
+
+        for arg in args:
+            for name in [arg] if isinstance(arg, basestring) else arg:
+                # Wildcards match node names
+                if "*" in name:
+                    nodes.extend(fnmatch.filter(scene.node_order, name))
+                else:
+                    nodes.append(name)
+
+        if not args:
+            nodes = scene.node_order
+
+        if kwargs.get("dag", False):
+            dag_nodes = []
+
+            for node in nodes:
+                node = node.split("|")[-1]
+
+                if node in scene.nodes:
+                    dag_nodes.extend([node] + scene.descendants(node))
+
+            nodes = []
+
+            for node in dag_nodes:
+                if node not in nodes:
+                    nodes.append(node)
+
+        # Attributes are listed when they exist, dag nodes by their path
+        result = [x for x in nodes
+                  if (x.split("|")[-1] in scene.nodes or
+                      plug_key(x) in scene.values) and
+                  (node_types is None or
+                   scene.nodes.get(x.split("|")[-1]) in node_types)]
+
+        if kwargs.get("long", False):
+            result = [scene.full_path(x.split("|")[-1])
+                      if x.split("|")[-1] in scene.nodes else x
+                      for x in result]
+
+        if kwargs.get("showType", False):
+            result = [y for x in result
+                      for y in (x, scene.nodes[x.split("|")[-1]])]
+
+        return result
+
+    def objExists(self, name):
+        return name.split(".")[0] in self.scene.nodes
+
+    def nodeType(self, name):
+        return self.scene.nodes[name.split("|")[-1]]
+
+    def createNode(self, node_type, name=None, **kwargs):
+        return self.scene.create_node(node_type, name or node_type + "1")
+
+    def delete(self, *nodes):
+        scene = self.scene
+
+        for node in nodes:
+            if node not in scene.nodes:
+                raise RuntimeError("No object matches name: %s" % node)
+
+            del scene.nodes[node]
+            scene.node_order.remove(node)
+
+            for plug in [x for x in scene.values if x.startswith(node + ".")]:
+                del scene.values[plug]
+
+            scene.connections = [x for x in scene.connections
+                                 if x[0].split(".")[0] != node and
+                                 x[1].split(".")[0] != node]
+
+            scene.adjustments.pop(node, None)
+            scene.layer_members.pop(node, None)
+            scene.parents.pop(node, None)
+            scene.set_members.pop(node, None)
+
+            for members in scene.layer_members.values():
+                if node in members:
+                    members.remove(node)
+
+            for layer_adjustments in scene.adjustments.values():
+                for index, adjustment in list(layer_adjustments.items()):
+                    if adjustment[0] and adjustment[0].split(".")[0] == node:
+                        del layer_adjustments[index]
+
+    def getAttr(self, plug, asString=False, multiIndices=False, **kwargs):
+        if multiIndices:
+            node, _, attribute = plug.partition(".")
+
+            if attribute == "adjustments":
+                return sorted(self.scene.adjustments[node]) or None
+
+        value = self.scene.read_plug(plug)
+
+        # Aov data types set by value are read back by name
+        if asString and plug.endswith(".type") and isinstance(value, int):
+            return dict((x[1], x[0]) for x in AOV_TYPES)[value]
+
+        return value
+
+    def setAttr(self, plug, *values, **kwargs):
+        self.scene.write_plug(plug, values[0] if len(values) == 1 else values)
+
+    def removeMultiInstance(self, plug, b=False, **kwargs):
+        match = re.match(r"^([^.]+)\.adjustments\[(\d+)\]$", plug)
+
+        if match is not None:
+            self.scene.adjustments[match.group(1)].pop(int(match.group(2)),
+                                                        None)
+            return
+
+        for value_plug in list(self.scene.values):
+            if value_plug == plug or value_plug.startswith(plug + "."):
+                del self.scene.values[value_plug]
+
+    def connectAttr(self, source, destination, force=False,
+                    nextAvailable=False, **kwargs):
+        if nextAvailable:
+            index = len([x for x in self.scene.connections
+                         if x[1].startswith(destination + "[")])
+            destination = "%s[%s]" % (destination, index)
+
+        self.scene.connections = [x for x in self.scene.connections
+                                  if x[1] != destination]
+        self.scene.connections.append((source, destination))
+
+    def listConnections(self, plug, plugs=False, connections=False,
+                        source=True, destination=True, type=None, **kwargs):
+        scene = self.scene
+        result = []
+
+        # Many nodes or plugs are listed one after the other
+        if not isinstance(plug, basestring):
+            for item in plug:
+                result.extend(self.listConnections(item,
+                                                   plugs=plugs,
+                                                   connections=connections,
+                                                   source=source,
+                                                   destination=destination,
+                                                   type=type) or [])
+
+            return result or None
+
+        node, _, attribute = plug.partition(".")
+
+        if scene.nodes.get(node) == "renderLayer" and \
+                attribute.startswith("adjustments"):
+            if source:
+                for index in sorted(scene.adjustments[node]):
+                    adjustment_plug = "%s.adjustments[%s].plug" % (node, index)
+                    node_attribute = scene.adjustments[node][index][0]
+
+                    # Adjustments left without their plug are disconnected
+                    if node_attribute is None:
+                        continue
+
+                    if connections:
+                        result.append(adjustment_plug)
+
+                    result.append(node_attribute if plugs
+                                  else node_attribute.split(".")[0])
+
+            return result or None
+
+        pairs = []
+
+        if destination:
+            for layer in scene.adjustments:
+                index = scene._adjustment_index(layer, plug)
+
+                if index is not None:
+                    pairs.append((plug,
+                                  "%s.adjustments[%s].plug" % (layer, index),
+                                  layer))
+
+        for src, dst in scene.connections:
+            if source and (dst == plug or (not attribute and
+                                           dst.split(".")[0] == node)):
+                pairs.append((dst, src, src.split(".")[0]))
+            if destination and (src == plug or (not attribute and
+                                                src.split(".")[0] == node)):
+                pairs.append((src, dst, dst.split(".")[0]))
+
+        for own_plug, other_plug, other_node in pairs:
+            if type is not None and scene.nodes.get(other_node) != type:
+                continue
+
+            if connections:
+                result.append(own_plug)
+
+            result.append(other_plug if plugs else other_node)
+
+        return result or None
+
+    def editRenderLayerGlobals(self, query=False, currentRenderLayer=None,
+                               crl=None, **kwargs):
+        layer = currentRenderLayer if currentRenderLayer is not None else crl
+
+        if query:
+            return self.scene.current_layer
+
+        self.scene.current_layer = layer
+
+    def editRenderLayerAdjustment(self, *plugs, **kwargs):
+        scene = self.scene
+        render_layer = kwargs.get("layer", scene.current_layer)
+
+        for plug in plugs:
+            index = scene._adjustment_index(render_layer, plug)
+
+            if kwargs.get("remove", False):
+                if index is not None:
+                    del scene.adjustments[render_layer][index]
+                    scene._sync_default_adjustment(plug)
+                continue
+
+            if index is None:
+                value = scene.read_plug(plug)
+                index = scene._new_adjustment(render_layer, plug)
+                scene._sync_default_adjustment(plug)
+                scene.adjustments[render_layer][index][1] = value
+
+    def editRenderLayerMembers(self, render_layer, query=False, q=False,
+                               fullNames=False, **kwargs):
+        members = self.scene.layer_members[render_layer]
+
+        if fullNames:
+            members = [self.scene.full_path(x) for x in members]
+
+        return list(members) or None
+
+    def listRelatives(self, node, parent=False, shapes=False,
+                      allDescendents=False, fullPath=False, **kwargs):
+        scene = self.scene
+        node = node.split("|")[-1]
+
+        if parent:
+            relatives = [scene.parents[node]] if node in scene.parents else []
+        else:
+            relatives = []
+            parents = [node]
+
+            while parents:
+                children = [x for x in scene.node_order
+                            if scene.parents.get(x) in parents]
+                relatives.extend(children)
+                parents = children if allDescendents else []
+
+            if shapes:
+                relatives = [x for x in relatives
+                             if scene.nodes[x] != "transform"]
+
+        if fullPath:
+            relatives = [scene.full_path(x) for x in relatives]
+
+        return relatives or None
+
+    def sets(self, object_set, query=False, q=False, **kwargs):
+        return list(self.scene.set_members[object_set]) or None
+
+    def undoInfo(self, query=False, q=False, state=False, undoName=False,
+                 openChunk=False, closeChunk=False, chunkName=None,
+                 **kwargs):
+        scene = self.scene
+
+        if query or q:
+            if undoName:
+                return scene.undo_queue[-1][0] if scene.undo_queue else ""
+            return scene.undo_enabled
+
+        if openChunk:
+            scene.open_chunk(chunkName)
+
+        if closeChunk:
+            scene.close_chunk()
+
+    def undo(self):
+        return self.scene.undo()
+
+    def refresh(self, suspend=None, **kwargs):
+        if suspend is not None:
+            self.scene.refresh_suspended += 1 if suspend else -1
+
+    def about(self, batch=False, **kwargs):
+        return False
+
+    def shadingNode(self, node_type, name=None, **kwargs):
+        return self.scene.create_node(node_type, name or node_type + "1")
+
+    def addAttr(self, *nodes, **kwargs):
+        attribute = kwargs.get("ln", kwargs.get("longName", None))
+        attribute_type = kwargs.get("at", kwargs.get("attributeType", None))
+
+        # Children are stored in their compound value
+        if kwargs.get("parent", kwargs.get("p", None)) is not None:
+            return
+
+        for node in nodes:
+            plug = plug_key("%s.%s" % (node, attribute))
+
+            if attribute_type == "float3":
+                self.scene.values[plug] = (0.0, 0.0, 0.0)
+            else:
+                self.scene.values[plug] = False
+
+    def file(self, path=None, open=False, save=False, **kwargs):
+        if open:
+            return self.scene.open_file(path)
+
+        if save:
+            self.scene.saved_files.append(self.scene.current_file)
+            return self.scene.current_file
+
+        return self.scene.import_file(path)
+
+    def pluginInfo(self, plugin=None, query=False, listPlugins=False,
+                   version=False, **kwargs):
+        if listPlugins:
+            return sorted(self.scene.plugins) or None
+
+        return self.scene.plugins[plugin]
+
+
+class FakeAOVInterface(object):
+    """
+    Class standing in for mtoa.aovs.AOVInterface
+    """
+    scene = None
+
+    def addAOV(self, aov_name, aovType=None):
+        self.scene.calls.append("addAOV")
+        node = self.scene.add_aov(aov_name, enabled=True)
+        self.scene.values["%s.type" % node] = aovType
+
+        return node
+
+
+def _get_node_types_with_aovs(scene):
+    def getNodeTypesWithAOVs():
+        return sorted(scene.registered_aovs)
+
+    return getNodeTypesWithAOVs
+
+
+def _get_registered_aovs(scene):
+    def getRegisteredAOVs(nodeType=None):
+        return list(scene.registered_aovs[nodeType])
+
+    return getRegisteredAOVs
+
+
+class FakeCallbackRegistry(object):
+    """
+    Class standing in for the maya callback registry, scene events are
+    emitted by hand
+    """
+    def __init__(self):
+        self.callbacks = dict()
+        self._next_id = 0
+
+    def _add(self, kind, key, callback):
+        self._next_id += 1
+        self.callbacks[self._next_id] = (kind, key, callback)
+
+        return self._next_id
+
+    def add_node_added_callback(self, callback, node_type):
+        return self._add("added", node_type, callback)
+
+    def add_node_removed_callback(self, callback, node_type):
+        return self._add("removed", node_type, callback)
+
+    def add_attribute_changed_callback(self, node_name, callback):
+        return self._add("attribute", node_name, callback)
+
+    def add_name_changed_callback(self, node_name, callback):
+        return self._add("name", node_name, callback)
+
+    def add_plugin_loaded_callback(self, callback):
+        return self._add("plugin", "loaded", callback)
+
+    def add_plugin_unloaded_callback(self, callback):
+        return self._add("plugin", "unloaded", callback)
+
+    def remove_callback(self, callback_id):
+        del self.callbacks[callback_id]
+
+    def _callbacks(self, kind, key):
+        return [x[2] for x in list(self.callbacks.values())
+                if x[0] == kind and x[1] == key]
+
+    def emit_node_added(self, node_type, node_name):
+        for callback in self._callbacks("added", node_type):
+            callback(node_name)
+
+    def emit_node_removed(self, node_type, node_name):
+        for callback in self._callbacks("removed", node_type):
+            callback(node_name)
+
+    def emit_attribute_changed(self, node_name, attribute):
+        for callback in self._callbacks("attribute", node_name):
+            callback(node_name, attribute)
+
+    def emit_name_changed(self, previous_name, node_name):
+        for callback_id, callback in list(self.callbacks.items()):
+            if callback[:2] in [("name", previous_name),
+                                ("attribute", previous_name)]:
+                self.callbacks[callback_id] = (callback[0], node_name,
+                                               callback[2])
+
+        for callback in self._callbacks("name", node_name):
+            callback(previous_name, node_name)
+
+    def emit_plugin_loaded(self, plugin_name):
+        for callback in self._callbacks("plugin", "loaded"):
+            callback(plugin_name)
+
+    def emit_plugin_unloaded(self, plugin_name):
+        for callback in self._callbacks("plugin", "unloaded"):
+            callback(plugin_name)
+
+
+class FakeScheduler(object):
+    """
+    Class standing in for QTimer.singleShot, scheduled functions run when
+    run_pending is called
+    """
+    def __init__(self):
+        self.pending = []
+
+    def __call__(self, delay, function):
+        self.pending.append(function)
+
+    def run_pending(self):
+        pending = self.pending
+        self.pending = []
+
+        for function in pending:
+            function()
+
+
+class FakeMFn(object):
+    """
+    Function set types of the fake OpenMaya objects
+    """
+    kDependencyNode = 4
+    kNumericAttribute = 1
+    kPluginDependNode = 455
+    kRenderLayer = 772
+
+
+class FakeMFnNumericData(object):
+    """
+    Numeric types of the fake numeric attributes
+    """
+    kBoolean = 1
+    kByte = 2
+    kChar = 3
+    kShort = 4
+    kInt = 7
+    kLong = 7
+    kFloat = 11
+    kDouble = 14
+    kInvalid = 0
+
+
+# Python value types of the fake numeric attributes
+NUMERIC_TYPES = [(bool, FakeMFnNumericData.kBoolean),
+                 (int, FakeMFnNumericData.kInt),
+                 (float, FakeMFnNumericData.kDouble)]
+
+
+class FakeMObject(object):
+    """
+    Class standing in for an OpenMaya node or attribute MObject
+    """
+    def __init__(self, scene, node=None, plug=None):
+        self.scene = scene
+        self.node = node
+        self.plug = plug
+
+    def apiType(self):
+        if self.plug is not None:
+            return FakeMFn.kNumericAttribute if self.numeric_type() else 0
+
+        node_type = self.scene.nodes[self.node]
+
+        if node_type == "renderLayer":
+            return FakeMFn.kRenderLayer
+
+        if node_type == "aiAOV":
+            return FakeMFn.kPluginDependNode
+
+        return FakeMFn.kDependencyNode
+
+    def hasFn(self, kind):
+        return self.apiType() == kind
+
+    def numeric_type(self):
+        # Attributes are typed by the python type of their stored value
+        value = self.scene.values.get(plug_key(self.plug), None)
+
+        for value_type, numeric_type in NUMERIC_TYPES:
+            if type(value) is value_type:
+                return numeric_type
+
+        return FakeMFnNumericData.kInvalid
+
+
+class FakeMPlug(object):
+    """
+    Class standing in for an OpenMaya MPlug, a null plug has no name
+    """
+    def __init__(self, scene, plug=None):
+        self.scene = scene
+        self.plug = plug
+
+    @property
+    def isNull(self):
+        return self.plug is None
+
+    def name(self):
+        return self.plug
+
+    def partialName(self, includeNodeName=False, useLongNames=False):
+        return self.plug
+
+    def attribute(self):
+        return FakeMObject(self.scene, plug=self.plug)
+
+    def numElements(self):
+        render_layer = self.plug.split(".")[0]
+
+        return len(self.scene.adjustments[render_layer])
+
+    def elementByPhysicalIndex(self, index):
+        render_layer = self.plug.split(".")[0]
+        logical_index = sorted(self.scene.adjustments[render_layer])[index]
+
+        return FakeMPlug(self.scene, "%s[%s]" % (self.plug, logical_index))
+
+    def child(self, attribute):
+        return FakeMPlug(self.scene, "%s.%s" % (self.plug, attribute.plug))
+
+    def source(self):
+        match = ADJUSTMENT_PLUG.match(self.plug)
+
+        if match is None or match.group("field") != "plug":
+            return FakeMPlug(self.scene)
+
+        adjustment = self.scene.adjustments[match.group("layer")].get(
+            int(match.group("index")), None)
+
+        return FakeMPlug(self.scene, adjustment and adjustment[0])
+
+    def asBool(self):
+        return bool(self.scene.read_plug(self.plug))
+
+    def asInt(self):
+        return int(self.scene.read_plug(self.plug))
+
+    def asDouble(self):
+        return float(self.scene.read_plug(self.plug))
+
+
+class FakeMSelectionList(object):
+    """
+    Class standing in for an OpenMaya MSelectionList
+    """
+    def __init__(self):
+        self.scene = FakeMSelectionList.scene
+        self.items = []
+
+    def add(self, name):
+        if plug_key(name).split(".")[0] not in self.scene.nodes:
+            raise RuntimeError("(kInvalidParameter): Object does not exist")
+
+        self.items.append(name)
+
+        return self
+
+    def length(self):
+        return len(self.items)
+
+    def getDependNode(self, index):
+        return FakeMObject(self.scene, node=self.items[index].split(".")[0])
+
+    def getPlug(self, index):
+        return FakeMPlug(self.scene, self.items[index])
+
+
+class FakeMFnDependencyNode(object):
+    """
+    Class standing in for an OpenMaya MFnDependencyNode
+    """
+    def __init__(self, node_object):
+        self.scene = node_object.scene
+        self.node = node_object.node
+
+    @property
+    def typeName(self):
+        return self.scene.nodes[self.node]
+
+    def name(self):
+        return self.node
+
+    def findPlug(self, attribute, want_networked_plug):
+        return FakeMPlug(self.scene, "%s.%s" % (self.node, attribute))
+
+    def attribute(self, attribute):
+        return FakeMObject(self.scene, plug=attribute)
+
+
+class FakeMFnNumericAttribute(object):
+    """
+    Class standing in for an OpenMaya MFnNumericAttribute
+    """
+    def __init__(self, attribute_object):
+        self.attribute_object = attribute_object
+
+    def numericType(self):
+        return self.attribute_object.numeric_type()
+
+
+class FakeMItDependencyNodes(object):
+    """
+    Class standing in for an OpenMaya MItDependencyNodes iterating the
+    scene nodes in creation order
+    """
+    def __init__(self, kind=FakeMFn.kDependencyNode):
+        scene = FakeMSelectionList.scene
+
+        self.nodes = [FakeMObject(scene, node=x) for x in scene.node_order
+                      if x in scene.nodes]
+
+        if kind != FakeMFn.kDependencyNode:
+            self.nodes = [x for x in self.nodes if x.hasFn(kind)]
+
+        self.index = 0
+
+    def isDone(self):
+        return self.index >= len(self.nodes)
+
+    def next(self):
+        self.index += 1
+
+    def thisNode(self):
+        return self.nodes[self.index]
+
+
+def plug_key(plug):
+    """
+    Get the name a plug value is stored under, dag paths are replaced by the
+    node name
+
+    :param plug: the plug name as a string
+    :return: the plug name as a string
+    """
+
+    node, dot, attribute = plug.partition(".")
+
+    return node.split("|")[-1] + dot + attribute
+
+
+def install():
+    """
+    Install fake maya and mtoa modules in sys.modules
+
+    :return: the FakeScene used by the fake maya.cmds module
+    """
+
+    scene = FakeScene()
+
+    cmds_module = sys.modules.get("maya.cmds", None)
+
+    if cmds_module is None or not hasattr(cmds_module, "_fake_scene"):
+        maya_module = types.ModuleType("maya")
+        cmds_module = types.ModuleType("maya.cmds")
+        maya_module.cmds = cmds_module
+
+        mtoa_module = types.ModuleType("mtoa")
+        mtoa_core = types.ModuleType("mtoa.core")
+        mtoa_aovs = types.ModuleType("mtoa.aovs")
+        mtoa_core.createOptions = lambda: None
+        mtoa_module.core = mtoa_core
+        mtoa_module.aovs = mtoa_aovs
+
+        sys.modules["maya"] = maya_module
+        sys.modules["maya.cmds"] = cmds_module
+        sys.modules["mtoa"] = mtoa_module
+        sys.modules["mtoa.core"] = mtoa_core
+        sys.modules["mtoa.aovs"] = mtoa_aovs
+
+    use_scene(scene)
+
+    return scene
+
+
+def install_api():
+    """
+    Install a fake maya.api.OpenMaya module reading the fake scene.
+    The OpenMaya calls aren't recorded as commands
+
+    :return:
+    """
+
+    if "maya.api.OpenMaya" in sys.modules:
+        return
+
+    api_module = types.ModuleType("maya.api")
+    open_maya = types.ModuleType("maya.api.OpenMaya")
+    api_module.OpenMaya = open_maya
+
+    open_maya.MFn = FakeMFn
+    open_maya.MFnNumericData = FakeMFnNumericData
+    open_maya.MFnNumericAttribute = FakeMFnNumericAttribute
+    open_maya.MFnDependencyNode = FakeMFnDependencyNode
+    open_maya.MItDependencyNodes = FakeMItDependencyNodes
+    open_maya.MSelectionList = FakeMSelectionList
+
+    sys.modules["maya"].api = api_module
+    sys.modules["maya.api"] = api_module
+    sys.modules["maya.api.OpenMaya"] = open_maya
+
+    return
+
+
+def use_scene(scene):
+    """
+    Point the fake maya.cmds module at a scene
+
+    :param scene: a FakeScene object
+    :return:
+    """
+
+    cmds_module = sys.modules["maya.cmds"]
+    cmds_module._fake_scene = scene
+
+    FakeAOVInterface.scene = scene
+    FakeMSelectionList.scene = scene
+    mtoa_aovs = sys.modules["mtoa.aovs"]
+    mtoa_aovs.AOVInterface = FakeAOVInterface
+    mtoa_aovs.TYPES = AOV_TYPES
+    mtoa_aovs.defaultFiltersByName = dict()
+    mtoa_aovs.refreshAliases = _recorded(scene, "refreshAliases",
+                                         lambda: None)
+    mtoa_aovs.getNodeTypesWithAOVs = _recorded(
+        scene, "getNodeTypesWithAOVs", _get_node_types_with_aovs(scene))
+    mtoa_aovs.getRegisteredAOVs = _recorded(
+        scene, "getRegisteredAOVs", _get_registered_aovs(scene))
+    fake_cmds = FakeCmds(scene)
+
+    for name in dir(FakeCmds):
+        if name.startswith("_"):
+            continue
+
+        setattr(cmds_module, name, _recorded(scene, name,
+                                             getattr(fake_cmds, name)))
+
+    return
+
+
+def _recorded(scene, name, command):
+    def wrapper(*args, **kwargs):
+        scene.calls.append(name)
+        return command(*args, **kwargs)
+
+    wrapper.__name__ = name
+
+    return wrapper
+
+
+def build_scene(layer_count,
+                aov_count,
+                overrides_per_layer=None,
+                members_per_layer=0):
+    """
+    Build a synthetic scene with render layers, aovs and layer overrides.
+    Render layer members are meshes added by transform on even layers and by
+    shape on odd layers
+
+    :param layer_count: the number of render layers as an int
+    :param aov_count: the number of aovs as an int
+    :param overrides_per_layer: number of aovs enabled per layer, defaults
+    to all of them
+    :param members_per_layer: number of meshes added to every layer, the
+    scene holds as many meshes as aovs
+    :return: the FakeScene object
+    """
+
+    scene = install()
+
+    # Large scenes are built without the undo queue copies
+    scene.undo_enabled = False
+
+    if overrides_per_layer is None:
+        overrides_per_layer = aov_count
+
+    aov_nodes = [scene.add_aov("aov%04d" % x) for x in range(aov_count)]
+
+    for layer_index in range(layer_count):
+        render_layer = scene.add_render_layer("layer%04d" % layer_index)
+
+        for offset in range(overrides_per_layer):
+            aov_node = aov_nodes[(layer_index + offset) % aov_count]
+            scene.add_override("%s.enabled" % aov_node, render_layer, True)
+
+    if not members_per_layer:
+        return scene
+
+    meshes = [scene.add_mesh("mesh%04d" % x) for x in range(aov_count)]
+
+    for layer_index in range(layer_count):
+        members = [meshes[(layer_index + x) % aov_count]
+                   for x in range(min(members_per_layer, aov_count))]
+
+        if layer_index % 2:
+            members = ["%sShape" % x for x in members]
+
+        scene.add_layer_members("layer%04d" % layer_index, members)
+
+    return scene
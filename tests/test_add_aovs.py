@@ -0,0 +1,147 @@
+import os
+import sys
+import unittest
+
+import fake_maya
+
+
+class AddAovsTests(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Build a scene with one existing aov and two layers
+
+        :return:
+        """
+
+        self.scene = fake_maya.install()
+
+        from aov_manager import shader_library, utils
+        self.utils = utils
+
+        self.scene.add_aov("Z")
+        self.scene.add_render_layer("layerA")
+        self.scene.add_render_layer("layerB")
+
+        shader_file = os.path.join(shader_library.SHADERS_FOLDER,
+                                   "AOV_AO.mb")
+
+        self.scene.files[shader_file] = [("surfaceShader", "AOV_AO_MAT")]
+
+        self.drop_list = [{"ui_Name": "Z", "aov_Name": "aiAOV_Z",
+                           "type": "<builtin>", "data": "float"},
+                          {"ui_Name": "AO", "aov_Name": "aiAOV_AO",
+                           "type": "<presets>", "data": None},
+                          {"ui_Name": "ID_A", "aov_Name": "aiAOV_ID_A",
+                           "type": "<attrId>", "data": None},
+                          {"ui_Name": "P", "aov_Name": "aiAOV_P",
+                           "type": "<builtin>", "data": "point"}]
+
+    def test_bulk_drop(self):
+        """
+        Check a multi aov drop creates the missing aovs and enables every aov
+        on the layer only
+
+        :return:
+        """
+
+        created_aovs = self.utils.add_aovs_to_render_layer(self.drop_list,
+                                                           "layerA")
+
+        self.assertEqual(created_aovs, ["aiAOV_AO", "aiAOV_ID_A", "aiAOV_P"])
+
+        # The aiAOV nodes are created in bulk and mtoa refreshed once
+        self.assertEqual(self.scene.call_count("addAOV"), 0)
+        self.assertEqual(self.scene.call_count("refreshAliases"), 1)
+        self.assertEqual(self.scene.call_count("file"), 1)
+        self.assertEqual(self.scene.call_count("editRenderLayerAdjustment"), 1)
+
+        self.assertIn(("AOV_AO_MAT.outColor", "aiAOV_AO.defaultValue"),
+                      self.scene.connections)
+
+        self.assertEqual(self.utils.get_layers_aovs(),
+                         {"layerA": ["beauty", "Z", "AO", "ID_A", "P"],
+                          "layerB": ["beauty"]})
+
+    def test_master_layer_drop(self):
+        """
+        Check dropping on the master layer creates disabled aovs without
+        layer overrides
+
+        :return:
+        """
+
+        self.utils.add_aovs_to_render_layer(self.drop_list, "masterLayer")
+
+        self.assertEqual(self.scene.call_count("editRenderLayerAdjustment"), 0)
+        self.assertEqual(self.utils.get_scene_aovs(),
+                         ["Z", "AO", "ID_A", "P"])
+        self.assertFalse(self.scene.values["aiAOV_P.enabled"])
+
+    def test_drop_keeps_current_layer(self):
+        """
+        Check aovs are set up from another layer without switching layers
+
+        :return:
+        """
+
+        self.scene.current_layer = "layerB"
+        self.scene.add_override("aiAOV_Z.enabled", "layerB", True)
+
+        self.utils.add_aovs_to_render_layer(self.drop_list, "layerA")
+
+        self.assertEqual(self.scene.current_layer, "layerB")
+
+        self.assertTrue(self.scene.layer_value("aiAOV_P.enabled", "layerA"))
+        self.assertFalse(self.scene.layer_value("aiAOV_P.enabled", "layerB"))
+        self.assertTrue(self.scene.read_plug("aiAOV_Z.enabled"))
+        self.assertFalse(self.scene.values["aiAOV_P.enabled"])
+
+        self.assertEqual(self.utils.get_layers_aovs(),
+                         {"layerA": ["beauty", "Z", "AO", "ID_A", "P"],
+                          "layerB": ["beauty", "Z"]})
+
+    def test_bulk_creation(self):
+        """
+        Check aovs created in bulk are wired like mtoa does, and aovs mtoa
+        has to set up are still created by mtoa
+
+        :return:
+        """
+
+        self.scene.reset_calls()
+
+        sys.modules["mtoa.aovs"].defaultFiltersByName = {"N": "closest"}
+
+        created_aovs = self.utils.create_new_aovs([("P", "point"),
+                                                   ("Z", "float"),
+                                                   ("direct_diffuse", None),
+                                                   ("N", "vector")])
+
+        self.assertEqual(created_aovs, ["aiAOV_P",
+                                        "aiAOV_direct_diffuse",
+                                        "aiAOV_N"])
+
+        self.assertEqual(self.scene.call_count("ls"), 1)
+        self.assertEqual(self.scene.call_count("addAOV"), 2)
+        self.assertEqual(self.scene.call_count("refreshAliases"), 1)
+
+        self.assertEqual(self.scene.values["aiAOV_P.name"], "P")
+        self.assertEqual(self.utils.cmds.getAttr("aiAOV_P.type",
+                                                 asString=True),
+                         "point")
+
+        for connection in [("defaultArnoldDriver.message",
+                            "aiAOV_P.outputs[0].driver"),
+                           ("defaultArnoldFilter.message",
+                            "aiAOV_P.outputs[0].filter"),
+                           ("aiAOV_P.message",
+                            "defaultArnoldRenderOptions.aovList[0]")]:
+            self.assertIn(connection, self.scene.connections)
+
+        for aov in created_aovs:
+            self.assertFalse(self.scene.values["%s.enabled" % aov])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,174 @@
+import unittest
+
+import fake_maya
+
+
+class AovAuditTests(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Build a scene with a live, an unused and an assigned shader network,
+        a duplicate and an orphan network and two stale adjustments
+
+        :return:
+        """
+
+        self.scene = fake_maya.install()
+
+        from aov_manager import aov_audit, utils
+        self.aov_audit = aov_audit
+
+        self.scene.add_render_layer("layerA")
+
+        self.scene.add_aov("AO")
+        self.scene.add_aov("ID_A")
+        self.scene.add_aov("Z", enabled=True)
+
+        self.scene.add_override("aiAOV_AO.enabled", "layerA", True)
+
+        utils.create_connect_aov_shader("AO")
+        utils.create_connect_aov_shader("ID_A")
+
+        self.add_network("AO", suffix="1")
+        self.add_network("MV")
+
+        # A network shading geometry is kept without its aov
+        self.add_network("P")
+        self.scene.add_mesh("sphere")
+        self.scene.connections.append(("sphereShape.instObjGroups[0]",
+                                       "AOV_P_SG.dagSetMembers[0]"))
+
+        # An adjustment without its plug and a master value left on the
+        # default layer
+        self.scene.adjustments["layerA"][5] = [None, False]
+        self.scene.adjustments[fake_maya.DEFAULT_LAYER][9] = ["aiAOV_Z.type",
+                                                              "rgb"]
+
+    def add_network(self, aov_name, suffix=""):
+        """
+        Add a tool shader network connected to no aov
+
+        :param aov_name: the aov name as a string
+        :param suffix: the suffix of renamed copies as a string
+        :return:
+        """
+
+        shader = self.scene.create_node("surfaceShader",
+                                        "AOV_%s_MAT%s" % (aov_name, suffix))
+        shading_group = self.scene.create_node("shadingEngine",
+                                               "AOV_%s_SG%s" % (aov_name,
+                                                                suffix))
+        user_data = self.scene.create_node("aiUserDataColor",
+                                           "userData_%s%s" % (aov_name,
+                                                              suffix))
+
+        self.scene.connections.append(("%s.outColor" % user_data,
+                                       "%s.outColor" % shader))
+        self.scene.connections.append(("%s.outColor" % shader,
+                                       "%s.surfaceShader" % shading_group))
+
+        return
+
+    def test_audit(self):
+        """
+        Check every problem is found with the nodes deleted to fix it
+
+        :return:
+        """
+
+        report = self.aov_audit.audit_scene()
+
+        self.assertTrue(report)
+
+        self.assertEqual(report.unused_aovs,
+                         {"aiAOV_ID_A": set(["AOV_ID_A_MAT", "AOV_ID_A_SG",
+                                             "userData_ID_A"])})
+        self.assertEqual(report.duplicate_networks,
+                         {"AO": set(["AOV_AO_MAT1", "AOV_AO_SG1",
+                                     "userData_AO1"])})
+        self.assertEqual(report.orphan_networks,
+                         {"MV": set(["AOV_MV_MAT", "AOV_MV_SG",
+                                     "userData_MV"])})
+        self.assertEqual(report.stale_adjustments,
+                         ["layerA.adjustments[5]",
+                          "defaultRenderLayer.adjustments[9]"])
+
+        savings = report.savings[self.aov_audit.UNUSED_AOVS]
+
+        self.assertEqual(savings["problems"], 1)
+        self.assertEqual(savings["nodes"], 4)
+        self.assertEqual(savings["connections"], 3)
+
+    def test_user_nodes(self):
+        """
+        Check nodes named like the tool networks are kept when they feed
+        nodes of the user
+
+        :return:
+        """
+
+        self.scene.create_node("aiUserDataColor", "userData_rimColor")
+        self.scene.create_node("lambert", "rimMtl")
+        self.scene.create_node("shadingEngine", "rimMtlSG")
+
+        self.scene.connections.append(("userData_rimColor.outColor",
+                                       "rimMtl.color"))
+        self.scene.connections.append(("rimMtl.outColor",
+                                       "rimMtlSG.surfaceShader"))
+
+        report = self.aov_audit.audit_scene()
+
+        self.assertNotIn("rimColor", report.orphan_networks)
+        self.assertNotIn("userData_rimColor", report.nodes())
+
+        self.aov_audit.fix_scene(report)
+
+        self.assertIn("userData_rimColor", self.scene.nodes)
+
+    def test_fix(self):
+        """
+        Check the fix deletes every node with one command in one undo chunk
+        and keeps the networks in use
+
+        :return:
+        """
+
+        report = self.aov_audit.audit_scene()
+
+        self.scene.reset_calls()
+        self.aov_audit.fix_scene(report)
+
+        self.assertEqual(self.scene.call_count("delete"), 1)
+        self.assertEqual(len(self.scene.undo_queue), 1)
+
+        for node in report.nodes():
+            self.assertNotIn(node, self.scene.nodes)
+
+        for node in ["aiAOV_AO", "AOV_AO_MAT", "AOV_AO_SG", "userData_AO",
+                     "aiAOV_Z", "AOV_P_MAT", "AOV_P_SG", "userData_P"]:
+            self.assertIn(node, self.scene.nodes)
+
+        self.assertNotIn(5, self.scene.adjustments["layerA"])
+        self.assertNotIn(9, self.scene.adjustments[fake_maya.DEFAULT_LAYER])
+
+        self.assertFalse(self.aov_audit.audit_scene())
+
+    def test_fix_categories(self):
+        """
+        Check only the given problem categories are fixed
+
+        :return:
+        """
+
+        report = self.aov_audit.audit_scene()
+
+        self.aov_audit.fix_scene(report, [self.aov_audit.ORPHAN_NETWORKS])
+
+        self.assertNotIn("AOV_MV_MAT", self.scene.nodes)
+        self.assertIn("AOV_AO_MAT1", self.scene.nodes)
+        self.assertIn("aiAOV_ID_A", self.scene.nodes)
+        self.assertIn(5, self.scene.adjustments["layerA"])
+
+
+if __name__ == "__main__":
+    unittest.main()
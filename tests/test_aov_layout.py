@@ -0,0 +1,126 @@
+import unittest
+
+import fake_maya
+
+
+class AovLayoutTests(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Build a scene with three aovs and two layers
+
+        :return:
+        """
+
+        self.scene = fake_maya.install()
+
+        from aov_manager import aov_layout, scene_snapshot
+        self.aov_layout = aov_layout
+        self.scene_snapshot = scene_snapshot
+
+        self.scene.add_render_layer("layerA")
+        self.scene.add_render_layer("layerB")
+
+        self.scene.add_aov("Z")
+        self.scene.add_aov("P")
+        self.scene.add_aov("N", enabled=True)
+
+        self.scene.create_node("surfaceShader", "zShader")
+        self.scene.connections.append(("zShader.outColor",
+                                       "aiAOV_Z.defaultValue"))
+
+        self.scene.add_override("aiAOV_Z.enabled", "layerA", True)
+        self.scene.add_override("aiAOV_P.enabled", "layerB", True)
+
+    def test_export(self):
+        """
+        Check the exported layout holds the layer x aov matrix and the aov
+        shaders
+
+        :return:
+        """
+
+        layout = self.aov_layout.export_layout()
+
+        self.assertEqual(layout["layers"], {"masterLayer": ["N"],
+                                            "layerA": ["Z", "N"],
+                                            "layerB": ["P", "N"]})
+
+        self.assertEqual(layout["aovs"]["Z"]["shader"], "zShader")
+        self.assertEqual(layout["aovs"]["Z"]["type"], "<builtin>")
+
+    def test_identical_layout(self):
+        """
+        Check applying the scene layout costs a single snapshot read
+
+        :return:
+        """
+
+        layout = self.aov_layout.export_layout()
+
+        self.scene.reset_calls()
+        self.scene_snapshot.SceneSnapshot.read()
+        snapshot_calls = self.scene.call_count()
+
+        self.scene.reset_calls()
+        diff = self.aov_layout.apply_layout(layout)
+
+        self.assertFalse(diff)
+        self.assertEqual(self.scene.call_count(), snapshot_calls)
+
+    def test_apply(self):
+        """
+        Check applying a layout creates, deletes and overrides only what
+        differs
+
+        :return:
+        """
+
+        layout = {"version": 1,
+                  "aovs": {"Z": {"type": "<builtin>", "data": "float"},
+                           "N": {"type": "<builtin>", "data": "vector"},
+                           "AO": {"type": "<presets>", "data": "rgb"}},
+                  "layers": {"masterLayer": [],
+                             "layerA": ["Z", "AO"],
+                             "layerB": ["N"],
+                             "layerC": ["Z"]}}
+
+        diff = self.aov_layout.apply_layout(layout, delete_aovs=True)
+
+        self.assertEqual([x["ui_Name"] for x in diff.created_aovs], ["AO"])
+        self.assertEqual(diff.deleted_aovs, ["aiAOV_P"])
+        self.assertEqual(diff.missing_layers, ["layerC"])
+        self.assertEqual(diff.master_values, {"aiAOV_N.enabled": False})
+
+        self.assertNotIn("aiAOV_P", self.scene.nodes)
+
+        self.assertEqual(self.aov_layout.export_layout()["layers"],
+                         {"masterLayer": [],
+                          "layerA": ["Z", "AO"],
+                          "layerB": ["N"]})
+
+        self.scene.reset_calls()
+
+        self.assertFalse(self.aov_layout.apply_layout(layout))
+        self.assertEqual(self.scene.call_count("setAttr"), 0)
+
+    def test_keep_aovs(self):
+        """
+        Check the scene aovs missing in the layout are only deleted when asked
+
+        :return:
+        """
+
+        layout = {"version": 1,
+                  "aovs": {"Z": {"type": "<builtin>", "data": "float"}},
+                  "layers": {"layerA": ["Z"]}}
+
+        diff = self.aov_layout.apply_layout(layout)
+
+        self.assertEqual(diff.deleted_aovs, [])
+        self.assertIn("aiAOV_P", self.scene.nodes)
+        self.assertIn("aiAOV_N", self.scene.nodes)
+
+
+if __name__ == "__main__":
+    unittest.main()
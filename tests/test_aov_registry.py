@@ -0,0 +1,136 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import fake_maya
+
+
+class AovRegistryCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Create a registry cache writing to a temporary folder
+
+        :return:
+        """
+
+        self.scene = fake_maya.install()
+
+        from aov_manager import aov_registry
+        self.aov_registry = aov_registry
+
+        self.cache_folder = tempfile.mkdtemp()
+        self.cache_file = os.path.join(self.cache_folder, "aov_registry.json")
+
+        self.cache = aov_registry.AovRegistryCache(cache_file=self.cache_file)
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_folder)
+
+    def test_registry_walk(self):
+        """
+        Check the cached aovs match the mtoa registry and the registry is
+        walked once
+
+        :return:
+        """
+
+        grouped_aovs = self.cache.grouped_aovs()
+
+        self.assertEqual(grouped_aovs["aiSkin"],
+                         [{"ui_Name": "sss",
+                           "aov_Name": "aiAOV_sss",
+                           "type": "aiSkin"}])
+        self.assertEqual(len(grouped_aovs["aiStandard"]), 2)
+
+        self.cache.grouped_aovs()
+
+        self.assertEqual(self.scene.call_count("getRegisteredAOVs"), 2)
+
+    def test_cache_file(self):
+        """
+        Check a new session reads the registry from the cache file unless the
+        loaded plugins changed
+
+        :return:
+        """
+
+        self.cache.grouped_aovs()
+        self.scene.reset_calls()
+
+        new_session = self.aov_registry.AovRegistryCache(
+            cache_file=self.cache_file)
+
+        self.assertEqual(sorted(new_session.grouped_aovs()),
+                         ["aiSkin", "aiStandard"])
+        self.assertEqual(self.scene.call_count("getNodeTypesWithAOVs"), 0)
+
+        self.scene.plugins["myShaders"] = "1.0"
+
+        new_session = self.aov_registry.AovRegistryCache(
+            cache_file=self.cache_file)
+        new_session.grouped_aovs()
+
+        self.assertEqual(self.scene.call_count("getNodeTypesWithAOVs"), 1)
+
+    def test_watched_cache(self):
+        """
+        Check a watched cache is served without any maya call until a plugin
+        is loaded
+
+        :return:
+        """
+
+        registry = fake_maya.FakeCallbackRegistry()
+
+        self.cache.watch(registry=registry)
+        self.cache.grouped_aovs()
+        self.scene.reset_calls()
+
+        self.cache.grouped_aovs()
+
+        self.assertEqual(self.scene.call_count(), 0)
+
+        self.scene.registered_aovs["myShader"] = ["custom"]
+        self.scene.plugins["myShaders"] = "1.0"
+        registry.emit_plugin_loaded("myShaders")
+
+        self.assertIn("myShader", self.cache.grouped_aovs())
+
+        self.cache.unwatch()
+
+        self.assertEqual(registry.callbacks, {})
+
+    def test_reload(self):
+        """
+        Check reloading the module removes the callbacks of the shared cache
+
+        :return:
+        """
+
+        registry = fake_maya.FakeCallbackRegistry()
+
+        self.aov_registry.get_registry().watch(registry=registry)
+
+        reload(self.aov_registry)
+
+        self.assertEqual(registry.callbacks, {})
+        self.assertFalse(self.aov_registry.get_registry().is_watching())
+
+    def test_force_rebuild(self):
+        """
+        Check a forced rebuild walks the registry again
+
+        :return:
+        """
+
+        self.cache.grouped_aovs()
+        self.scene.registered_aovs["aiHair"] = ["hair"]
+
+        self.assertNotIn("aiHair", self.cache.grouped_aovs())
+        self.assertIn("aiHair", self.cache.grouped_aovs(force_rebuild=True))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,252 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import fake_maya
+
+
+SCENE_FILES = {"shot_010.mb": ["layerA", "layerB"],
+               "shot_020.mb": ["layerA", "layerB"],
+               "shot_030.mb": ["layerA"],
+               "crash.mb": ["layerA", "layerB"]}
+
+ASSIGNMENT = {"layers": {"layerA": ["Z", "AO"],
+                         "layerB": ["P"]}}
+
+
+def install_fake_maya():
+    """
+    Worker initializer installing the fake maya with the test scene files
+
+    :return:
+    """
+
+    scene = fake_maya.install()
+    scene.scene_files.update(SCENE_FILES)
+
+    return
+
+
+def install_crashing_fake_maya():
+    """
+    Worker initializer installing the fake maya, the worker process dies
+    without returning a result when it opens the crash scene file
+
+    :return:
+    """
+
+    install_fake_maya()
+
+    batch = sys.modules["aov_manager.batch"]
+    process_scene = batch.process_scene
+
+    def crashing_process_scene(scene_file, *args):
+        if scene_file == "crash.mb":
+            os._exit(1)
+
+        return process_scene(scene_file, *args)
+
+    batch.process_scene = crashing_process_scene
+
+    return
+
+
+class BatchTests(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Create a temporary folder for the results file
+
+        :return:
+        """
+
+        fake_maya.install()
+
+        from aov_manager import batch
+        self.batch = batch
+
+        self.results_folder = tempfile.mkdtemp()
+        self.results_file = os.path.join(self.results_folder, "results.jsonl")
+
+        self.scenes = ["shot_010.mb", "missing.mb", "shot_020.mb"]
+
+    def tearDown(self):
+        shutil.rmtree(self.results_folder)
+
+    def read_results(self):
+        return [json.loads(x) for x in self.read_results_lines()]
+
+    def read_results_lines(self):
+        with open(self.results_file) as f:
+            return f.read().splitlines()
+
+    def test_single_process(self):
+        """
+        Check every scene is processed, saved and reported in the results file
+
+        :return:
+        """
+
+        results = self.batch.run_batch(self.scenes,
+                                       ASSIGNMENT,
+                                       self.results_file,
+                                       initializer=install_fake_maya)
+
+        self.assertEqual(self.read_results(), results)
+
+        statuses = dict((x["scene"], x["status"]) for x in results)
+
+        self.assertEqual(statuses, {"shot_010.mb": "ok",
+                                    "missing.mb": "error",
+                                    "shot_020.mb": "ok"})
+
+        self.assertEqual(results[0]["created_aovs"],
+                         ["aiAOV_Z", "aiAOV_AO", "aiAOV_P"])
+
+        scene = sys.modules["maya.cmds"]._fake_scene
+
+        self.assertEqual(scene.saved_files, ["shot_010.mb", "shot_020.mb"])
+        self.assertEqual(scene.layer_value("aiAOV_P.enabled", "layerB"), True)
+        self.assertEqual(scene.layer_value("aiAOV_P.enabled", "layerA"), False)
+
+    def test_resume(self):
+        """
+        Check a resumed run skips the scenes done before the crash
+
+        :return:
+        """
+
+        with open(self.results_file, "w") as f:
+            f.write(json.dumps({"scene": "shot_010.mb", "status": "ok"}) + "\n")
+            f.write('{"scene": "shot_020.mb", "sta')
+
+        results = self.batch.run_batch(self.scenes,
+                                       ASSIGNMENT,
+                                       self.results_file,
+                                       resume=True,
+                                       initializer=install_fake_maya)
+
+        self.assertEqual([x["scene"] for x in results],
+                         ["missing.mb", "shot_020.mb"])
+
+        self.assertEqual(len(self.read_results_lines()), 4)
+        self.assertEqual(self.batch.read_finished_scenes(self.results_file),
+                         set(["shot_010.mb", "shot_020.mb"]))
+
+    def test_layout_assignment(self):
+        """
+        Check a scene can be made to match an aov layout
+
+        :return:
+        """
+
+        layout = {"version": 1,
+                  "aovs": {"Z": {"type": "<builtin>", "data": "float"}},
+                  "layers": {"masterLayer": [], "layerB": ["Z"]}}
+
+        results = self.batch.run_batch(["shot_010.mb"],
+                                       layout,
+                                       self.results_file,
+                                       initializer=install_fake_maya)
+
+        self.assertEqual(results[0]["created_aovs"], ["aiAOV_Z"])
+
+        scene = sys.modules["maya.cmds"]._fake_scene
+
+        self.assertEqual(scene.layer_value("aiAOV_Z.enabled", "layerB"), True)
+
+    def test_layout_deleted_aovs(self):
+        """
+        Check the scene aovs missing in a layout are only deleted when asked
+        and the deleted aovs and missing layers are reported
+
+        :return:
+        """
+
+        scene = fake_maya.install()
+        scene.add_render_layer("layerB")
+        scene.add_aov("P")
+
+        layout = {"version": 1,
+                  "aovs": {"Z": {"type": "<builtin>", "data": "float"}},
+                  "layers": {"layerB": ["Z"], "layerC": ["Z"]}}
+
+        result = self.batch.apply_assignment(layout)
+
+        self.assertEqual(result, {"created_aovs": ["aiAOV_Z"],
+                                  "deleted_aovs": [],
+                                  "missing_layers": ["layerC"]})
+        self.assertIn("aiAOV_P", scene.nodes)
+
+        result = self.batch.apply_assignment(layout, delete_aovs=True)
+
+        self.assertEqual(result["deleted_aovs"], ["aiAOV_P"])
+        self.assertNotIn("aiAOV_P", scene.nodes)
+
+    def test_missing_layers(self):
+        """
+        Check the assignment layers missing in a scene are reported with a
+        warning
+
+        :return:
+        """
+
+        results = self.batch.run_batch(["shot_030.mb"],
+                                       ASSIGNMENT,
+                                       self.results_file,
+                                       initializer=install_fake_maya)
+
+        self.assertEqual(results[0]["status"], "warning")
+        self.assertEqual(results[0]["missing_layers"], ["layerB"])
+        self.assertEqual(results[0]["created_aovs"], ["aiAOV_Z", "aiAOV_AO"])
+
+        self.assertEqual(self.batch.read_finished_scenes(self.results_file),
+                         set(["shot_030.mb"]))
+
+    def test_worker_crash(self):
+        """
+        Check a worker process crashing is reported as a failed scene instead
+        of hanging the batch
+
+        :return:
+        """
+
+        results = self.batch.run_batch(["shot_010.mb", "crash.mb",
+                                        "shot_020.mb"],
+                                       ASSIGNMENT,
+                                       self.results_file,
+                                       workers=2,
+                                       timeout=2,
+                                       scenes_per_worker=1,
+                                       initializer=install_crashing_fake_maya)
+
+        statuses = dict((x["scene"], x["status"]) for x in results)
+
+        self.assertEqual(statuses, {"shot_010.mb": "ok",
+                                    "crash.mb": "error",
+                                    "shot_020.mb": "ok"})
+        self.assertTrue(results[1]["error"].startswith("TimeoutError"))
+
+    def test_worker_pool(self):
+        """
+        Check scenes spread across worker processes are all reported
+
+        :return:
+        """
+
+        results = self.batch.run_batch(self.scenes,
+                                       ASSIGNMENT,
+                                       self.results_file,
+                                       workers=2,
+                                       initializer=install_fake_maya)
+
+        self.assertEqual(sorted(x["scene"] for x in self.read_results()),
+                         sorted(self.scenes))
+        self.assertEqual(len([x for x in results if x["status"] == "ok"]), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+
+import benchmarks
+import fake_maya
+
+
+class BenchmarkTests(unittest.TestCase):
+
+    def test_call_counts(self):
+        """
+        Check no benchmark issues more maya calls than its legacy version on
+        a small scene
+
+        :return:
+        """
+
+        results = benchmarks.run(benchmarks.BENCHMARKS, sizes=[10])
+
+        self.assertEqual(len(results), len(benchmarks.BENCHMARKS) *
+                         len(benchmarks.SCENE_BACKENDS))
+
+        for result in results:
+            self.assertEqual(sum(result["commands"].values()),
+                             result["calls"])
+
+            if "legacy_calls" in result:
+                self.assertLessEqual(result["calls"], result["legacy_calls"],
+                                     result["benchmark"])
+
+    def test_api_backend(self):
+        """
+        Check the api backend reads the layer aovs without command strings
+
+        :return:
+        """
+
+        results = benchmarks.run(benchmarks.BENCHMARKS[:1], sizes=[10])
+
+        calls = dict((x["backend"], x["commands"]) for x in results)
+
+        self.assertNotIn("listConnections", calls["api"])
+        self.assertNotIn("getAttr", calls["api"])
+        self.assertLess(sum(calls["api"].values()),
+                        sum(calls["cmds"].values()))
+
+    def test_render_layer_members(self):
+        """
+        Check the fake scene resolves render layer members to dag paths
+
+        :return:
+        """
+
+        scene = fake_maya.build_scene(2, 4, members_per_layer=2)
+
+        from aov_manager import utils
+
+        self.assertEqual(utils.get_render_layer_objects("layer0000"),
+                         ["|mesh0000", "|mesh0001"])
+        self.assertEqual(sorted(utils.get_render_layer_objects("layer0001")),
+                         ["|mesh0001", "|mesh0002"])
+
+        scene.add_render_layer("emptyLayer")
+
+        self.assertFalse(utils.get_render_layer_objects("emptyLayer"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+import unittest
+
+import fake_maya
+
+
+ATTRIBUTE = "mtoa_constant_ID_A"
+
+
+class IdAssignmentTests(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Build a layer with two visible meshes of one asset and a hidden mesh
+
+        :return:
+        """
+
+        self.scene = fake_maya.install()
+
+        from aov_manager import id_assignment
+        self.id_assignment = id_assignment
+
+
+        self.scene.add_render_layer("layerA")
+
+        self.scene.add_mesh("char01:body")
+        self.scene.add_mesh("char01:head")
+        self.scene.add_mesh("rock")
+
+        self.scene.values["rockShape.primaryVisibility"] = False
+
+        self.scene.add_layer_members("layerA", ["char01:body",
+                                                "char01:head",
+                                                "rock"])
+
+        self.assigner = id_assignment.IdAssigner("ID_A")
+
+    def test_id_color(self):
+        """
+        Check id colours are stable and bright
+
+        :return:
+        """
+
+        color = self.id_assignment.id_color("char01:body")
+
+        self.assertEqual(color, self.id_assignment.id_color(u"char01:body"))
+        self.assertNotEqual(color, self.id_assignment.id_color("char01:head"))
+        self.assertGreaterEqual(max(color), 0.65)
+
+    def test_assign(self):
+        """
+        Check the visible shapes get their id colour
+
+        :return:
+        """
+
+        written_shapes = self.assigner.assign_render_layer("layerA")
+
+        self.assertEqual(written_shapes, ["|char01:body|char01:bodyShape",
+                                          "|char01:head|char01:headShape"])
+
+        self.assertEqual(self.scene.values["char01:bodyShape.%s" % ATTRIBUTE],
+                         self.id_assignment.id_color("char01:body"))
+        self.assertNotIn("rockShape.%s" % ATTRIBUTE, self.scene.values)
+
+        # The attribute is added to every shape at once
+        self.assertEqual(self.scene.call_count("addAttr"), 4)
+
+    def test_asset_key(self):
+        """
+        Check the shapes of an asset share their colour
+
+        :return:
+        """
+
+        assigner = self.id_assignment.IdAssigner(
+            "ID_A", key=self.id_assignment.KEY_ASSET)
+        assigner.assign_render_layer("layerA")
+
+        self.assertEqual(self.scene.values["char01:bodyShape.%s" % ATTRIBUTE],
+                         self.scene.values["char01:headShape.%s" % ATTRIBUTE])
+
+    def test_fingerprints(self):
+        """
+        Check a second run only writes the shapes which changed
+
+        :return:
+        """
+
+        self.assigner.assign_render_layer("layerA")
+        self.scene.reset_calls()
+
+        self.assertEqual(self.assigner.assign_render_layer("layerA"), [])
+        self.assertEqual(self.scene.call_count("setAttr"), 0)
+
+        self.scene.values["rockShape.primaryVisibility"] = True
+
+        self.assertEqual(self.assigner.assign_render_layer("layerA"),
+                         ["|rock|rockShape"])
+
+        self.assertEqual(len(self.assigner.assign_render_layer("layerA",
+                                                               force=True)),
+                         3)
+
+
+if __name__ == "__main__":
+    unittest.main()
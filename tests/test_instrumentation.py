@@ -0,0 +1,175 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import fake_maya
+
+
+class InstrumentationTests(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Build a scene with two layers and an instrumentation with a fake
+        timer moving one second per call
+
+        :return:
+        """
+
+        self.scene = fake_maya.build_scene(2, 4, overrides_per_layer=2)
+
+        from aov_manager import instrumentation, utils
+        self.instrumentation_module = instrumentation
+        self.utils = utils
+
+        self.time = [0.0]
+
+        def timer():
+            self.time[0] += 1.0
+            return self.time[0]
+
+        self.instrumentation = instrumentation.Instrumentation(timer=timer)
+
+        self.export_folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        self.instrumentation.disable()
+        shutil.rmtree(self.export_folder)
+
+    def test_disabled(self):
+        """
+        Check nothing is recorded and the maya.cmds module is used while
+        disabled
+
+        :return:
+        """
+
+        with self.instrumentation.operation("refresh"):
+            self.utils.get_layers_aovs()
+
+        self.assertIs(self.utils.cmds, sys.modules["maya.cmds"])
+        self.assertEqual(self.instrumentation.stats, {})
+        self.assertEqual(self.instrumentation.events, [])
+
+    def test_operation_stats(self):
+        """
+        Check the commands are counted and timed under their operation
+
+        :return:
+        """
+
+        self.instrumentation.enable()
+
+        with self.instrumentation.operation("refresh"):
+            self.utils.get_layers_aovs()
+
+        self.utils.get_scene_aovs()
+
+        self.instrumentation.disable()
+
+        self.assertIs(self.utils.cmds, sys.modules["maya.cmds"])
+
+        stats = self.instrumentation.stats
+
+        self.assertEqual(stats[("refresh", "ls")], [2, 2.0])
+        self.assertEqual(stats[("<none>", "ls")], [1, 1.0])
+
+        recorded_calls = sum(x[0] for x in stats.values())
+        self.assertEqual(recorded_calls, self.scene.call_count())
+
+        summary = self.instrumentation.summary()
+        self.assertEqual(sum(x["count"] for x in summary), recorded_calls)
+
+    def test_audit_stats(self):
+        """
+        Check the scene audit commands are recorded
+
+        :return:
+        """
+
+        from aov_manager import aov_audit
+
+        self.instrumentation.enable()
+
+        self.assertIsInstance(aov_audit.cmds,
+                              self.instrumentation_module.InstrumentedCmds)
+
+        self.scene.reset_calls()
+
+        with self.instrumentation.operation("audit"):
+            aov_audit.audit_scene()
+
+        self.instrumentation.disable()
+
+        self.assertIs(aov_audit.cmds, sys.modules["maya.cmds"])
+
+        recorded_calls = sum(x[0] for x in self.instrumentation.stats.values())
+        self.assertEqual(recorded_calls, self.scene.call_count())
+
+    def test_api_backend_stats(self):
+        """
+        Check the api backend reads are recorded by the shared
+        instrumentation
+
+        :return:
+        """
+
+        fake_maya.install_api()
+
+        from aov_manager import scene_backend, scene_snapshot
+
+        scene_backend.set_backend(scene_backend.BACKEND_API)
+        shared = self.instrumentation_module.get_instrumentation()
+
+        try:
+            shared.reset()
+            shared.enable()
+
+            with shared.operation("refresh"):
+                scene_snapshot.SceneSnapshot.read()
+        finally:
+            shared.disable()
+            scene_backend.set_backend(scene_backend.BACKEND_CMDS)
+
+        stats = shared.stats
+        shared.reset()
+
+        self.assertEqual(stats[("refresh", "api.nodes_of_type")][0], 2)
+        self.assertEqual(stats[("refresh", "api.get_values")][0], 1)
+        self.assertEqual(stats[("refresh", "api.layer_adjustments")][0], 3)
+
+    def test_exports(self):
+        """
+        Check the json and chrome trace exports
+
+        :return:
+        """
+
+        self.instrumentation.enable()
+
+        with self.instrumentation.operation("refresh"):
+            self.utils.get_scene_aovs()
+
+        json_file = os.path.join(self.export_folder, "stats.json")
+        trace_file = os.path.join(self.export_folder, "trace.json")
+
+        self.instrumentation.write_json(json_file)
+        self.instrumentation.write_chrome_trace(trace_file)
+
+        with open(json_file) as f:
+            self.assertEqual(json.load(f)[0]["operation"], "refresh")
+
+        with open(trace_file) as f:
+            trace_events = json.load(f)["traceEvents"]
+
+        self.assertEqual(trace_events[-1]["name"], "refresh")
+        self.assertEqual(trace_events[-1]["cat"], "operation")
+        self.assertEqual(trace_events[0]["ts"], 1e6)
+        self.assertEqual(trace_events[0]["dur"], 1e6)
+        self.assertEqual(set(x["ph"] for x in trace_events), set(["X"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
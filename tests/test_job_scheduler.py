@@ -0,0 +1,161 @@
+import unittest
+
+import fake_maya
+from aov_manager import job_scheduler
+
+
+class FakeTimer(object):
+    """
+    Class standing in for the scheduler timer, time only moves when told to
+    """
+    def __init__(self):
+        self.time = 0.0
+
+    def __call__(self):
+        return self.time
+
+
+class JobSchedulerTests(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Create a scheduler on a fake timer and a fake event loop
+
+        :return:
+        """
+
+        self.timer = FakeTimer()
+        self.event_loop = fake_maya.FakeScheduler()
+
+        self.scheduler = job_scheduler.JobScheduler(scheduler=self.event_loop,
+                                                    timer=self.timer,
+                                                    budget=0.008)
+
+        self.rows = []
+        self.progress = []
+        self.finished = []
+
+    def make_job(self, row_count, step_time=0.003):
+        """
+        Make a job adding rows, every step takes some time
+
+        :param row_count: the number of rows as an int
+        :param step_time: the time taken by every step in seconds
+        :return: a Job object
+        """
+
+        def add_rows(job):
+            job.total = row_count
+
+            for row in range(row_count):
+                self.timer.time += step_time
+                self.rows.append(row)
+                yield
+
+        return job_scheduler.Job("rows",
+                                 add_rows,
+                                 on_progress=self.progress.append,
+                                 on_finished=self.finished.append)
+
+    def test_slices(self):
+        """
+        Check steps run in slices of the time budget, with the progress
+        reported between slices
+
+        :return:
+        """
+
+        job = self.scheduler.submit(self.make_job(7))
+
+        # Nothing runs before maya is idle
+        self.assertEqual(self.rows, [])
+
+        self.event_loop.run_pending()
+
+        self.assertEqual(self.rows, [0, 1, 2])
+        self.assertEqual(job.progress(), 3 / 7.0)
+        self.assertEqual(self.progress, [job])
+
+        while self.event_loop.pending:
+            self.event_loop.run_pending()
+
+        self.assertEqual(self.rows, range(7))
+        self.assertEqual(job.state, job_scheduler.FINISHED)
+        self.assertEqual(self.finished, [job])
+        self.assertFalse(self.scheduler.is_busy())
+
+    def test_long_step(self):
+        """
+        Check a step longer than the budget still makes progress
+
+        :return:
+        """
+
+        self.scheduler.submit(self.make_job(2, step_time=0.5))
+
+        self.event_loop.run_pending()
+        self.assertEqual(self.rows, [0])
+
+        self.event_loop.run_pending()
+        self.assertEqual(self.rows, [0, 1])
+
+    def test_cancel(self):
+        """
+        Check a cancelled job runs no more steps and the next job starts
+
+        :return:
+        """
+
+        first_job = self.scheduler.submit(self.make_job(10))
+        second_job = self.scheduler.submit(self.make_job(1))
+
+        self.event_loop.run_pending()
+        self.scheduler.cancel(first_job)
+
+        while self.event_loop.pending:
+            self.event_loop.run_pending()
+
+        self.assertEqual(self.rows, [0, 1, 2, 0])
+        self.assertEqual(first_job.state, job_scheduler.CANCELLED)
+        self.assertEqual(second_job.state, job_scheduler.FINISHED)
+        self.assertEqual(self.finished, [first_job, second_job])
+
+    def test_failed_step(self):
+        """
+        Check a failing step stops its job and the error is raised
+
+        :return:
+        """
+
+        def failing_steps(job):
+            yield
+            raise ValueError()
+
+        job = self.scheduler.submit(job_scheduler.Job("fail", failing_steps))
+        self.scheduler.submit(self.make_job(1))
+
+        self.assertRaises(ValueError, self.event_loop.run_pending)
+
+        self.assertEqual(job.state, job_scheduler.FAILED)
+        self.assertTrue(self.scheduler.is_busy())
+
+        self.event_loop.run_pending()
+
+        self.assertEqual(self.rows, [0])
+
+    def test_run_all(self):
+        """
+        Check jobs can run at once without an event loop
+
+        :return:
+        """
+
+        self.scheduler.submit(self.make_job(5))
+        self.scheduler.run_all()
+
+        self.assertEqual(self.rows, range(5))
+        self.assertFalse(self.scheduler.is_busy())
+
+
+if __name__ == "__main__":
+    unittest.main()
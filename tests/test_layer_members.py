@@ -0,0 +1,83 @@
+import unittest
+
+import fake_maya
+
+
+class LayerMembershipResolverTests(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Build a layer holding transforms, shapes of the same meshes and a
+        nested mesh
+
+        :return:
+        """
+
+        self.scene = fake_maya.install()
+
+        from aov_manager import layer_members
+        self.layer_members = layer_members
+
+        self.scene.add_render_layer("layerA")
+        self.scene.add_render_layer("layerB")
+
+        self.scene.add_mesh("group1")
+        self.scene.add_mesh("rock", parent="group1")
+        self.scene.add_mesh("tree")
+
+        self.scene.add_layer_members("layerA", ["treeShape",
+                                                "rock",
+                                                "tree",
+                                                "rockShape",
+                                                "group1"])
+
+        self.resolver = layer_members.LayerMembershipResolver()
+
+    def test_resolve(self):
+        """
+        Check the transforms are resolved in member order, once each, with
+        two maya calls
+
+        :return:
+        """
+
+        self.scene.reset_calls()
+
+        self.assertEqual(self.resolver.layer_objects("layerA"),
+                         ["|tree", "|group1|rock", "|group1"])
+        self.assertEqual(self.scene.call_count(), 2)
+
+        self.assertEqual(self.resolver.layer_objects("layerB"), [])
+
+    def test_watched_cache(self):
+        """
+        Check watched layers are resolved once until their members change
+
+        :return:
+        """
+
+        registry = fake_maya.FakeCallbackRegistry()
+
+        self.resolver.watch(registry=registry)
+        self.resolver.layer_objects("layerA")
+        self.resolver.layer_objects("layerB")
+
+        self.scene.reset_calls()
+
+        self.resolver.layer_objects("layerA")
+
+        self.assertEqual(self.scene.call_count(), 0)
+
+        self.scene.add_layer_members("layerB", ["tree"])
+        registry.emit_attribute_changed("layerB", "renderInfo")
+
+        self.assertEqual(self.resolver.layer_objects("layerB"), ["|tree"])
+        self.assertEqual(self.scene.call_count(), 2)
+
+        self.resolver.unwatch()
+
+        self.assertEqual(registry.callbacks, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,224 @@
+import unittest
+
+import fake_maya
+
+
+class LayerOverridesTests(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Build a scene with three layers and two disabled aovs
+
+        :return:
+        """
+
+        self.scene = fake_maya.install()
+
+        from aov_manager import scene_snapshot, utils
+        self.utils = utils
+        self.scene_snapshot = scene_snapshot
+
+        for aov in ["AO", "Z"]:
+            self.scene.add_aov(aov)
+
+        for render_layer in ["layerA", "layerB", "layerC"]:
+            self.scene.add_render_layer(render_layer)
+
+        self.scene.add_override("aiAOV_Z.enabled", "layerB", True)
+
+    def test_enable_single_layer(self):
+        """
+        Check enabling an aov on one layer only adds one adjustment
+
+        :return:
+        """
+
+        snapshot = self.utils.get_scene_snapshot()
+        self.scene.reset_calls()
+
+        self.utils.set_layer_overrides("aiAOV_AO.enabled", {"layerA": True},
+                                       snapshot=snapshot)
+
+        self.assertEqual(self.scene.call_count("editRenderLayerAdjustment"), 1)
+        self.assertEqual(self.scene.call_count("setAttr"), 2)
+
+        self.assertTrue(self.scene.layer_value("aiAOV_AO.enabled", "layerA"))
+        self.assertFalse(self.scene.layer_value("aiAOV_AO.enabled", "layerB"))
+        self.assertFalse(self.scene.values["aiAOV_AO.enabled"])
+
+    def test_unchanged_overrides(self):
+        """
+        Check existing overrides matching the request issue no edits
+
+        :return:
+        """
+
+        snapshot = self.utils.get_scene_snapshot()
+        self.scene.reset_calls()
+
+        self.utils.set_layer_overrides("aiAOV_Z.enabled", {"layerB": True},
+                                       snapshot=snapshot)
+
+        self.assertEqual(self.scene.call_count(), 0)
+
+    def test_disable_removes_adjustment(self):
+        """
+        Check setting a layer back to the master value removes the override
+
+        :return:
+        """
+
+        self.utils.set_layer_overrides("aiAOV_Z.enabled", {"layerB": False})
+
+        self.assertFalse(
+            self.utils.gather_attribute_override_data("aiAOV_Z.enabled"))
+
+    def test_batched_overrides(self):
+        """
+        Check many attributes are written with one adjustment command per
+        layer and the snapshot is kept up to date
+
+        :return:
+        """
+
+        snapshot = self.utils.get_scene_snapshot()
+        self.scene.reset_calls()
+
+        self.utils.set_layers_overrides(
+            [("aiAOV_AO.enabled", {"layerA": True, "layerC": True}),
+             ("aiAOV_Z.enabled", {"layerA": True, "layerC": True})],
+            snapshot=snapshot)
+
+        self.assertEqual(self.scene.call_count("editRenderLayerAdjustment"), 2)
+
+        expected = {"layerA": ["beauty", "AO", "Z"],
+                    "layerB": ["beauty", "Z"],
+                    "layerC": ["beauty", "AO", "Z"]}
+
+        self.assertEqual(snapshot.layer_aovs(), expected)
+        self.assertEqual(self.utils.get_layers_aovs(), expected)
+
+    def test_current_layer_override(self):
+        """
+        Check overrides on the current layer keep the master value
+
+        :return:
+        """
+
+        self.scene.current_layer = "layerA"
+
+        self.utils.set_layers_overrides(
+            [("aiAOV_AO.enabled", {"layerA": True, "layerB": True})])
+
+        self.assertTrue(self.scene.read_plug("aiAOV_AO.enabled"))
+        self.assertTrue(self.scene.layer_value("aiAOV_AO.enabled", "layerB"))
+        self.assertFalse(self.scene.values["aiAOV_AO.enabled"])
+
+    def test_master_layer_values(self):
+        """
+        Check master values are resolved from a non default layer without
+        editing the scene
+
+        :return:
+        """
+
+        self.scene.add_override("aiAOV_AO.enabled", "layerB", False)
+        self.scene.values["aiAOV_AO.enabled"] = True
+        self.scene.current_layer = "layerB"
+        self.scene.reset_calls()
+
+        master_values = self.utils.get_master_layer_values(["aiAOV_AO",
+                                                            "aiAOV_Z"])
+
+        self.assertEqual(master_values, {"aiAOV_AO": True, "aiAOV_Z": False})
+
+        self.assertEqual(self.scene.call_count("setAttr"), 0)
+        self.assertEqual(self.scene.call_count("editRenderLayerAdjustment"), 0)
+
+    def test_disable_for_all_layers(self):
+        """
+        Check disabling aovs on every layer only removes the existing
+        adjustments and sets the aovs disabled
+
+        :return:
+        """
+
+        self.scene.add_override("aiAOV_Z.enabled", "layerC", True)
+        self.scene.add_override("aiAOV_AO.enabled", "layerC", False)
+        self.scene.values["aiAOV_AO.enabled"] = True
+        self.scene.current_layer = "layerC"
+        self.scene.reset_calls()
+
+        removals = self.utils.disable_aovs_for_all_layers(["aiAOV_AO",
+                                                           "aiAOV_Z"])
+
+        self.assertEqual(removals,
+                         {"layerB": ["aiAOV_Z.enabled"],
+                          "layerC": ["aiAOV_AO.enabled", "aiAOV_Z.enabled"]})
+
+        self.assertEqual(self.scene.call_count("editRenderLayerAdjustment"), 2)
+        self.assertEqual(self.scene.call_count("setAttr"), 2)
+
+        for render_layer in ["defaultRenderLayer", "layerA", "layerB",
+                             "layerC"]:
+            self.assertEqual(self.scene.adjustments[render_layer], {})
+
+            for aov in ["aiAOV_AO", "aiAOV_Z"]:
+                self.assertFalse(self.scene.layer_value("%s.enabled" % aov,
+                                                        render_layer))
+
+    def test_disable_for_all_layers_snapshot(self):
+        """
+        Check disabling aovs on every layer with a snapshot only sets the aovs
+        enabled on the master layer and updates the snapshot
+
+        :return:
+        """
+
+        self.scene.add_override("aiAOV_AO.enabled", "layerC", False)
+        self.scene.values["aiAOV_AO.enabled"] = True
+
+        snapshot = self.scene_snapshot.SceneSnapshot.read_attributes(
+            ["aiAOV_AO.enabled", "aiAOV_Z.enabled"])
+        self.scene.reset_calls()
+
+        self.utils.disable_aovs_for_all_layers(["aiAOV_AO", "aiAOV_Z"],
+                                               snapshot=snapshot)
+
+        self.assertEqual(self.scene.call_count("setAttr"), 1)
+        self.assertEqual(self.scene.call_count("listConnections"), 0)
+
+        self.assertNotIn("aiAOV_Z.enabled", snapshot.overrides)
+        self.assertFalse(snapshot.master_value("aiAOV_AO.enabled"))
+
+    def test_disable_after_layer_switch(self):
+        """
+        Check the master value is set when the current layer was switched
+        after the snapshot was read
+
+        :return:
+        """
+
+        self.scene.add_override("aiAOV_AO.enabled", "layerA", False)
+        self.scene.values["aiAOV_AO.enabled"] = True
+
+        snapshot = self.utils.get_scene_snapshot()
+
+        self.scene.current_layer = "layerA"
+
+        snapshot.refresh_attributes(["aiAOV_AO.enabled"])
+
+        self.assertEqual(snapshot.current_layer, "layerA")
+        self.assertTrue(snapshot.master_value("aiAOV_AO.enabled"))
+        self.assertTrue(snapshot.layer_value("aiAOV_Z.enabled", "layerB"))
+
+        self.utils.disable_aovs_for_all_layers(["aiAOV_AO"],
+                                               snapshot=snapshot)
+
+        for render_layer in ["defaultRenderLayer", "layerA", "layerB"]:
+            self.assertFalse(self.scene.layer_value("aiAOV_AO.enabled",
+                                                    render_layer))
+
+
+if __name__ == '__main__':
+    unittest.main()
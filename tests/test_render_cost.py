@@ -0,0 +1,229 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import fake_maya
+
+
+class RenderCostTests(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Build a half precision HD scene with two layers and aovs of three
+        data types
+
+        :return:
+        """
+
+        self.scene = fake_maya.install()
+
+        from aov_manager import render_cost, scene_snapshot
+        self.render_cost = render_cost
+        self.scene_snapshot = scene_snapshot
+
+        self.scene.create_node("resolution", "defaultResolution")
+        self.scene.values["defaultResolution.width"] = 1920
+        self.scene.values["defaultResolution.height"] = 1080
+
+        self.scene.create_node("aiAOVDriver", "defaultArnoldDriver")
+        self.scene.values["defaultArnoldDriver.halfPrecision"] = True
+
+        self.scene.add_aov("AO")
+        self.scene.add_aov("Z", data_type="float")
+        self.scene.add_aov("ID", data_type=1)
+
+        self.scene.add_render_layer("layerA")
+        self.scene.add_render_layer("layerB")
+
+        self.scene.add_override("defaultResolution.width", "layerB", 960)
+        self.scene.add_override("defaultResolution.height", "layerB", 540)
+
+        self.costs = render_cost.RenderCostModel(
+            budgets={"default": 100 * render_cost.MEGABYTE})
+        self.costs.set_snapshot(scene_snapshot.SceneSnapshot.read())
+
+    def test_layer_cost(self):
+        """
+        Check the channels of every data type and the render settings are
+        used
+
+        :return:
+        """
+
+        self.costs.set_layer_aovs("layerA", ["AO", "Z", "ID"])
+
+        cost = self.costs.layer_cost("layerA")
+
+        # rgba beauty, rgb AO and float Z, one integer channel for ID
+        self.assertEqual(cost.float_channels, 8)
+        self.assertEqual(cost.integer_channels, 1)
+
+        self.assertEqual(cost.framebuffer_bytes(), 1920 * 1080 * 9 * 4)
+        self.assertEqual(cost.output_bytes(),
+                         int(1920 * 1080 * (8 * 2 + 4) *
+                             self.render_cost.EXR_COMPRESSION_RATIO))
+
+        self.assertFalse(cost.over_budget())
+
+    def test_layer_settings(self):
+        """
+        Check the layer resolution overrides and the master layer settings
+
+        :return:
+        """
+
+        self.costs.set_layer_aovs("layerB", ["AO"])
+        self.costs.set_layer_aovs("masterLayer", ["AO"])
+
+        self.assertEqual(self.costs.layer_cost("layerB").framebuffer_bytes(),
+                         960 * 540 * 7 * 4)
+        self.assertEqual(
+            self.costs.layer_cost("masterLayer").framebuffer_bytes(),
+            1920 * 1080 * 7 * 4)
+
+    def test_settings_refresh(self):
+        """
+        Check render settings changed after the snapshot was read are used
+        once their attributes are read again
+
+        :return:
+        """
+
+        self.costs.set_layer_aovs("layerA", ["AO"])
+        self.costs.layer_cost("layerA")
+
+        self.scene.values["defaultResolution.width"] = 1280
+        self.scene.values["defaultResolution.height"] = 720
+
+        snapshot = self.costs.snapshot
+        snapshot.refresh_attributes([self.render_cost.RESOLUTION_WIDTH,
+                                     self.render_cost.RESOLUTION_HEIGHT])
+        self.costs.set_snapshot(snapshot)
+
+        self.assertEqual(self.costs.layer_cost("layerA").framebuffer_bytes(),
+                         1280 * 720 * 7 * 4)
+
+    def test_missing_settings(self):
+        """
+        Check the default render settings are used when getAttr can't find
+        the settings nodes
+
+        :return:
+        """
+
+        def missing_node(node_attribute, render_layer):
+            raise ValueError("No object matches name: %s" % node_attribute)
+
+        self.costs.snapshot.layer_value = missing_node
+        self.costs.set_snapshot(self.costs.snapshot)
+        self.costs.set_layer_aovs("layerA", ["AO"])
+
+        cost = self.costs.layer_cost("layerA")
+
+        self.assertEqual([cost.width, cost.height, cost.half_precision],
+                         self.render_cost.DEFAULT_RENDER_SETTINGS)
+        self.assertEqual(cost.channels(), 7)
+
+    def test_incremental(self):
+        """
+        Check added and removed aovs update the layer totals, aovs created
+        after the snapshot get the default data type
+
+        :return:
+        """
+
+        self.costs.set_layer_aovs("layerA", ["Z"])
+
+        self.costs.add_aov("layerA", "AO")
+        self.costs.add_aov("layerA", "AO")
+        self.assertEqual(self.costs.layer_cost("layerA").channels(), 8)
+
+        self.costs.remove_aov("layerA", "Z")
+        self.costs.remove_aov("layerA", "Z")
+        self.assertEqual(self.costs.layer_cost("layerA").channels(), 7)
+
+        self.costs.add_aov("layerA", "P")
+        self.assertEqual(self.costs.layer_cost("layerA").channels(), 10)
+
+    def test_data_type_changes(self):
+        """
+        Check aovs are removed with the channels they were added with and
+        are charged again once their data type is known or changed
+
+        :return:
+        """
+
+        self.costs.set_layer_aovs("layerA", ["AO"])
+        self.costs.set_layer_aovs("layerB", ["AO"])
+
+        # Costed with the default data type until the aov is created
+        self.costs.add_aov("layerA", "P")
+        self.scene.add_aov("P", data_type="float")
+
+        self.costs.remove_aov("layerA", "P")
+        self.assertEqual(self.costs.layer_cost("layerA").channels(), 7)
+
+        self.costs.add_aov("layerA", "P")
+        self.assertEqual(self.costs.layer_cost("layerA").channels(), 8)
+
+        self.scene.values["aiAOV_P.type"] = "int"
+        self.costs.snapshot.refresh_attributes(["aiAOV_P.type"])
+
+        self.assertEqual(self.costs.update_aovs(["P"]), ["layerA"])
+        self.assertEqual(self.costs.update_aovs(["P"]), [])
+
+        cost = self.costs.layer_cost("layerA")
+
+        self.assertEqual(cost.float_channels, 7)
+        self.assertEqual(cost.integer_channels, 1)
+
+        self.costs.remove_aov("layerA", "P")
+        self.assertEqual(self.costs.layer_cost("layerA").channels(), 7)
+
+    def test_budgets(self):
+        """
+        Check the layer budgets are read in megabytes and flag the layers
+        over their budget
+
+        :return:
+        """
+
+        folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, folder)
+
+        budgets_file = os.path.join(folder, "layer_budgets.json")
+
+        with open(budgets_file, "w") as f:
+            json.dump({"default": 100, "layers": {"layerA": 50}}, f)
+
+        budgets = self.render_cost.load_budgets(budgets_file)
+
+        self.assertEqual(budgets["layerA"], 50 * self.render_cost.MEGABYTE)
+
+        self.costs.budgets = budgets
+
+        aov_list = ["AO", "Z", "ID"]
+
+        self.costs.set_layer_aovs("layerA", aov_list)
+        self.costs.set_layer_aovs("layerB", aov_list)
+
+        self.assertTrue(self.costs.layer_cost("layerA").over_budget())
+        self.assertFalse(self.costs.layer_cost("layerB").over_budget())
+
+    def test_format_bytes(self):
+        """
+        Check sizes are shown with their unit
+
+        :return:
+        """
+
+        self.assertEqual(self.render_cost.format_bytes(512), "512 B")
+        self.assertEqual(self.render_cost.format_bytes(1536), "1.5 KB")
+        self.assertEqual(self.render_cost.format_bytes(3 * 1024 ** 4),
+                         "3072.0 GB")
+
+
+if __name__ == "__main__":
+    unittest.main()
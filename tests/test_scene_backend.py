@@ -0,0 +1,125 @@
+import unittest
+
+import fake_maya
+
+
+class SceneBackendTests(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Build a scene with two layers, three aovs and a non numeric override
+
+        :return:
+        """
+
+        self.scene = fake_maya.install()
+        fake_maya.install_api()
+
+        from aov_manager import scene_backend, scene_snapshot
+        self.scene_backend = scene_backend
+        self.scene_snapshot = scene_snapshot
+
+        for aov in ["AO", "Z", "MV"]:
+            self.scene.add_aov(aov)
+
+        self.scene.add_render_layer("layerA")
+        self.scene.add_render_layer("layerB")
+
+        self.scene.add_override("aiAOV_AO.enabled", "layerA", True)
+        self.scene.add_override("aiAOV_Z.enabled", "layerB", True)
+        self.scene.add_override("aiAOV_MV.type", "layerB", "float")
+
+        self.scene.current_layer = "layerB"
+
+    def tearDown(self):
+        """
+        Restore the maya.cmds backend used by the other tests
+
+        :return:
+        """
+
+        self.scene_backend.set_backend(self.scene_backend.BACKEND_CMDS)
+
+    def read_snapshot(self, backend_name):
+        """
+        Read a scene snapshot with a backend
+
+        :param backend_name: the scene backend name
+        :return: a SceneSnapshot object
+        """
+
+        self.scene_backend.set_backend(backend_name)
+
+        snapshot = self.scene_snapshot.SceneSnapshot.read()
+        snapshot.value("aiAOV_MV.type")
+
+        return snapshot
+
+    def test_backends_match(self):
+        """
+        Check both backends read the same snapshot
+
+        :return:
+        """
+
+        cmds_snapshot = self.read_snapshot(self.scene_backend.BACKEND_CMDS)
+        api_snapshot = self.read_snapshot(self.scene_backend.BACKEND_API)
+
+        for attribute in ["current_layer", "render_layers", "aovs", "values",
+                          "overrides", "adjustment_plugs"]:
+            self.assertEqual(getattr(api_snapshot, attribute),
+                             getattr(cmds_snapshot, attribute))
+
+        self.assertEqual(api_snapshot.overrides["aiAOV_MV.type"],
+                         {"defaultRenderLayer": "rgb", "layerB": "float"})
+
+    def test_value_plugs(self):
+        """
+        Check both backends only read the values of the given adjustments
+
+        :return:
+        """
+
+        adjustments = []
+
+        for backend_name in [self.scene_backend.BACKEND_CMDS,
+                             self.scene_backend.BACKEND_API]:
+            backend = self.scene_backend.set_backend(backend_name)
+
+            adjustments.append(backend.layer_adjustments(
+                "layerB", value_plugs=set(["layerB.adjustments[1].plug"])))
+
+        self.assertEqual(adjustments[0], adjustments[1])
+        self.assertEqual([x[2] for x in adjustments[0]], [None, "float"])
+
+    def test_api_commands(self):
+        """
+        Check the api backend only issues commands for the current layer and
+        the non numeric values
+
+        :return:
+        """
+
+        self.scene.reset_calls()
+        self.read_snapshot(self.scene_backend.BACKEND_API)
+
+        self.assertEqual(self.scene.call_count("editRenderLayerGlobals"), 1)
+        self.assertEqual(self.scene.call_count("getAttr"), 2)
+        self.assertEqual(self.scene.call_count(), 3)
+
+    def test_missing_plug(self):
+        """
+        Check a missing plug raises like getAttr
+
+        :return:
+        """
+
+        backend = self.scene_backend.set_backend(
+            self.scene_backend.BACKEND_API)
+
+        self.assertRaises(RuntimeError, backend.get_values,
+                          ["aiAOV_missing.enabled"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,157 @@
+import unittest
+
+import fake_maya
+
+
+class SceneEventListenerTests(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Start a listener on a fake callback registry
+
+        :return:
+        """
+
+        fake_maya.install()
+
+        from aov_manager import scene_events
+
+        self.registry = fake_maya.FakeCallbackRegistry()
+        self.scheduler = fake_maya.FakeScheduler()
+        self.changes = []
+
+        self.listener = scene_events.SceneEventListener(
+            self.changes.append,
+            registry=self.registry,
+            scheduler=self.scheduler)
+
+        self.listener.start({"aiAOV": ["aiAOV_AO"],
+                             "renderLayer": ["defaultRenderLayer", "layerA"],
+                             "resolution": ["defaultResolution"]})
+
+    def test_events_are_coalesced(self):
+        """
+        Check a burst of events sends a single change notification
+
+        :return:
+        """
+
+        self.registry.emit_attribute_changed("aiAOV_AO", "enabled")
+        self.registry.emit_attribute_changed("aiAOV_AO", "enabled")
+        self.registry.emit_attribute_changed("aiAOV_AO", "name")
+        self.registry.emit_node_added("aiAOV", "aiAOV_Z")
+        self.registry.emit_attribute_changed("aiAOV_Z", "enabled")
+
+        self.assertEqual(len(self.scheduler.pending), 1)
+
+        self.scheduler.run_pending()
+
+        self.assertEqual(len(self.changes), 1)
+        self.assertEqual(self.changes[0].nodes_added, set(["aiAOV_Z"]))
+        self.assertEqual(self.changes[0].attributes_changed,
+                         set(["aiAOV_AO.enabled", "aiAOV_Z.enabled"]))
+        self.assertEqual(self.changes[0].added("aiAOV"), ["aiAOV_Z"])
+        self.assertFalse(self.changes[0].structure_changed())
+
+    def test_attribute_only_changes(self):
+        """
+        Check aov and single adjustment changes don't need a full scene read
+        while render layer changes do
+
+        :return:
+        """
+
+        self.registry.emit_attribute_changed("aiAOV_AO", "enabled")
+        self.registry.emit_attribute_changed("layerA", "adjustments[0].value")
+        self.registry.emit_attribute_changed("layerA", "adjustments[0].plug")
+        self.registry.emit_attribute_changed("defaultRenderLayer",
+                                             "adjustments[2]")
+        self.registry.emit_node_removed("aiAOV", "aiAOV_AO")
+        self.scheduler.run_pending()
+
+        changes = self.changes[0]
+
+        self.assertFalse(changes.structure_changed())
+        self.assertEqual(changes.removed("aiAOV"), ["aiAOV_AO"])
+        self.assertEqual(changes.attribute_values(), ["aiAOV_AO.enabled"])
+        self.assertEqual(changes.adjustment_plugs(),
+                         ["defaultRenderLayer.adjustments[2].plug",
+                          "layerA.adjustments[0].plug"])
+
+        self.registry.emit_node_added("renderLayer", "layerB")
+        self.scheduler.run_pending()
+
+        self.assertTrue(self.changes[1].structure_changed())
+
+    def test_render_settings_changes(self):
+        """
+        Check the resolution changes are sent without a full scene read
+
+        :return:
+        """
+
+        self.registry.emit_attribute_changed("defaultResolution", "width")
+        self.registry.emit_attribute_changed("defaultResolution",
+                                             "pixelAspect")
+        self.scheduler.run_pending()
+
+        self.assertEqual(self.changes[0].attributes_changed,
+                         set(["defaultResolution.width"]))
+        self.assertFalse(self.changes[0].structure_changed())
+
+    def test_aov_type_changes(self):
+        """
+        Check the aovs whose data type changed are sent
+
+        :return:
+        """
+
+        self.registry.emit_attribute_changed("aiAOV_AO", "type")
+        self.scheduler.run_pending()
+
+        self.assertEqual(self.changes[0].changed("type"), ["aiAOV_AO"])
+        self.assertEqual(self.changes[0].changed("enabled"), [])
+
+    def test_renamed_nodes(self):
+        """
+        Check a renamed aov is sent as removed and added and its callbacks
+        are removed with the node under its new name
+
+        :return:
+        """
+
+        self.registry.emit_name_changed("aiAOV_AO", "aiAOV_AO2")
+        self.registry.emit_attribute_changed("aiAOV_AO2", "enabled")
+        self.scheduler.run_pending()
+
+        self.assertEqual(self.changes[0].removed("aiAOV"), ["aiAOV_AO"])
+        self.assertEqual(self.changes[0].added("aiAOV"), ["aiAOV_AO2"])
+        self.assertEqual(self.changes[0].attributes_changed,
+                         set(["aiAOV_AO2.enabled"]))
+
+        callback_count = len(self.registry.callbacks)
+
+        self.registry.emit_node_removed("aiAOV", "aiAOV_AO2")
+
+        self.assertEqual(len(self.registry.callbacks), callback_count - 2)
+
+    def test_stop_removes_callbacks(self):
+        """
+        Check stopping the listener removes every callback and drops the
+        pending events
+
+        :return:
+        """
+
+        self.registry.emit_node_added("renderLayer", "layerB")
+        self.registry.emit_node_removed("aiAOV", "aiAOV_AO")
+
+        self.listener.stop()
+        self.scheduler.run_pending()
+
+        self.assertEqual(self.registry.callbacks, {})
+        self.assertEqual(self.changes, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,228 @@
+import unittest
+
+import fake_maya
+
+
+class SceneSnapshotTests(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Build a small scene with two layers and three aovs
+
+        :return:
+        """
+
+        self.scene = fake_maya.install()
+
+        from aov_manager import utils
+        self.utils = utils
+
+        for aov in ["AO", "Z", "MV"]:
+            self.scene.add_aov(aov)
+
+        self.scene.add_render_layer("layerA")
+        self.scene.add_render_layer("layerB")
+
+        self.scene.add_override("aiAOV_AO.enabled", "layerA", True)
+        self.scene.add_override("aiAOV_Z.enabled", "layerA", True)
+        self.scene.add_override("aiAOV_Z.enabled", "layerB", True)
+        self.scene.add_override("aiAOV_MV.enabled", "layerB", False)
+
+    def test_layers_aovs(self):
+        """
+        Check the enabled aovs are resolved per layer
+
+        :return:
+        """
+
+        layer_aovs = self.utils.get_layers_aovs()
+
+        self.assertEqual(layer_aovs, {"layerA": ["beauty", "AO", "Z"],
+                                      "layerB": ["beauty", "Z"]})
+
+    def test_current_layer_uses_live_value(self):
+        """
+        Check the current layer reads the live attribute value
+
+        :return:
+        """
+
+        self.scene.current_layer = "layerB"
+        self.scene.write_plug("aiAOV_MV.enabled", True)
+
+        layer_aovs = self.utils.get_layers_aovs()
+
+        self.assertEqual(layer_aovs["layerB"], ["beauty", "Z", "MV"])
+        self.assertEqual(layer_aovs["layerA"], ["beauty", "AO", "Z"])
+
+    def test_layer_switch(self):
+        """
+        Check a layer switch made after the snapshot was read moves the live
+        values to the new layer
+
+        :return:
+        """
+
+        snapshot = self.utils.get_scene_snapshot()
+
+        self.scene.current_layer = "layerB"
+        snapshot.refresh_attributes([])
+
+        self.assertEqual(snapshot.current_layer, "layerB")
+        self.assertFalse(snapshot.value("aiAOV_AO.enabled"))
+        self.assertTrue(snapshot.value("aiAOV_Z.enabled"))
+        self.assertEqual(snapshot.layer_aovs(), self.utils.get_layers_aovs())
+
+    def test_incremental_changes(self):
+        """
+        Check reading only the added aovs and the changed adjustments gives
+        the same snapshot as a full read
+
+        :return:
+        """
+
+        self.scene.current_layer = "layerB"
+
+        snapshot = self.utils.get_scene_snapshot()
+
+        previous_adjustments = dict(
+            (render_layer, dict((x, list(y)) for x, y in adjustments.items()))
+            for render_layer, adjustments in self.scene.adjustments.items())
+
+        self.scene.add_aov("P")
+        self.scene.add_override("aiAOV_P.enabled", "layerA", True)
+        self.scene.add_override("aiAOV_AO.enabled", "layerB", True)
+
+        index = self.scene._adjustment_index("layerA", "aiAOV_Z.enabled")
+        del self.scene.adjustments["layerA"][index]
+
+        self.utils.cmds.delete("aiAOV_MV")
+
+        adjustment_plugs = []
+
+        for render_layer, adjustments in self.scene.adjustments.items():
+            previous = previous_adjustments[render_layer]
+
+            for index in set(adjustments) | set(previous):
+                if adjustments.get(index) != previous.get(index):
+                    adjustment_plugs.append("%s.adjustments[%s].plug"
+                                            % (render_layer, index))
+
+        self.scene.reset_calls()
+
+        snapshot.remove_aovs(["aiAOV_MV"])
+        snapshot.add_aovs(["aiAOV_P"])
+        snapshot.refresh_adjustments(adjustment_plugs)
+        snapshot.refresh_attributes(["aiAOV_AO.enabled", "aiAOV_P.enabled"])
+
+        full_snapshot = self.utils.get_scene_snapshot()
+
+        self.assertEqual(snapshot.aovs, full_snapshot.aovs)
+        self.assertEqual(snapshot.overrides, full_snapshot.overrides)
+        self.assertEqual(snapshot.adjustment_plugs,
+                         full_snapshot.adjustment_plugs)
+        self.assertEqual(snapshot.layer_aovs(), full_snapshot.layer_aovs())
+
+    def test_incremental_call_count(self):
+        """
+        Check reading a dropped aov costs a fraction of a full read
+
+        :return:
+        """
+
+        scene = fake_maya.build_scene(20, 20)
+
+        snapshot = self.utils.get_scene_snapshot()
+
+        aov_node = scene.add_aov("P")
+        scene.add_override("%s.enabled" % aov_node, "layer0000", True)
+
+        scene.reset_calls()
+
+        snapshot.add_aovs([aov_node])
+        snapshot.refresh_adjustments(
+            ["layer0000.adjustments[20].plug",
+             "%s.adjustments[20].plug" % fake_maya.DEFAULT_LAYER])
+        snapshot.refresh_attributes(["%s.enabled" % aov_node])
+
+        incremental_calls = scene.call_count()
+
+        scene.reset_calls()
+        self.utils.get_scene_snapshot()
+
+        self.assertLess(incremental_calls * 5, scene.call_count())
+        self.assertEqual(snapshot.layer_aovs()["layer0000"][-1], "P")
+
+    def test_scene_aovs(self):
+        """
+        Check the scene aov names
+
+        :return:
+        """
+
+        self.assertEqual(self.utils.get_scene_aovs(), ["AO", "Z", "MV"])
+
+    def test_override_data(self):
+        """
+        Check the override data matches the layer adjustments
+
+        :return:
+        """
+
+        snapshot = self.utils.get_scene_snapshot()
+
+        self.assertEqual(
+            self.utils.gather_attribute_override_data("aiAOV_Z.enabled",
+                                                      snapshot=snapshot),
+            {"layerA": True, "layerB": True})
+
+        self.assertFalse(
+            self.utils.gather_attribute_override_data("aiAOV_P.enabled",
+                                                      snapshot=snapshot))
+
+    def test_call_count_is_linear(self):
+        """
+        Check doubling the layers and aovs doubles the maya calls instead of
+        quadrupling them
+
+        :return:
+        """
+
+        counts = []
+
+        for size in [10, 20]:
+            scene = fake_maya.build_scene(size, size, overrides_per_layer=2)
+            self.utils.get_layers_aovs()
+            counts.append(scene.call_count())
+
+        self.assertLess(counts[1], counts[0] * 2.5)
+
+    def test_diff_layer_aovs(self):
+        """
+        Check the layer aovs difference only holds the changes
+
+        :return:
+        """
+
+        from aov_manager import scene_snapshot
+
+        previous = {"layerA": ["beauty", "AO", "Z"],
+                    "layerB": ["beauty", "Z"],
+                    "layerC": ["beauty"]}
+
+        current = {"layerA": ["beauty", "AO", "MV"],
+                   "layerB": ["beauty", "Z"],
+                   "layerD": ["beauty", "AO"]}
+
+        added_layers, removed_layers, added_aovs, removed_aovs = \
+            scene_snapshot.diff_layer_aovs(previous, current)
+
+        self.assertEqual(added_layers, ["layerD"])
+        self.assertEqual(removed_layers, ["layerC"])
+        self.assertEqual(added_aovs, {"layerA": ["MV"],
+                                      "layerD": ["beauty", "AO"]})
+        self.assertEqual(removed_aovs, {"layerA": ["Z"]})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+import unittest
+
+import fake_maya
+
+
+class ShaderLibraryTests(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Build a scene with two preset aovs
+
+        :return:
+        """
+
+        self.scene = fake_maya.install()
+
+        from aov_manager import shader_library, utils
+        self.shader_library = shader_library
+        self.utils = utils
+
+        self.library = shader_library.ShaderLibrary()
+
+        self.scene.add_aov("AO")
+        self.scene.add_aov("Incidence")
+
+    def test_manifest(self):
+        """
+        Check the manifest indexes every preset file with its nodes
+
+        :return:
+        """
+
+        manifest = self.library.manifest()
+
+        self.assertEqual(sorted(manifest),
+                         ["AO", "Incidence", "MV", "Normals", "UV"])
+
+        self.assertEqual(manifest["Incidence"]["nodes"],
+                         ["samplerInfo1", "AOV_Incidence_MAT",
+                          "AOV_INCIDENCE_SG", "ramp1", "materialInfo1",
+                          "lightLinker1"])
+
+    def test_scan_keeps_unchanged_presets(self):
+        """
+        Check a new scan doesn't read the unchanged preset files again
+
+        :return:
+        """
+
+        self.library.scan()
+        presets = dict(self.library.presets)
+
+        self.library.scan()
+
+        for name, preset in presets.items():
+            self.assertIs(self.library.presets[name], preset)
+
+    def test_existing_shader_is_reused(self):
+        """
+        Check a preset shader already in the scene is connected without
+        importing its file
+
+        :return:
+        """
+
+        self.scene.create_node("surfaceShader", "AOV_AO_MAT")
+        self.scene.reset_calls()
+
+        self.utils.connect_aov_preset_shaders(["AO", "AO"])
+
+        self.assertEqual(self.scene.call_count("file"), 0)
+        self.assertEqual(self.scene.call_count("ls"), 2)
+        self.assertIn(("AOV_AO_MAT.outColor", "aiAOV_AO.defaultValue"),
+                      self.scene.connections)
+
+    def test_procedural_network(self):
+        """
+        Check a preset network is built from its description without opening
+        the preset file
+
+        :return:
+        """
+
+        created_nodes = self.library.import_presets(["Incidence"],
+                                                    procedural=True)
+
+        self.assertEqual(created_nodes, ["samplerInfo1", "ramp1",
+                                         "AOV_Incidence_MAT",
+                                         "AOV_INCIDENCE_SG"])
+
+        self.assertEqual(self.scene.call_count("file"), 0)
+        self.assertIn(("samplerInfo1.facingRatio", "ramp1.vCoord"),
+                      self.scene.connections)
+        self.assertEqual(
+            self.scene.values["ramp1.colorEntryList[2].color"],
+            (0.0, 1.0, 1.0))
+
+    def test_procedural_aovs(self):
+        """
+        Check aovs added to a layer can build their preset networks without
+        opening the preset files
+
+        :return:
+        """
+
+        self.scene.add_render_layer("layerA")
+
+        self.utils.add_aovs_to_render_layer([{"ui_Name": "Normals",
+                                              "aov_Name": "aiAOV_Normals",
+                                              "type": "aiStandard"}],
+                                            "layerA",
+                                            procedural=True)
+
+        self.assertEqual(self.scene.call_count("file"), 0)
+        self.assertIn(("AOV_Normals_MAT.outColor",
+                       "aiAOV_Normals.defaultValue"),
+                      self.scene.connections)
+
+
+if __name__ == "__main__":
+    unittest.main()
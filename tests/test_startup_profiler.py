@@ -0,0 +1,86 @@
+import unittest
+
+from aov_manager import startup_profiler
+
+
+class FakeTimer(object):
+    """
+    Class standing in for the profiler timer, time only moves when told to
+    """
+    def __init__(self):
+        self.time = 0.0
+
+    def __call__(self):
+        return self.time
+
+
+class StartupProfilerTests(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Create a profiler on a fake timer
+
+        :return:
+        """
+
+        self.timer = FakeTimer()
+        self.profiler = startup_profiler.StartupProfiler(timer=self.timer)
+
+    def test_phases(self):
+        """
+        Check every phase is timed in the order it ran and the report gives
+        the time since the profiler creation
+
+        :return:
+        """
+
+        with self.profiler.phase("setup ui"):
+            self.timer.time += 0.5
+
+        self.timer.time += 0.25
+
+        with self.profiler.phase("layers tree"):
+            self.timer.time += 1.0
+
+        self.assertEqual(self.profiler.phases, [("setup ui", 0.5),
+                                                ("layers tree", 1.0)])
+        self.assertEqual(self.profiler.elapsed(), 1.75)
+
+        report = self.profiler.report().splitlines()
+
+        self.assertEqual(len(report), 4)
+        self.assertTrue(report[-1].strip().startswith("time to interactive"))
+        self.assertTrue(report[-1].endswith("1.750s"))
+
+    def test_sliced_phase(self):
+        """
+        Check a phase run in several slices in a row is summed
+
+        :return:
+        """
+
+        for _ in range(3):
+            with self.profiler.phase("layers tree"):
+                self.timer.time += 0.25
+
+            self.timer.time += 1.0
+
+        self.assertEqual(self.profiler.phases, [("layers tree", 0.75)])
+
+    def test_failed_phase_is_timed(self):
+        """
+        Check a phase raising an error is still recorded
+
+        :return:
+        """
+
+        with self.assertRaises(ValueError):
+            with self.profiler.phase("presets tree"):
+                self.timer.time += 0.5
+                raise ValueError()
+
+        self.assertEqual(self.profiler.phases, [("presets tree", 0.5)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+import unittest
+
+import fake_maya
+
+
+class TransactionTests(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Build a scene with two layers and two aovs
+
+        :return:
+        """
+
+        self.scene = fake_maya.install()
+
+        from aov_manager import utils
+        self.utils = utils
+
+        self.scene.add_render_layer("layerA")
+        self.scene.add_render_layer("layerB")
+
+        self.scene.add_aov("Z")
+        self.scene.add_aov("P")
+
+    def test_single_chunk(self):
+        """
+        Check nested transactions make a single undo chunk and the refresh is
+        suspended while they run
+
+        :return:
+        """
+
+        with self.utils.transaction("drop"):
+            self.assertEqual(self.scene.refresh_suspended, 1)
+
+            self.utils.add_aovs_to_render_layer(
+                [{"ui_Name": "Z",
+                  "aov_Name": "aiAOV_Z",
+                  "type": "<builtin>",
+                  "data": "float"}],
+                "layerA")
+
+            self.utils.set_layer_overrides("aiAOV_P.enabled",
+                                           {"layerB": True})
+
+        self.assertEqual(self.scene.refresh_suspended, 0)
+        self.assertEqual(self.scene.undo_queue[-1][0], "drop")
+        self.assertEqual(len(self.scene.undo_queue), 1)
+
+        self.scene.undo()
+
+        self.assertEqual(self.scene.layer_value("aiAOV_P.enabled", "layerB"),
+                         False)
+
+    def test_rollback(self):
+        """
+        Check a failing transaction leaves the scene untouched
+
+        :return:
+        """
+
+        def failing_action():
+            with self.utils.transaction("remove"):
+                self.utils.set_layer_overrides("aiAOV_Z.enabled",
+                                               {"layerA": True})
+                self.utils.cmds.delete("aiAOV_P")
+                self.utils.cmds.delete("aiAOV_missing")
+
+        self.assertRaises(RuntimeError, failing_action)
+
+        self.assertIn("aiAOV_P", self.scene.nodes)
+        self.assertEqual(self.scene.layer_value("aiAOV_Z.enabled", "layerA"),
+                         False)
+        self.assertEqual(self.scene.undo_queue, [])
+        self.assertEqual(self.scene.refresh_suspended, 0)
+
+    def test_empty_rollback(self):
+        """
+        Check a transaction failing before any change doesn't undo the
+        previous action
+
+        :return:
+        """
+
+        with self.utils.transaction("disable"):
+            self.utils.cmds.setAttr("aiAOV_Z.enabled", True)
+
+        def failing_action():
+            with self.utils.transaction("remove"):
+                self.utils.cmds.delete("aiAOV_missing")
+
+        self.assertRaises(RuntimeError, failing_action)
+
+        self.assertEqual(self.scene.values["aiAOV_Z.enabled"], True)
+        self.assertEqual(len(self.scene.undo_queue), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
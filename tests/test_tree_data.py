@@ -0,0 +1,68 @@
+import unittest
+
+from aov_manager import tree_data
+
+
+class LayerAovTableTests(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Build a table with two layers and the master layer
+
+        :return:
+        """
+
+        self.table = tree_data.LayerAovTable()
+
+        for render_layer in ["masterLayer", "layerB", "layerA"]:
+            self.table.insert_layer(render_layer)
+
+        for row, aov in enumerate(["AO", "Z", "MV"]):
+            self.table.insert_aov("masterLayer", row, aov)
+
+        self.table.insert_aov("layerA", 0, "Z")
+        self.table.insert_aov("layerB", 0, "AO")
+        self.table.insert_aov("layerB", 0, "Z")
+
+    def test_layer_order(self):
+        """
+        Check layers are sorted with the master layer last
+
+        :return:
+        """
+
+        self.assertEqual([x.name for x in self.table.layers],
+                         ["layerA", "layerB", "masterLayer"])
+
+        self.assertEqual(self.table.layer_row("masterLayer"), 2)
+        self.assertEqual(self.table.insert_row("layerAA"), 1)
+
+    def test_names_are_interned(self):
+        """
+        Check aov names are stored once and shared by every layer
+
+        :return:
+        """
+
+        self.assertEqual(len(self.table.aov_names), 3)
+        self.assertEqual(self.table.aovs("layerB"), ["Z", "AO"])
+        self.assertEqual(self.table.aov_row("layerB", "AO"), 1)
+        self.assertEqual(self.table.aov_row("layerA", "AO"), None)
+
+    def test_remove(self):
+        """
+        Check removing aovs and layers keeps the rows up to date
+
+        :return:
+        """
+
+        self.table.remove_aov("layerB", 0)
+        self.table.remove_layer("layerA")
+
+        self.assertEqual(self.table.aovs("layerB"), ["AO"])
+        self.assertEqual(self.table.layer_row("masterLayer"), 1)
+        self.assertEqual(self.table.aovs("layerA"), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
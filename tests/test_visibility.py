@@ -0,0 +1,153 @@
+import unittest
+
+import fake_maya
+
+
+class PrimaryVisibilityTests(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Build a layer with visible, hidden and set hidden meshes
+
+        :return:
+        """
+
+        self.scene = fake_maya.install()
+
+        from aov_manager import scene_backend, utils
+        self.scene_backend = scene_backend
+        self.utils = utils
+
+
+        self.scene.add_render_layer("layerA")
+
+        self.scene.add_mesh("group1")
+        self.scene.add_mesh("rock", parent="group1")
+        self.scene.add_mesh("tree")
+        self.scene.add_mesh("bush")
+        self.scene.add_mesh("grass")
+        self.scene.create_node("transform", "locator1")
+
+        self.scene.values["bushShape.primaryVisibility"] = False
+
+        self.scene.add_set("hideSet", ["rock"], primary_visibility=False)
+        self.scene.add_set("showSet", ["tree"], primary_visibility=True)
+        self.scene.add_set("plainSet", ["grass"])
+
+        self.scene.add_layer_members("layerA", ["group1",
+                                                "rockShape",
+                                                "tree",
+                                                "bush",
+                                                "grass",
+                                                "locator1"])
+
+    def test_layer_visibility(self):
+        """
+        Check the visibility map of a whole layer
+
+        :return:
+        """
+
+        self.assertEqual(
+            self.utils.get_render_layer_primary_visibility("layerA"),
+            {"|group1": True,
+             "|group1|rock": False,
+             "|tree": True,
+             "|bush": False,
+             "|grass": True,
+             "|locator1": False})
+
+    def test_single_object(self):
+        """
+        Check objects given by short name
+
+        :return:
+        """
+
+        self.assertTrue(self.utils.get_object_primary_visibility("tree"))
+        self.assertFalse(self.utils.get_object_primary_visibility("rock"))
+        self.assertFalse(self.utils.get_object_primary_visibility("locator1"))
+
+    def test_set_edits(self):
+        """
+        Check override set edits are seen by the next evaluation
+
+        :return:
+        """
+
+        self.utils.get_render_layer_primary_visibility("layerA")
+
+        self.scene.values["showSet.primaryVisibility"] = False
+        self.scene.set_members["hideSet"] = []
+
+        self.assertTrue(self.utils.get_object_primary_visibility("rock"))
+        self.assertFalse(self.utils.get_object_primary_visibility("tree"))
+
+    def test_api_reads(self):
+        """
+        Check the shape and set values are read through the api backend
+        without a getAttr per plug
+
+        :return:
+        """
+
+        fake_maya.install_api()
+        self.scene_backend.set_backend(self.scene_backend.BACKEND_API)
+        self.addCleanup(self.scene_backend.set_backend,
+                        self.scene_backend.BACKEND_CMDS)
+
+        self.scene.reset_calls()
+
+        self.assertEqual(
+            self.utils.get_render_layer_primary_visibility("layerA")["|bush"],
+            False)
+
+        self.assertEqual(self.scene.call_count("getAttr"), 0)
+
+        # Only the hiding set members are listed
+        self.assertEqual(self.scene.call_count("sets"), 1)
+
+    def test_watched_sets(self):
+        """
+        Check a second evaluation issues no set queries while the sets are
+        watched, and a set edit only reads that set again
+
+        :return:
+        """
+
+        from aov_manager import visibility
+
+        registry = fake_maya.FakeCallbackRegistry()
+
+        evaluator = visibility.get_evaluator()
+        evaluator.watch(registry=registry)
+        self.addCleanup(evaluator.unwatch)
+
+        self.utils.get_render_layer_primary_visibility("layerA")
+
+        self.scene.reset_calls()
+        self.utils.get_render_layer_primary_visibility("layerA")
+
+        # One getAttr per shape, none for the sets
+        self.assertEqual(self.scene.call_count("sets"), 0)
+        self.assertEqual(self.scene.call_count("getAttr"), 5)
+
+        self.scene.set_members["hideSet"] = []
+        registry.emit_attribute_changed("hideSet", "dagSetMembers[0]")
+
+        self.scene.reset_calls()
+        self.assertTrue(self.utils.get_object_primary_visibility("rock"))
+        self.assertEqual(self.scene.call_count("sets"), 1)
+
+        self.scene.add_set("newSet", ["tree"], primary_visibility=False)
+        registry.emit_node_added("objectSet", "newSet")
+
+        self.assertFalse(self.utils.get_object_primary_visibility("tree"))
+
+        evaluator.unwatch()
+
+        self.assertEqual(registry.callbacks, {})
+
+
+if __name__ == "__main__":
+    unittest.main()